@@ -4,6 +4,9 @@ set -o errexit
 
 pip install -r requirements.txt
 
+# index the games so the manifest ships with the static files
+python manage.py build_games_manifest
+
 # collect static files
 python manage.py collectstatic --noinput
 
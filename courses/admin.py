@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Subject, Course, Lesson, Quiz, Question, Choice, Progress, Enrollment
+from .models import Subject, Course, Lesson, Quiz, Question, Choice, Progress, Enrollment, QuizAttempt
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
@@ -57,6 +57,11 @@ class EnrollmentAdmin(admin.ModelAdmin):
     list_filter = ('course', 'user')
     search_fields = ('user__username', 'course__title')
 
+class QuizAttemptAdmin(admin.ModelAdmin):
+    list_display = ('user', 'quiz', 'score', 'passed', 'client_timestamp', 'created_at')
+    list_filter = ('passed', 'quiz')
+    search_fields = ('user__username', 'quiz__title', 'idempotency_key')
+
 admin.site.register(Subject, SubjectAdmin)
 admin.site.register(Course, CourseAdmin)
 admin.site.register(Lesson, LessonAdmin)
@@ -64,3 +69,4 @@ admin.site.register(Quiz, QuizAdmin)
 admin.site.register(Question, QuestionAdmin)
 admin.site.register(Progress, ProgressAdmin)
 admin.site.register(Enrollment, EnrollmentAdmin)
+admin.site.register(QuizAttempt, QuizAttemptAdmin)
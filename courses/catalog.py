@@ -0,0 +1,120 @@
+"""Versioned cache for the public course catalog pages.
+
+Entries are keyed by a per-namespace version number plus the page
+parameters. Content changes bump the version instead of deleting keys, so
+every old entry goes stale at once and simply expires.
+
+Only JSON-friendly rows (ids and counts) are cached, which keeps this usable
+with the JSON serializer configured for Redis in production. Pages hydrate
+the rows with a single primary-key query.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Course
+
+# Catalog listings depend on course content; featured courses also on enrollments
+CATALOG = 'catalog'
+FEATURED = 'featured'
+
+LOCK_TIMEOUT = 30
+WAIT_STEP = 0.05
+WAIT_LIMIT = 2.0
+
+
+def _version_key(namespace: str) -> str:
+    return f'{namespace}_version'
+
+
+def get_version(namespace: str) -> int:
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), 1, timeout=None)
+        version = cache.get(_version_key(namespace), 1)
+    return version
+
+
+def bump_version(*namespaces) -> None:
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.set(_version_key(namespace), 2, timeout=None)
+
+
+def bump_version_on_commit(*namespaces) -> None:
+    """``bump_version`` once the current transaction commits.
+
+    Bumping earlier would let a concurrent request cache the pre-commit
+    rows under the new version, where they would stay until they expire.
+    """
+    transaction.on_commit(lambda: bump_version(*namespaces))
+
+
+def _key(namespace: str, parts) -> str:
+    raw = '|'.join(str(p) for p in parts)
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{namespace}:{digest}'
+
+
+def get_or_build(namespace: str, parts, builder, timeout=None):
+    """Return the cached value for ``parts``, building it at most once per version.
+
+    When the entry is missing, a short-lived lock elects a single builder.
+    Other requests serve the previous version's value if there is one, and
+    otherwise wait briefly for the builder before falling back to building
+    themselves.
+    """
+    timeout = timeout or getattr(settings, 'CACHE_TTL', 60 * 15)
+    base = _key(namespace, parts)
+    key = f'{base}:v{get_version(namespace)}'
+    stale_key = f'{base}:stale'
+
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            value = builder()
+            cache.set(key, value, timeout=timeout)
+            cache.set(stale_key, value, timeout=timeout * 4)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    stale = cache.get(stale_key)
+    if stale is not None:
+        return stale
+
+    waited = 0.0
+    while waited < WAIT_LIMIT:
+        time.sleep(WAIT_STEP)
+        waited += WAIT_STEP
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return builder()
+
+
+def hydrate_courses(rows, *attrs):
+    """Turn cached ``[course_id, value, ...]`` rows into ordered Course objects.
+
+    Each extra value is set on the course under the matching name in ``attrs``.
+    Courses deleted since the rows were cached are skipped.
+    """
+    courses = Course.objects.select_related('subject').in_bulk([row[0] for row in rows])
+    result = []
+    for course_id, *values in rows:
+        course = courses.get(course_id)
+        if course is None:
+            continue
+        for attr, value in zip(attrs, values):
+            setattr(course, attr, value)
+        result.append(course)
+    return result
@@ -0,0 +1,67 @@
+"""Conditional GET support for course content.
+
+Validators are computed from ``updated_at`` columns with a single aggregate
+query, so an unchanged resource is answered with 304 before anything is
+serialized or rendered. Edits to lessons, quizzes, questions and choices
+touch the ``updated_at`` of the lesson and course above them, which makes a
+course's timestamp cover its whole subtree.
+"""
+import hashlib
+
+from django.db import models
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Course, Lesson
+
+
+def touch_content(lesson_ids=(), course_ids=()) -> None:
+    """Mark lessons and the courses above them (plus ``course_ids``) as modified now."""
+    lesson_ids = {pk for pk in lesson_ids if pk is not None}
+    course_ids = {pk for pk in course_ids if pk is not None}
+    now = timezone.now()
+    if lesson_ids:
+        Lesson.objects.filter(pk__in=lesson_ids).update(updated_at=now)
+        course_ids.update(
+            Lesson.objects.filter(pk__in=lesson_ids).values_list('course_id', flat=True)
+        )
+    if course_ids:
+        Course.objects.filter(pk__in=course_ids).update(updated_at=now)
+
+
+def content_state(queryset, field='updated_at'):
+    """``(row count, latest timestamp)`` for ``queryset`` in one aggregate query."""
+    state = queryset.order_by().aggregate(count=models.Count('pk'), latest=models.Max(field))
+    return state['count'], state['latest']
+
+
+def make_etag(*parts) -> str:
+    raw = '|'.join(str(p) for p in parts)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 response if the client's validators still match, else None."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=quote_etag(etag), last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified=None):
+    if response.status_code in (200, 304):
+        response['ETag'] = quote_etag(etag)
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        # Cacheable, but always revalidated so edits show up immediately
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(request, etag, last_modified, render):
+    """Answer 304 when validators match; otherwise call ``render()`` and tag its response."""
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = render()
+    return set_validators(response, etag, last_modified)
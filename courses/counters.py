@@ -0,0 +1,70 @@
+from django.db import models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Course, Lesson, Quiz
+from .progress import refresh_course_percentages
+
+COUNTER_FIELDS = ('lesson_count', 'quiz_count', 'total_lesson_points')
+
+
+def shift_course_counts(course_id, lessons=0, quizzes=0, points=0) -> None:
+    """Apply deltas to a course's denormalized counters in one UPDATE.
+
+    The signal handlers calling this run inside the Lesson/Quiz write's
+    transaction (``save()`` is wrapped in ``atomic``, deletes already are),
+    so the row and its counters commit together. A lesson count change also
+    re-derives the course's progress percentages.
+    """
+    if course_id is None or not (lessons or quizzes or points):
+        return
+    Course.objects.filter(pk=course_id).update(
+        lesson_count=F('lesson_count') + lessons,
+        quiz_count=F('quiz_count') + quizzes,
+        total_lesson_points=F('total_lesson_points') + points,
+    )
+    if lessons:
+        refresh_course_percentages(course_id)
+
+
+def _scalar(queryset, group_field, expression):
+    value = queryset.order_by().values(group_field).annotate(v=expression).values('v')
+    return Coalesce(Subquery(value, output_field=models.IntegerField()), 0)
+
+
+def actual_counts(courses=None):
+    """Courses annotated with counters recomputed from the lesson and quiz tables."""
+    queryset = Course.objects.all() if courses is None else Course.objects.filter(pk__in=courses)
+    lessons = Lesson.objects.filter(course=OuterRef('pk'))
+    return queryset.annotate(
+        actual_lesson_count=_scalar(lessons, 'course', models.Count('id')),
+        actual_total_lesson_points=_scalar(lessons, 'course', models.Sum('points')),
+        actual_quiz_count=_scalar(
+            Quiz.objects.filter(lesson__course=OuterRef('pk')), 'lesson__course', models.Count('id')
+        ),
+    ).order_by('pk')
+
+
+def repair_course_counts(courses=None, fix=True):
+    """Find courses whose counters drifted and, if ``fix``, correct them.
+
+    Returns ``[(course, {field: (stored, actual)}), ...]`` for drifted courses.
+    """
+    drifted = []
+    for course in actual_counts(courses):
+        changes = {
+            field: (getattr(course, field), getattr(course, f'actual_{field}'))
+            for field in COUNTER_FIELDS
+            if getattr(course, field) != getattr(course, f'actual_{field}')
+        }
+        if changes:
+            drifted.append((course, changes))
+    if fix and drifted:
+        for course, changes in drifted:
+            for field, (_, actual) in changes.items():
+                setattr(course, field, actual)
+        Course.objects.bulk_update([c for c, _ in drifted], COUNTER_FIELDS, batch_size=500)
+        for course, changes in drifted:
+            if 'lesson_count' in changes:
+                refresh_course_percentages(course.pk)
+    return drifted
@@ -0,0 +1,169 @@
+"""Manifest of the static HTML games under ``static/games``.
+
+The manifest lists every game with its slug, title, URL, size and a content
+hash. It is written to ``manifest.json`` next to the games by the
+``build_games_manifest`` command (run before ``collectstatic``), loaded into
+memory on first use, and rebuilt when a game file's mtime or size changes.
+The games page reads it from memory and the service worker uses it to
+precache games for offline play. ``game_slug`` is the one slug source for
+games: recorded game sessions use the manifest slug of the game they name.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.utils.text import slugify
+
+MANIFEST_NAME = 'manifest.json'
+TITLE_RE = re.compile(r"<title>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+_lock = threading.Lock()
+_state = {'checked': 0.0, 'signature': None, 'manifest': None}
+
+
+def _slug(name: str) -> str:
+    return slugify(name, allow_unicode=True)[:100] or 'game'
+
+
+def game_slug(name: str) -> str:
+    """Slug for a game reported by ``name``: its manifest slug when ``name`` is a
+    listed game's title or slug, else ``name`` slugified with Unicode kept."""
+    slug = _slug(name)
+    for game in get_manifest()['games']:
+        if game['slug'] == slug or _slug(game['title']) == slug:
+            return game['slug']
+    return slug
+
+
+def games_dir() -> str:
+    return str(getattr(settings, 'GAMES_DIR', settings.BASE_DIR / 'static' / 'games'))
+
+
+def manifest_path() -> str:
+    return os.path.join(games_dir(), MANIFEST_NAME)
+
+
+def _discover():
+    """``(slug, entry file, url path, files)`` for each game, sorted by slug."""
+    root = games_dir()
+    if not os.path.isdir(root):
+        return []
+    games = []
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        index_path = os.path.join(path, 'index.html')
+        # Case 1: Directory with index.html; every file in it belongs to the game
+        if os.path.isdir(path) and os.path.isfile(index_path):
+            files = sorted(
+                os.path.join(dirpath, name)
+                for dirpath, _, names in os.walk(path) for name in names
+            )
+            games.append((_slug(entry), index_path, f'games/{entry}/index.html', files))
+        # Case 2: Standalone HTML file inside static/games
+        elif os.path.isfile(path) and entry.lower().endswith('.html'):
+            games.append((_slug(os.path.splitext(entry)[0]), path, f'games/{entry}', [path]))
+    return games
+
+
+def _signature(games):
+    # Relative paths, so a manifest built at deploy time matches on the server
+    signature = []
+    for slug, _, _, files in games:
+        for path in files:
+            stat = os.stat(path)
+            signature.append((slug, os.path.relpath(path, games_dir()), stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+def _title(path: str, slug: str) -> str:
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            m = TITLE_RE.search(f.read(4096))
+            if m:
+                return re.sub(r"\s+", " ", m.group(1)).strip()
+    except OSError:
+        pass
+    # Fallback to filename if no title
+    return slug.replace('-', ' ').replace('_', ' ').title()
+
+
+def build_manifest() -> dict:
+    games = _discover()
+    entries = []
+    for slug, entry_path, url, files in games:
+        digest = hashlib.sha256()
+        size = 0
+        for path in files:
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest.update(os.path.relpath(path, games_dir()).encode('utf-8'))
+            digest.update(data)
+            size += len(data)
+        entries.append({
+            'slug': slug,
+            'title': _title(entry_path, slug),
+            'url': f'{settings.STATIC_URL}{url}',
+            'size': size,
+            'hash': digest.hexdigest()[:16],
+            'files': [
+                f'{settings.STATIC_URL}games/' + os.path.relpath(p, games_dir()).replace(os.sep, '/')
+                for p in files
+            ],
+        })
+    version = hashlib.sha256(''.join(e['hash'] for e in entries).encode('utf-8')).hexdigest()[:16]
+    return {'version': version, 'games': entries, 'signature': _signature(games)}
+
+
+def write_manifest(manifest: dict) -> str:
+    """Write ``manifest`` atomically next to the games and return its path."""
+    path = manifest_path()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.json.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def _load(signature):
+    try:
+        with open(manifest_path(), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stored = [tuple(row) for row in manifest.get('signature', [])]
+    return manifest if stored == signature else None
+
+
+def get_manifest() -> dict:
+    """The current manifest, re-checking file mtimes at most every few seconds."""
+    interval = getattr(settings, 'GAMES_MANIFEST_CHECK_INTERVAL', 10)
+    now = time.monotonic()
+    if _state['manifest'] is not None and now - _state['checked'] < interval:
+        return _state['manifest']
+    with _lock:
+        if _state['manifest'] is not None and now - _state['checked'] < interval:
+            return _state['manifest']
+        signature = _signature(_discover())
+        if signature != _state['signature']:
+            manifest = _load(signature)
+            if manifest is None:
+                manifest = build_manifest()
+                try:
+                    write_manifest(manifest)
+                except OSError:
+                    # Read-only deployments still get the in-memory manifest
+                    pass
+            _state['manifest'] = manifest
+            _state['signature'] = signature
+        _state['checked'] = now
+        return _state['manifest']
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Question, Choice, Quiz
+
+
+def answer_key_cache_key(quiz_id) -> str:
+    return f'quiz_answer_key_{quiz_id}'
+
+
+def build_answer_key(quiz: Quiz) -> dict:
+    """Compile ``quiz`` into ``{'passing_score', 'questions': {qid: {points, correct}}}``.
+
+    Question ids are stored as strings so the key survives the JSON cache
+    serializer used in production unchanged.
+    """
+    questions = {
+        str(qid): {'points': points, 'correct': []}
+        for qid, points in Question.objects.filter(quiz=quiz).values_list('id', 'points')
+    }
+    correct = Choice.objects.filter(question__quiz=quiz, is_correct=True).values_list('question_id', 'id')
+    for qid, choice_id in correct:
+        questions[str(qid)]['correct'].append(choice_id)
+    return {'passing_score': quiz.passing_score, 'questions': questions}
+
+
+def get_answer_key(quiz: Quiz) -> dict:
+    key = answer_key_cache_key(quiz.pk)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = build_answer_key(quiz)
+        cache.set(key, answer_key, timeout=getattr(settings, 'CACHE_TTL', 60 * 15))
+    return answer_key
+
+
+def invalidate_answer_key(quiz_id) -> None:
+    cache.delete(answer_key_cache_key(quiz_id))
+
+
+def grade_answers(answer_key: dict, answers) -> dict:
+    """Grade ``answers`` (question id -> choice id) in memory against a compiled key."""
+    score = 0
+    total_points = 0
+    for qid, question in answer_key['questions'].items():
+        total_points += question['points']
+        selected = answers.get(qid)
+        try:
+            selected = int(selected)
+        except (TypeError, ValueError):
+            continue
+        if selected in question['correct']:
+            score += question['points']
+
+    percentage = (score / total_points) * 100 if total_points > 0 else 0
+    return {
+        'score': score,
+        'total_points': total_points,
+        'percentage': percentage,
+        'passed': percentage >= answer_key['passing_score'],
+    }
+
+
+def grade_quiz(quiz: Quiz, answers) -> dict:
+    return grade_answers(get_answer_key(quiz), answers)
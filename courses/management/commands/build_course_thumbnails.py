@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from courses.models import Course
+from courses.thumbnails import refresh_course_variants
+
+
+class Command(BaseCommand):
+    help = 'Generate resized and WebP thumbnail derivatives for existing course thumbnails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate derivatives even for courses that already have them.')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True).order_by('pk')
+        if not options['force']:
+            courses = courses.filter(thumbnail_variants={})
+        built = failed = 0
+        for course in courses.iterator():
+            variants = refresh_course_variants(course)
+            if variants.get('webp'):
+                built += 1
+            else:
+                failed += 1
+                self.stderr.write(f'{course.pk} ({course.title}): no derivatives written')
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives for {built} courses ({failed} without).'))
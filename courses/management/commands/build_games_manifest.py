@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from courses.games import build_manifest, write_manifest
+
+
+class Command(BaseCommand):
+    help = 'Write static/games/manifest.json (slug, title, URL, size and hash of every game). Run before collectstatic.'
+
+    def handle(self, *args, **options):
+        manifest = build_manifest()
+        path = write_manifest(manifest)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(manifest['games'])} games to {path} (version {manifest['version']})."
+        ))
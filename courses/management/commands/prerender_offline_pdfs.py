@@ -0,0 +1,61 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from courses.models import Course, Lesson
+from courses.pdf import course_pdf, lesson_pdf, render_document
+
+
+class Command(BaseCommand):
+    help = 'Pre-render offline PDFs for every offline-available course and lesson using a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', help='Only render content for this subject language (e.g. hi).')
+        parser.add_argument('--grade', type=int, help='Only render content for this class (6-12).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: CPU count).')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.filter(is_offline_available=True).select_related('subject')
+        lessons = Lesson.objects.filter(course__is_offline_available=True).select_related('course__subject')
+        if options['language']:
+            courses = courses.filter(subject__language=options['language'])
+            lessons = lessons.filter(course__subject__language=options['language'])
+        if options['grade']:
+            courses = courses.filter(subject__grade_level=options['grade'])
+            lessons = lessons.filter(course__subject__grade_level=options['grade'])
+
+        # Payloads are built here, where the database is; workers only run reportlab
+        documents = [course_pdf(c) for c in courses.prefetch_related('lesson_set')]
+        documents += [lesson_pdf(l) for l in lessons]
+        pending = [d for d in documents if not d.is_current()]
+        skipped = len(documents) - len(pending)
+        self.stdout.write(f'{len(documents)} documents, {skipped} already current, {len(pending)} to render.')
+        if not pending:
+            return
+
+        started = time.perf_counter()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {
+                pool.submit(render_document, d.kind, d.payload, d.path): d
+                for d in pending
+            }
+            for future in as_completed(futures):
+                document = futures[future]
+                label = f'{document.kind} {document.obj.pk} ({document.obj.title})'
+                try:
+                    elapsed = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f'{label}: failed: {e}'))
+                    continue
+                document.remove_stale()
+                self.stdout.write(f'{label}: {elapsed:.2f}s')
+
+        total = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {len(pending) - failed} documents in {total:.1f}s '
+            f'(skipped {skipped}, failed {failed}).'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.progress import rebuild_course_progress
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized course-level progress counters from lesson and quiz progress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild rows for this user id (repeatable).')
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only rebuild rows for this course id (repeatable).')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuilt = rebuild_course_progress(users=options['users'], courses=options['courses'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} course progress rows.'))
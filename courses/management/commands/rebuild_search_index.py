@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course and lesson full-text search index from scratch.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} courses and lessons.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.counters import repair_course_counts
+
+
+class Command(BaseCommand):
+    help = 'Verify the denormalized lesson/quiz counters on Course and fix any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted courses without fixing them.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = repair_course_counts(fix=not options['dry_run'])
+        for course, changes in drifted:
+            summary = ', '.join(f'{field} {stored}->{actual}' for field, (stored, actual) in changes.items())
+            self.stdout.write(f'{course.pk} {course.title}: {summary}')
+        verb = 'found' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} drifted courses {verb}.'))
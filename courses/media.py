@@ -0,0 +1,131 @@
+"""Serving uploaded media (lesson PDFs, audio, video, thumbnails).
+
+Unlike ``django.views.static.serve`` this works with ``DEBUG=False`` and
+supports single byte ranges (``Range`` / ``If-Range`` / 206), so interrupted
+downloads resume instead of restarting. With ``MEDIA_ACCEL`` set, the
+response only carries a header and the front-end server streams the file:
+
+* ``'nginx'``: ``X-Accel-Redirect: <MEDIA_ACCEL_PREFIX><path>``, for an
+  ``internal`` nginx location aliased to ``MEDIA_ROOT``.
+* ``'sendfile'``: ``X-Sendfile: <absolute path>`` (Apache mod_xsendfile,
+  lighttpd).
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag(stat) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """``(start, end)`` inclusive for a single ``bytes=`` range.
+
+    Returns None when the header should be ignored (absent, malformed or
+    multi-range; the whole file is sent) and ``False`` when the range cannot
+    be satisfied.
+    """
+    m = RANGE_RE.match((header or '').strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    first, last = m.group(1), m.group(2)
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime) -> bool:
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    since = parse_http_date_safe(value)
+    return since is not None and int(mtime) <= since
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _accelerated(path, relative_path):
+    mode = getattr(settings, 'MEDIA_ACCEL', None)
+    if mode == 'nginx':
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        return HttpResponse(headers={'X-Accel-Redirect': prefix + quote(relative_path)})
+    if mode == 'sendfile':
+        return HttpResponse(headers={'X-Sendfile': path})
+    return None
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    stat = os.stat(full_path)
+    etag = _etag(stat)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    response = _accelerated(full_path, path)
+    if response is None:
+        size = stat.st_size
+        byte_range = None
+        if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        start, end = byte_range or (0, size - 1)
+        length = max(0, end - start + 1)
+        body = _read_range(full_path, start, length) if request.method == 'GET' else iter(())
+        response = StreamingHttpResponse(body, status=206 if byte_range else 200)
+        response['Content-Length'] = str(length)
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Content-Type'] = content_type
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
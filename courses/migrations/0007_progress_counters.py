@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:42
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Progress = apps.get_model('courses', 'Progress')
+    stats = (
+        Progress.objects.filter(course__isnull=False, completed=True)
+        .exclude(lesson__isnull=True, quiz__isnull=True)
+        .values('user_id', 'course_id')
+        .annotate(
+            lessons=Count('id', filter=Q(lesson__isnull=False)),
+            quizzes=Count('id', filter=Q(quiz__isnull=False)),
+        )
+    )
+    for row in stats:
+        Progress.objects.filter(
+            user_id=row['user_id'], course_id=row['course_id'],
+            lesson__isnull=True, quiz__isnull=True,
+        ).update(lessons_completed=row['lessons'], quizzes_completed=row['quizzes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_enrollment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='progress',
+            name='lessons_completed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='progress',
+            name='quizzes_completed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_progress_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64)),
+                ('answers', models.JSONField(default=dict)),
+                ('score', models.IntegerField(default=0)),
+                ('total_points', models.IntegerField(default=0)),
+                ('percentage', models.FloatField(default=0)),
+                ('passed', models.BooleanField(default=False)),
+                ('client_timestamp', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='courses.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['client_timestamp'],
+                'unique_together': {('user', 'idempotency_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def install_search_index(apps, schema_editor):
+    from courses.search import install_index
+    install_index(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from courses.search import uninstall_index
+    uninstall_index(schema_editor.connection)
+
+
+def backfill_entries(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    SearchEntry = apps.get_model('courses', 'SearchEntry')
+    entries = [
+        SearchEntry(
+            kind='course', object_id=c.pk, course_id=c.pk,
+            language=c.subject.language, grade=c.subject.grade_level,
+            title=c.title, body=f"{c.description or ''}\n{c.subject.name}",
+        )
+        for c in Course.objects.select_related('subject')
+    ]
+    entries += [
+        SearchEntry(
+            kind='lesson', object_id=l.pk, course_id=l.course_id,
+            language=l.course.subject.language, grade=l.course.subject.grade_level,
+            title=l.title, body=l.content or '',
+        )
+        for l in Lesson.objects.select_related('course__subject')
+    ]
+    SearchEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_quizattempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('course', 'Course'), ('lesson', 'Lesson')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('language', models.CharField(max_length=10)),
+                ('grade', models.IntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='courses.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['language', 'grade'], name='courses_sea_languag_b33689_idx')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+        migrations.RunPython(backfill_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:49
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_counts(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Quiz = apps.get_model('courses', 'Quiz')
+    lessons = {
+        row['course_id']: row
+        for row in Lesson.objects.values('course_id').annotate(n=Count('id'), points=Sum('points'))
+    }
+    quizzes = dict(
+        Quiz.objects.values('lesson__course_id').annotate(n=Count('id'))
+        .values_list('lesson__course_id', 'n')
+    )
+    courses = list(Course.objects.all())
+    for course in courses:
+        row = lessons.get(course.pk, {})
+        course.lesson_count = row.get('n', 0)
+        course.total_lesson_points = row.get('points') or 0
+        course.quiz_count = quizzes.get(course.pk, 0)
+    Course.objects.bulk_update(courses, ['lesson_count', 'quiz_count', 'total_lesson_points'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_searchentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='quiz_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_lesson_points',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
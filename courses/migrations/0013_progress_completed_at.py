@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+def backfill_completed_at(apps, schema_editor):
+    Progress = apps.get_model('courses', 'Progress')
+    # Best available estimate for rows completed before the column existed
+    Progress.objects.filter(lesson__isnull=False, completed=True).update(completed_at=models.F('last_accessed'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_course_thumbnail_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='progress',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
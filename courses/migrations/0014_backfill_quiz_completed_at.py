@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+def backfill_quiz_completed_at(apps, schema_editor):
+    Progress = apps.get_model('courses', 'Progress')
+    Progress.objects.filter(quiz__isnull=False, completed=True, completed_at__isnull=True).update(
+        completed_at=models.F('last_accessed'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_progress_completed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_quiz_completed_at, migrations.RunPython.noop),
+    ]
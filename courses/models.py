@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -25,6 +25,12 @@ class Course(models.Model):
     points_available = models.IntegerField(default=0)
     is_offline_available = models.BooleanField(default=True)
     thumbnail = models.ImageField(upload_to=course_thumbnail_path, null=True, blank=True)
+    # Resized/WebP derivatives of the thumbnail, maintained by courses.thumbnails
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Denormalized child counts, maintained by courses.signals
+    lesson_count = models.IntegerField(default=0, editable=False)
+    quiz_count = models.IntegerField(default=0, editable=False)
+    total_lesson_points = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -53,6 +59,8 @@ class Lesson(models.Model):
         ('audio', 'Audio'),
         ('interactive', 'Interactive')
     ], default='text')
+    # Also touched when the lesson's quizzes change, see courses.conditional
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order']
@@ -60,6 +68,12 @@ class Lesson(models.Model):
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        # post_save shifts the Course counters (courses.signals); commit both or neither.
+        # delete() needs no wrapper: pre_delete already runs inside the delete's transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class Quiz(models.Model):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
@@ -70,6 +84,11 @@ class Quiz(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Same as Lesson.save: the counter shift commits with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class Question(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
     question_text = models.TextField()
@@ -95,12 +114,39 @@ class Progress(models.Model):
     score = models.IntegerField(default=0)
     points = models.IntegerField(default=0)
     percentage = models.IntegerField(default=0)
+    # Denormalized counters, maintained on course-level rows only
+    lessons_completed = models.IntegerField(default=0)
+    quizzes_completed = models.IntegerField(default=0)
     last_accessed = models.DateTimeField(auto_now=True)
+    # When a lesson row was completed or a quiz row last submitted (set by the UPDATEs in
+    # courses.progress, which skip auto_now)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         unique_together = [('user', 'lesson'), ('user', 'quiz')]
 
 
+class QuizAttempt(models.Model):
+    """A graded quiz submission, deduplicated by the client's idempotency key."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
+    idempotency_key = models.CharField(max_length=64)
+    answers = models.JSONField(default=dict)
+    score = models.IntegerField(default=0)
+    total_points = models.IntegerField(default=0)
+    percentage = models.FloatField(default=0)
+    passed = models.BooleanField(default=False)
+    client_timestamp = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('user', 'idempotency_key')]
+        ordering = ['client_timestamp']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz.title} ({self.score})"
+
+
 class Enrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
@@ -111,3 +157,30 @@ class Enrollment(models.Model):
 
     def __str__(self):
         return f"{self.user.username} -> {self.course.title}"
+
+
+class SearchEntry(models.Model):
+    """Denormalized text of a course or lesson, indexed by the search backend.
+
+    On SQLite an FTS5 table mirrors these rows through triggers; on Postgres a
+    generated tsvector column and a trigram index are added by the migration.
+    """
+    KINDS = (
+        ('course', 'Course'),
+        ('lesson', 'Lesson'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    language = models.CharField(max_length=10)
+    grade = models.IntegerField()
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = [('kind', 'object_id')]
+        indexes = [models.Index(fields=['language', 'grade'])]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.title}"
@@ -0,0 +1,209 @@
+"""Offline PDF rendering with an on-disk cache.
+
+Rendered files are keyed by object id plus a hash of everything that goes into
+the document, so a warm download is a plain file read and any content change
+produces a new file instead of serving a stale one. Each object's files live in
+their own ``<kind>/<pk>/`` directory, so cleaning up after a render only lists
+that object's files.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+# Bump when the layout below changes so cached files are re-rendered
+RENDER_VERSION = 1
+MAX_CHARS = 95
+
+
+def cache_dir() -> str:
+    return str(getattr(settings, 'OFFLINE_PDF_CACHE_DIR', settings.BASE_DIR / 'offline_pdfs'))
+
+
+def _course_payload(course) -> dict:
+    return {
+        'title': course.title,
+        'grade': course.subject.grade_level,
+        'subject': course.subject.name,
+        'difficulty': course.difficulty_level,
+        'points': course.points_available,
+        'description': course.description or '',
+        'lessons': [
+            [lesson.order or 0, lesson.title, lesson.points, lesson.estimated_time]
+            for lesson in course.lesson_set.all()
+        ],
+    }
+
+
+def _lesson_payload(lesson) -> dict:
+    return {
+        'title': lesson.title,
+        'course': lesson.course.title,
+        'grade': lesson.course.subject.grade_level,
+        'subject': lesson.course.subject.name,
+        'content': str(lesson.content or ''),
+    }
+
+
+def _fingerprint(payload: dict) -> str:
+    raw = json.dumps([RENDER_VERSION, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _draw_wrapped(p, text, y, height, cm):
+    for i in range(0, len(text), MAX_CHARS):
+        if y < 3 * cm:
+            p.showPage(); y = height - 2 * cm; p.setFont("Helvetica", 11)
+        p.drawString(2 * cm, y, text[i:i + MAX_CHARS])
+        y -= 0.5 * cm
+    return y
+
+
+def _render_course(payload: dict, path: str) -> None:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import cm
+
+    p = canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+
+    y = height - 2 * cm
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(2 * cm, y, payload['title'])
+    y -= 0.8 * cm
+    p.setFont("Helvetica", 11)
+    p.drawString(2 * cm, y, f"Class: {payload['grade']} | Subject: {payload['subject']}")
+    y -= 0.6 * cm
+    p.drawString(2 * cm, y, f"Difficulty: {payload['difficulty']} | Points: {payload['points']}")
+    y -= 1.0 * cm
+
+    # Description block
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(2 * cm, y, "Description")
+    y -= 0.6 * cm
+    p.setFont("Helvetica", 11)
+    y = _draw_wrapped(p, payload['description'], y, height, cm)
+
+    # Lessons
+    y -= 0.5 * cm
+    p.setFont("Helvetica-Bold", 12)
+    if y < 3 * cm:
+        p.showPage(); y = height - 2 * cm
+    p.drawString(2 * cm, y, "Lessons")
+    y -= 0.6 * cm
+    p.setFont("Helvetica", 11)
+    if not payload['lessons']:
+        p.drawString(2 * cm, y, "No lessons available.")
+    for order, title, points, estimated_time in payload['lessons']:
+        line = f"{order}. {title} (Points: {points}, Est: {estimated_time} min)"
+        if y < 3 * cm:
+            p.showPage(); y = height - 2 * cm; p.setFont("Helvetica", 11)
+        p.drawString(2 * cm, y, line)
+        y -= 0.5 * cm
+
+    p.showPage()
+    p.save()
+
+
+def _render_lesson(payload: dict, path: str) -> None:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import cm
+
+    p = canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+
+    y = height - 2 * cm
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(2 * cm, y, payload['title'])
+    y -= 0.8 * cm
+    p.setFont("Helvetica", 11)
+    p.drawString(2 * cm, y, f"Course: {payload['course']}")
+    y -= 0.6 * cm
+    p.drawString(2 * cm, y, f"Class: {payload['grade']} | Subject: {payload['subject']}")
+    y -= 1.0 * cm
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(2 * cm, y, "Content")
+    y -= 0.6 * cm
+    p.setFont("Helvetica", 11)
+    _draw_wrapped(p, payload['content'], y, height, cm)
+
+    p.showPage()
+    p.save()
+
+
+RENDERERS = {
+    'course': (_course_payload, _render_course),
+    'lesson': (_lesson_payload, _render_lesson),
+}
+
+
+def render_document(kind: str, payload: dict, path: str) -> float:
+    """Render ``payload`` to ``path`` atomically and return the seconds spent.
+
+    Needs no database access, so it can run in a worker process.
+    """
+    started = time.perf_counter()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.pdf.tmp')
+    os.close(fd)
+    try:
+        RENDERERS[kind][1](payload, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return time.perf_counter() - started
+
+
+class OfflinePDF:
+    """A cached offline document: its path on disk and its content fingerprint."""
+
+    def __init__(self, kind: str, obj):
+        self.kind = kind
+        self.obj = obj
+        self.payload = RENDERERS[kind][0](obj)
+        self.etag = _fingerprint(self.payload)
+        self.path = os.path.join(self.directory, f'{kind}_{obj.pk}_{self.etag}.pdf')
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(cache_dir(), self.kind, str(self.obj.pk))
+
+    @property
+    def filename(self) -> str:
+        return f"{self.obj.title.replace(' ', '_')}.pdf"
+
+    def is_current(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def ensure(self) -> bool:
+        """Render the file if it is missing. Returns True when a render happened."""
+        if self.is_current():
+            return False
+        render_document(self.kind, self.payload, self.path)
+        self.remove_stale()
+        return True
+
+    def remove_stale(self) -> None:
+        current = os.path.basename(self.path)
+        for entry in os.listdir(self.directory):
+            if entry.endswith('.pdf') and entry != current:
+                try:
+                    os.remove(os.path.join(self.directory, entry))
+                except OSError:
+                    pass
+
+
+def course_pdf(course) -> OfflinePDF:
+    return OfflinePDF('course', course)
+
+
+def lesson_pdf(lesson) -> OfflinePDF:
+    return OfflinePDF('lesson', lesson)
@@ -0,0 +1,379 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Subquery
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from .catalog import FEATURED, bump_version_on_commit
+from .grading import get_answer_key, grade_answers
+from .models import Course, Lesson, Quiz, Progress, Enrollment, QuizAttempt
+
+
+# Course-level Progress rows are the ones tied to a course but to no lesson/quiz.
+COURSE_LEVEL = Q(course__isnull=False, lesson__isnull=True, quiz__isnull=True)
+
+
+def get_or_create_course_progress(user, course: Course) -> Progress:
+    existing = (
+        Progress.objects.filter(COURSE_LEVEL, user=user, course=course)
+        .order_by('id')
+        .first()
+    )
+    if existing:
+        return existing
+    return Progress.objects.create(user=user, course=course, completed=False)
+
+
+def get_or_create_unique_lesson_progress(user, lesson: Lesson) -> Progress:
+    existing = (
+        Progress.objects.filter(user=user, lesson=lesson)
+        .order_by('id')
+        .first()
+    )
+    if existing:
+        return existing
+    return Progress.objects.create(user=user, lesson=lesson, course=lesson.course)
+
+
+def get_or_create_unique_quiz_progress(user, quiz: Quiz) -> Progress:
+    existing = (
+        Progress.objects.filter(user=user, quiz=quiz)
+        .order_by('id')
+        .first()
+    )
+    if existing:
+        return existing
+    return Progress.objects.create(user=user, quiz=quiz, course=quiz.lesson.course)
+
+
+def ensure_course_progress_rows(user) -> None:
+    """Bulk-create a course-level Progress row for every enrollment missing one."""
+    existing = Progress.objects.filter(COURSE_LEVEL, user=user).values('course_id')
+    missing_course_ids = list(
+        Enrollment.objects.filter(user=user)
+        .exclude(course_id__in=Subquery(existing))
+        .values_list('course_id', flat=True)
+    )
+    if missing_course_ids:
+        Progress.objects.bulk_create([
+            Progress(user=user, course_id=course_id, completed=False)
+            for course_id in missing_course_ids
+        ])
+
+
+def bulk_enroll(user_ids, course_ids, batch_size=500) -> dict:
+    """Enroll every user in every course, with course-level Progress rows.
+
+    Runs as a handful of statements in one transaction; existing enrollments
+    and rows are left alone. Returns how many of each were created.
+    """
+    user_ids, course_ids = set(user_ids), set(course_ids)
+    pairs = {(u, c) for u in user_ids for c in course_ids}
+    if not pairs:
+        return {'enrollments_created': 0, 'progress_created': 0}
+    with transaction.atomic():
+        enrolled = set(
+            Enrollment.objects.filter(user_id__in=user_ids, course_id__in=course_ids)
+            .values_list('user_id', 'course_id')
+        )
+        new_enrollments = sorted(pairs - enrolled)
+        Enrollment.objects.bulk_create(
+            [Enrollment(user_id=u, course_id=c) for u, c in new_enrollments],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+        # Course-level rows have no unique constraint to conflict on, so skip existing ones
+        tracked = set(
+            Progress.objects.filter(COURSE_LEVEL, user_id__in=user_ids, course_id__in=course_ids)
+            .values_list('user_id', 'course_id')
+        )
+        new_rows = sorted(pairs - tracked)
+        Progress.objects.bulk_create(
+            [Progress(user_id=u, course_id=c, completed=False) for u, c in new_rows],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+    if new_enrollments:
+        # bulk_create skips the post_save handler that normally does this
+        bump_version_on_commit(FEATURED)
+    return {'enrollments_created': len(new_enrollments), 'progress_created': len(new_rows)}
+
+
+def course_progress_summary(user):
+    """Course-level Progress rows with their courses, in one SQL statement.
+
+    Completion counters live on the row and lesson/quiz totals on the course,
+    so nothing is aggregated per request.
+    """
+    return (
+        Progress.objects.filter(COURSE_LEVEL, user=user)
+        .select_related('course', 'course__subject')
+        .order_by('id')
+    )
+
+
+def _completion(total_lessons, lessons=0) -> dict:
+    """``percentage`` and ``completed`` update values for ``lessons_completed + lessons``."""
+    if not total_lessons:
+        return {'percentage': 0, 'completed': False}
+    return {
+        'percentage': Least((F('lessons_completed') + lessons) * 100 / total_lessons, 100),
+        'completed': models.Case(
+            models.When(lessons_completed__gte=total_lessons - lessons, then=True),
+            default=False,
+        ),
+    }
+
+
+def _lesson_total(course_id) -> int:
+    return Course.objects.filter(pk=course_id).values_list('lesson_count', flat=True).first() or 0
+
+
+def apply_course_progress_delta(user, course: Course, lessons=0, quizzes=0, points=0) -> None:
+    """Atomically shift the course-level counters and refresh the percentage.
+
+    The UPDATE reads the pre-update column values, so the percentage and
+    completion flag are derived from ``lessons_completed + lessons``.
+    """
+    if not (lessons or quizzes or points):
+        return
+    course_prog = get_or_create_course_progress(user, course)
+    # Read the maintained counter fresh; ``course`` may predate newly added lessons
+    Progress.objects.filter(pk=course_prog.pk).update(
+        lessons_completed=F('lessons_completed') + lessons,
+        quizzes_completed=F('quizzes_completed') + quizzes,
+        points=F('points') + points,
+        **_completion(_lesson_total(course.pk), lessons),
+    )
+
+
+def refresh_course_percentages(course_id) -> int:
+    """Recompute every course-level row's percentage from the course's current lesson count.
+
+    Called when lessons are added, moved or removed, so existing percentages
+    do not keep the old denominator. One UPDATE; returns the rows touched.
+    """
+    if course_id is None:
+        return 0
+    return Progress.objects.filter(COURSE_LEVEL, course_id=course_id).update(
+        **_completion(_lesson_total(course_id))
+    )
+
+
+def complete_lesson(user, lesson: Lesson) -> bool:
+    """Mark ``lesson`` complete and update the course counters.
+
+    Returns True when this call transitioned the lesson to completed. The
+    transition is a conditional UPDATE, so concurrent submissions from the
+    same student cannot double count.
+    """
+    progress = get_or_create_unique_lesson_progress(user, lesson)
+    with transaction.atomic():
+        newly_completed = Progress.objects.filter(pk=progress.pk, completed=False).update(
+            completed=True, points=lesson.points, completed_at=timezone.now(),
+        )
+        if newly_completed:
+            apply_course_progress_delta(user, lesson.course, lessons=1, points=lesson.points)
+        elif progress.points != lesson.points:
+            # Lesson points were edited since the first completion
+            Progress.objects.filter(pk=progress.pk).update(points=lesson.points)
+            apply_course_progress_delta(user, lesson.course, points=lesson.points - progress.points)
+    return bool(newly_completed)
+
+
+def record_quiz_result(user, quiz: Quiz, score: int) -> bool:
+    """Store the latest score for ``quiz`` and count its first completion."""
+    course = quiz.lesson.course
+    progress = get_or_create_unique_quiz_progress(user, quiz)
+    with transaction.atomic():
+        now = timezone.now()
+        newly_completed = Progress.objects.filter(pk=progress.pk, completed=False).update(
+            completed=True, score=score, completed_at=now,
+        )
+        if newly_completed:
+            apply_course_progress_delta(user, course, quizzes=1)
+        else:
+            Progress.objects.filter(pk=progress.pk).update(score=score, completed_at=now)
+    return bool(newly_completed)
+
+
+def record_quiz_attempts(user, attempts) -> dict:
+    """Grade and persist a batch of offline quiz attempts in one pass.
+
+    ``attempts`` are validated dicts with ``quiz``, ``answers``,
+    ``client_timestamp`` and ``idempotency_key``. Attempts whose key was
+    already recorded are answered from the stored result and not re-applied.
+    Quiz progress rows are upserted in bulk and each affected course gets a
+    single counter update. Returns ``{'results': [...], 'errors': [...]}``.
+    """
+    keys = [a['idempotency_key'] for a in attempts]
+    seen = {
+        attempt.idempotency_key: attempt
+        for attempt in QuizAttempt.objects.filter(user=user, idempotency_key__in=keys)
+    }
+    quizzes = Quiz.objects.select_related('lesson__course').in_bulk(
+        {a['quiz'] for a in attempts}
+    )
+
+    results, errors, new_attempts = [], [], []
+    for attempt in attempts:
+        key = attempt['idempotency_key']
+        if key in seen:
+            prior = seen[key]
+            results.append(_attempt_result(prior, duplicate=True))
+            continue
+        quiz = quizzes.get(attempt['quiz'])
+        if quiz is None:
+            errors.append({'idempotency_key': key, 'error': 'Quiz not found'})
+            continue
+        answers = {str(k): v for k, v in (attempt.get('answers') or {}).items()}
+        graded = grade_answers(get_answer_key(quiz), answers)
+        record = QuizAttempt(
+            user=user, quiz=quiz, idempotency_key=key, answers=answers,
+            client_timestamp=attempt['client_timestamp'], **graded,
+        )
+        seen[key] = record  # a key repeated inside the batch is applied once
+        new_attempts.append(record)
+        results.append(_attempt_result(record, duplicate=False))
+
+    if new_attempts:
+        with transaction.atomic():
+            inserted = _insert_attempts(user, new_attempts)
+            _apply_quiz_attempts(user, inserted)
+        lost = {a.idempotency_key for a in new_attempts} - {a.idempotency_key for a in inserted}
+        if lost:
+            # A concurrent replay stored these first; answer from its rows
+            stored = {
+                attempt.idempotency_key: attempt
+                for attempt in QuizAttempt.objects.filter(user=user, idempotency_key__in=lost)
+            }
+            results = [
+                _attempt_result(stored[r['idempotency_key']], duplicate=True)
+                if r['idempotency_key'] in stored and not r['duplicate'] else r
+                for r in results
+            ]
+    return {'results': results, 'errors': errors}
+
+
+def _insert_attempts(user, attempts, retries=3) -> list:
+    """Insert ``attempts`` and return them, minus keys a concurrent replay stored first."""
+    for attempt_no in range(retries):
+        try:
+            with transaction.atomic():
+                QuizAttempt.objects.bulk_create(attempts)
+            return attempts
+        except IntegrityError:
+            if attempt_no == retries - 1:
+                raise
+        stored = set(
+            QuizAttempt.objects.filter(user=user, idempotency_key__in=[a.idempotency_key for a in attempts])
+            .values_list('idempotency_key', flat=True)
+        )
+        attempts = [a for a in attempts if a.idempotency_key not in stored]
+        for a in attempts:
+            # The rolled-back insert may have assigned primary keys
+            a.pk = None
+            a._state.adding = True
+    return attempts
+
+
+def _attempt_result(attempt: QuizAttempt, duplicate: bool) -> dict:
+    return {
+        'idempotency_key': attempt.idempotency_key,
+        'quiz': attempt.quiz_id,
+        'score': attempt.score,
+        'total_points': attempt.total_points,
+        'percentage': attempt.percentage,
+        'passed': attempt.passed,
+        'duplicate': duplicate,
+    }
+
+
+def _apply_quiz_attempts(user, attempts) -> None:
+    """Upsert quiz Progress rows from ``attempts`` and bump course counters once per course."""
+    latest = {}
+    for attempt in sorted(attempts, key=lambda a: a.client_timestamp):
+        latest[attempt.quiz_id] = attempt
+
+    existing = {
+        prog.quiz_id: prog
+        for prog in Progress.objects.filter(user=user, quiz_id__in=latest.keys()).order_by('-id')
+    }
+    to_create, to_update = [], []
+    newly_completed = {}
+    for quiz_id, attempt in latest.items():
+        prog = existing.get(quiz_id)
+        if prog is None:
+            to_create.append(Progress(
+                user=user, quiz_id=quiz_id, course=attempt.quiz.lesson.course,
+                completed=True, score=attempt.score, completed_at=attempt.client_timestamp,
+            ))
+            first_completion = True
+        else:
+            first_completion = not prog.completed
+            prog.completed = True
+            # An attempt taken before the stored result must not overwrite its score
+            if prog.completed_at is None or attempt.client_timestamp >= prog.completed_at:
+                prog.score = attempt.score
+                prog.completed_at = attempt.client_timestamp
+            to_update.append(prog)
+        if first_completion:
+            course = attempt.quiz.lesson.course
+            newly_completed.setdefault(course.pk, [course, 0])[1] += 1
+
+    Progress.objects.bulk_create(to_create)
+    Progress.objects.bulk_update(to_update, ['completed', 'score', 'completed_at'])
+    for course, count in newly_completed.values():
+        apply_course_progress_delta(user, course, quizzes=count)
+
+
+def rebuild_course_progress(users=None, courses=None) -> int:
+    """Recompute course-level counters from the lesson/quiz Progress rows.
+
+    This is the repair path for the incrementally maintained counters. It
+    runs a handful of grouped queries and one ``bulk_update`` regardless of
+    how many rows are rebuilt. Returns the number of course rows written.
+    """
+    detail = Progress.objects.filter(course__isnull=False, completed=True).exclude(COURSE_LEVEL)
+    course_rows = Progress.objects.filter(COURSE_LEVEL)
+    if users is not None:
+        detail = detail.filter(user__in=users)
+        course_rows = course_rows.filter(user__in=users)
+    if courses is not None:
+        detail = detail.filter(course__in=courses)
+        course_rows = course_rows.filter(course__in=courses)
+
+    stats = {
+        (row['user_id'], row['course_id']): row
+        for row in detail.values('user_id', 'course_id').annotate(
+            lessons=models.Count('id', filter=Q(lesson__isnull=False)),
+            quizzes=models.Count('id', filter=Q(quiz__isnull=False)),
+            points=Coalesce(models.Sum('points', filter=Q(lesson__isnull=False)), 0),
+        )
+    }
+
+    # Users with lesson/quiz activity but no course row get one created
+    have_rows = set(course_rows.values_list('user_id', 'course_id'))
+    Progress.objects.bulk_create([
+        Progress(user_id=user_id, course_id=course_id, completed=False)
+        for user_id, course_id in stats.keys() - have_rows
+    ])
+
+    lesson_totals = dict(
+        Course.objects.filter(pk__in=course_rows.values('course_id'))
+        .values_list('pk', 'lesson_count')
+    )
+    updated = []
+    for prog in course_rows.order_by('id'):
+        row = stats.get((prog.user_id, prog.course_id), {})
+        total = lesson_totals.get(prog.course_id, 0)
+        prog.lessons_completed = row.get('lessons', 0)
+        prog.quizzes_completed = row.get('quizzes', 0)
+        prog.points = row.get('points', 0)
+        prog.percentage = min(int(prog.lessons_completed * 100 / total), 100) if total else 0
+        prog.completed = prog.percentage == 100
+        updated.append(prog)
+    Progress.objects.bulk_update(
+        updated,
+        ['lessons_completed', 'quizzes_completed', 'points', 'percentage', 'completed'],
+        batch_size=500,
+    )
+    return len(updated)
+
@@ -0,0 +1,236 @@
+"""Ranked full-text search over courses and lessons.
+
+``SearchEntry`` rows hold the searchable text. The database-specific index
+on top of them is installed by migration:
+
+* SQLite: an external-content FTS5 table kept in sync by triggers, ranked
+  with bm25. Devanagari and Odia vowel signs are declared token characters,
+  otherwise ``unicode61`` would split words at every matra.
+* Postgres: a generated ``tsvector`` column plus a ``pg_trgm`` index on the
+  title, ranked with ``ts_rank`` + trigram similarity.
+
+Other databases fall back to ``icontains`` over the same rows.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Course, Lesson, SearchEntry
+
+FTS_TABLE = 'courses_search_fts'
+ENTRY_TABLE = SearchEntry._meta.db_table
+
+INDIC_TOKENCHARS = ''.join(
+    chr(code)
+    for start, end in ((0x0900, 0x0980), (0x0B00, 0x0B80))  # Devanagari, Odia
+    for code in range(start, end)
+    if unicodedata.category(chr(code)) in ('Mn', 'Mc')
+)
+
+_TOKEN_RE = re.compile(r"[^\s\"'()*:&|!<>^+\-.,;?/\\]+")
+
+
+def install_index(conn) -> None:
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"title, body, content='{ENTRY_TABLE}', content_rowid='id', "
+                f"tokenize=\"unicode61 tokenchars '{INDIC_TOKENCHARS}'\")"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ENTRY_TABLE} BEGIN "
+                f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ENTRY_TABLE} BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) "
+                f"VALUES ('delete', old.id, old.title, old.body); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {ENTRY_TABLE} BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) "
+                f"VALUES ('delete', old.id, old.title, old.body); "
+                f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+            )
+        elif conn.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"ALTER TABLE {ENTRY_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {ENTRY_TABLE}_vector_idx "
+                f"ON {ENTRY_TABLE} USING GIN (search_vector)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {ENTRY_TABLE}_title_trgm_idx "
+                f"ON {ENTRY_TABLE} USING GIN (title gin_trgm_ops)"
+            )
+
+
+def uninstall_index(conn) -> None:
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {ENTRY_TABLE}_title_trgm_idx")
+            cursor.execute(f"DROP INDEX IF EXISTS {ENTRY_TABLE}_vector_idx")
+            cursor.execute(f"ALTER TABLE {ENTRY_TABLE} DROP COLUMN IF EXISTS search_vector")
+
+
+# --- Keeping entries up to date ---
+
+def _course_entry(course: Course) -> dict:
+    return {
+        'course_id': course.pk,
+        'language': course.subject.language,
+        'grade': course.subject.grade_level,
+        'title': course.title,
+        'body': f"{course.description or ''}\n{course.subject.name}",
+    }
+
+
+def _lesson_entry(lesson: Lesson) -> dict:
+    return {
+        'course_id': lesson.course_id,
+        'language': lesson.course.subject.language,
+        'grade': lesson.course.subject.grade_level,
+        'title': lesson.title,
+        'body': lesson.content or '',
+    }
+
+
+def index_course(course: Course) -> None:
+    SearchEntry.objects.update_or_create(kind='course', object_id=course.pk, defaults=_course_entry(course))
+
+
+def index_lesson(lesson: Lesson) -> None:
+    SearchEntry.objects.update_or_create(kind='lesson', object_id=lesson.pk, defaults=_lesson_entry(lesson))
+
+
+def remove_from_index(kind: str, object_id) -> None:
+    SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild_index(batch_size=500) -> int:
+    """Drop and re-create every entry. Returns the number of entries written."""
+    SearchEntry.objects.all().delete()
+    entries = [
+        SearchEntry(kind='course', object_id=c.pk, **_course_entry(c))
+        for c in Course.objects.select_related('subject').iterator()
+    ]
+    entries += [
+        SearchEntry(kind='lesson', object_id=l.pk, **_lesson_entry(l))
+        for l in Lesson.objects.select_related('course__subject').iterator()
+    ]
+    SearchEntry.objects.bulk_create(entries, batch_size=batch_size)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return len(entries)
+
+
+# --- Querying ---
+
+def _tokens(query: str):
+    return _TOKEN_RE.findall(query or '')[:8]
+
+
+def _sqlite_hits(tokens, filters, params):
+    # Every token is a quoted prefix term, so partial words match while typing
+    match = ' '.join(f'"{t}"*' for t in tokens)
+    # bm25 is "lower is better"; flip it so both backends rank descending
+    sql = (
+        f"SELECT e.kind, e.object_id, e.course_id, e.title, -bm25({FTS_TABLE}, 5.0, 1.0) AS rank "
+        f"FROM {FTS_TABLE} JOIN {ENTRY_TABLE} e ON e.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s{filters}"
+    )
+    return sql, [match, *params]
+
+
+def _postgres_hits(tokens, filters, params):
+    tsquery = ' & '.join(f"{t}:*" for t in tokens)
+    phrase = ' '.join(tokens)
+    sql = (
+        f"SELECT e.kind, e.object_id, e.course_id, e.title, "
+        f"ts_rank(e.search_vector, q) + similarity(e.title, %s) AS rank "
+        f"FROM {ENTRY_TABLE} e, to_tsquery('simple', %s) q "
+        f"WHERE (e.search_vector @@ q OR e.title %% %s){filters}"
+    )
+    return sql, [phrase, tsquery, phrase, *params]
+
+
+def _hits(tokens, language, grade):
+    """SQL and params selecting every ranked hit, for the current database."""
+    filters, params = '', []
+    if language:
+        filters += ' AND e.language = %s'
+        params.append(language)
+    if grade:
+        filters += ' AND e.grade = %s'
+        params.append(grade)
+    if connection.vendor == 'sqlite':
+        return _sqlite_hits(tokens, filters, params)
+    return _postgres_hits(tokens, filters, params)
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _fallback_entries(tokens, language, grade):
+    qs = SearchEntry.objects.all()
+    for token in tokens:
+        qs = qs.filter(Q(title__icontains=token) | Q(body__icontains=token))
+    if language:
+        qs = qs.filter(language=language)
+    if grade:
+        qs = qs.filter(grade=grade)
+    return qs
+
+
+def _ranked_backend() -> bool:
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def search(query: str, language=None, grade=None, limit=50):
+    """Return ranked ``(kind, object_id, course_id, title, rank)`` hits, best first."""
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    if not _ranked_backend():
+        rows = _fallback_entries(tokens, language, grade).values_list('kind', 'object_id', 'course_id', 'title')
+        return [(*row, 0.0) for row in rows[:limit]]
+    sql, params = _hits(tokens, language, grade)
+    return _fetch(f"{sql} ORDER BY rank DESC LIMIT %s", [*params, limit])
+
+
+def search_course_ids(query: str, language=None, grade=None, limit=200):
+    """Up to ``limit`` course ids ordered by their best course or lesson hit.
+
+    Hits are grouped per course in SQL before the limit applies, so courses
+    with many matching lessons cannot crowd the others out.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    if not _ranked_backend():
+        entries = _fallback_entries(tokens, language, grade).order_by('course_id')
+        return list(entries.values_list('course_id', flat=True).distinct()[:limit])
+    sql, params = _hits(tokens, language, grade)
+    # MATERIALIZED keeps SQLite from flattening bm25() into the aggregate, where it cannot run
+    rows = _fetch(
+        f"WITH hits AS MATERIALIZED ({sql}) "
+        f"SELECT course_id FROM hits GROUP BY course_id ORDER BY MAX(rank) DESC, course_id LIMIT %s",
+        [*params, limit],
+    )
+    return [course_id for course_id, in rows]
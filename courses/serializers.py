@@ -1,42 +1,110 @@
 from rest_framework import serializers
 from .models import Subject, Course, Lesson, Quiz, Question, Choice, Progress
 
-class ChoiceSerializer(serializers.ModelSerializer):
+
+def split_names(value):
+    """``'id,lessons.title'`` -> ``['id', 'lessons.title']``; accepts a list too."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value if name and name.strip()]
+
+
+def _nested(names, prefix):
+    return [name.split('.', 1)[1] for name in names if name.startswith(prefix + '.')]
+
+
+def _prune(serializer, names):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    keep = {name.split('.', 1)[0] for name in names}
+    for name in list(serializer.fields):
+        if name not in keep:
+            serializer.fields.pop(name)
+            continue
+        nested = _nested(names, name)
+        if nested and isinstance(serializer.fields[name], serializers.BaseSerializer):
+            _prune(serializer.fields[name], nested)
+
+
+class SparseFieldsMixin:
+    """Serializer that can drop fields and opt into nested relations.
+
+    ``expand`` adds relations listed in ``expandable_fields``; ``fields`` then
+    keeps only the named fields. Dotted names reach into nested serializers,
+    e.g. ``fields=id,title,lessons.title&expand=lessons.quizzes``.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = split_names(fields), split_names(expand) or []
+        for name, (serializer_class, options) in self.expandable_fields.items():
+            nested_expand = _nested(expand, name)
+            if name in expand or nested_expand:
+                self.fields[name] = serializer_class(expand=nested_expand, read_only=True, **options)
+        if fields:
+            _prune(self, fields)
+
+
+class ChoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Choice
         fields = ('id', 'choice_text', 'is_correct')
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True, read_only=True, source='choice_set')
     
     class Meta:
         model = Question
         fields = ('id', 'question_text', 'points', 'choices')
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True, source='question_set')
     
     class Meta:
         model = Quiz
         fields = ('id', 'title', 'description', 'passing_score', 'points', 'questions')
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     quiz_set = QuizSerializer(many=True, read_only=True)
     
     class Meta:
         model = Lesson
         fields = ('id', 'title', 'content', 'order', 'estimated_time', 'points', 'quiz_set')
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True, source='lesson_set')
     
     class Meta:
         model = Course
         fields = ('id', 'subject', 'title', 'description', 'difficulty_level', 
                  'points_available', 'is_offline_available', 'created_at', 
-                 'updated_at', 'lessons')
+                 'updated_at', 'lesson_count', 'quiz_count', 'lessons')
+
+class LessonListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # No content text or quiz tree; ask for them with ?expand=quizzes or the detail route
+    expandable_fields = {
+        'quizzes': (QuizSerializer, {'source': 'quiz_set', 'many': True}),
+    }
+
+    class Meta:
+        model = Lesson
+        fields = ('id', 'course', 'title', 'order', 'estimated_time', 'points')
 
-class SubjectSerializer(serializers.ModelSerializer):
+class CourseListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'lessons': (LessonListSerializer, {'source': 'lesson_set', 'many': True}),
+    }
+
+    class Meta:
+        model = Course
+        fields = ('id', 'subject', 'title', 'description', 'difficulty_level',
+                  'points_available', 'is_offline_available', 'updated_at',
+                  'lesson_count', 'quiz_count')
+
+class SubjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     courses = CourseSerializer(many=True, read_only=True, source='course_set')
     
     class Meta:
@@ -47,3 +115,50 @@ class ProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = Progress
         fields = ('id', 'user', 'lesson', 'completed', 'score', 'last_accessed')
+
+def prefetch_paths(serializer, prefix=''):
+    """Relation paths to prefetch so ``serializer`` renders without per-row queries.
+
+    Walks nested serializers (and many-to-many fields) and returns lookups such
+    as ``course_set__lesson_set__quiz_set`` for ``prefetch_related``.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    paths = []
+    for field in serializer.fields.values():
+        if field.source == '*':
+            continue
+        path = prefix + field.source.replace('.', '__')
+        if isinstance(field, serializers.ManyRelatedField):
+            paths.append(path)
+        elif isinstance(field, serializers.BaseSerializer):
+            paths.append(path)
+            paths.extend(prefetch_paths(field, path + '__'))
+    return paths
+
+class QuizAnswersSerializer(serializers.Serializer):
+    answers = serializers.DictField(required=False, default=dict)
+
+class QuizAttemptSubmissionSerializer(serializers.Serializer):
+    quiz = serializers.IntegerField()
+    answers = serializers.DictField(required=False, default=dict)
+    client_timestamp = serializers.DateTimeField()
+    idempotency_key = serializers.CharField(max_length=64)
+
+class QuizAttemptBatchSerializer(serializers.Serializer):
+    attempts = QuizAttemptSubmissionSerializer(many=True, allow_empty=False, max_length=200)
+
+class BulkEnrollmentSerializer(serializers.Serializer):
+    courses = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=50)
+    # Students are picked by id and/or by profile filters
+    users = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    grade = serializers.IntegerField(required=False, min_value=6, max_value=12)
+    school = serializers.CharField(required=False, max_length=200)
+    village = serializers.CharField(required=False, max_length=200)
+
+    def validate(self, attrs):
+        if not any(key in attrs for key in ('users', 'grade', 'school', 'village')):
+            raise serializers.ValidationError('Give users or at least one of grade, school, village.')
+        return attrs
@@ -0,0 +1,216 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+import logging
+
+from .catalog import CATALOG, FEATURED, bump_version_on_commit
+from .conditional import touch_content
+from .counters import shift_course_counts
+from .grading import invalidate_answer_key
+from .models import Subject, Course, Lesson, Quiz, Question, Choice, Enrollment
+from .search import index_course, index_lesson, remove_from_index
+from .tasks import render_offline_pdf
+from .thumbnails import delete_variants, refresh_course_variants
+
+logger = logging.getLogger(__name__)
+
+
+def _invalidate_answer_keys(*quiz_ids):
+    quiz_ids = {pk for pk in quiz_ids if pk is not None}
+
+    def invalidate():
+        for quiz_id in quiz_ids:
+            invalidate_answer_key(quiz_id)
+
+    # Now for reads later in this transaction, and again after commit in case
+    # another request cached the old key from the committed rows meanwhile
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    _invalidate_answer_keys(instance.pk)
+    bump_version_on_commit(CATALOG)
+    # The quiz may have moved; both lessons' validators change
+    touch_content(lesson_ids=(instance.lesson_id, instance._counted_lesson_id))
+
+
+@receiver(post_init, sender=Question)
+def question_snapshot(sender, instance, **kwargs):
+    instance._saved_quiz_id = instance.__dict__.get('quiz_id')
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    # A question moved to another quiz changes both answer keys
+    quiz_ids = (instance.quiz_id, instance._saved_quiz_id)
+    _invalidate_answer_keys(*quiz_ids)
+    touch_content(lesson_ids=Quiz.objects.filter(pk__in=quiz_ids).values_list('lesson_id', flat=True))
+    instance._saved_quiz_id = instance.quiz_id
+
+
+@receiver(post_init, sender=Choice)
+def choice_snapshot(sender, instance, **kwargs):
+    instance._saved_question_id = instance.__dict__.get('question_id')
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    # During cascades the question may already be gone; its own handler covers that
+    quiz_ids = set(
+        Question.objects.filter(pk__in=(instance.question_id, instance._saved_question_id))
+        .values_list('quiz_id', flat=True)
+    )
+    if quiz_ids:
+        _invalidate_answer_keys(*quiz_ids)
+        touch_content(lesson_ids=Quiz.objects.filter(pk__in=quiz_ids).values_list('lesson_id', flat=True))
+    instance._saved_question_id = instance.question_id
+
+
+def _schedule_pdf_render(kind, object_id):
+    if not getattr(settings, 'OFFLINE_PDF_PRERENDER', False):
+        return
+
+    def enqueue():
+        try:
+            render_offline_pdf.delay(kind, object_id)
+        except Exception as e:
+            # Downloads still render inline on a cold miss
+            logger.warning(f"Could not queue PDF render for {kind} {object_id}: {e}")
+
+    transaction.on_commit(enqueue)
+
+
+@receiver(post_save, sender=Subject)
+def subject_saved(sender, instance, created, **kwargs):
+    # Course entries carry the subject's name, language and grade
+    if created:
+        return
+    touch_content(course_ids=instance.course_set.values_list('pk', flat=True))
+    for course in instance.course_set.select_related('subject'):
+        index_course(course)
+    for lesson in Lesson.objects.filter(course__subject=instance).select_related('course__subject'):
+        index_lesson(lesson)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, **kwargs):
+    index_course(instance)
+    _schedule_pdf_render('course', instance.pk)
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, **kwargs):
+    index_lesson(instance)
+    touch_content(course_ids=(instance.course_id, instance._counted_course_id))
+    _schedule_pdf_render('lesson', instance.pk)
+    # The course PDF lists its lessons
+    _schedule_pdf_render('course', instance.course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, **kwargs):
+    remove_from_index('lesson', instance.pk)
+    touch_content(course_ids=(instance.course_id,))
+    _schedule_pdf_render('course', instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Lesson)
+def catalog_content_changed(sender, **kwargs):
+    bump_version_on_commit(CATALOG, FEATURED)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, **kwargs):
+    bump_version_on_commit(FEATURED)
+
+
+# --- Denormalized Course.lesson_count / quiz_count / total_lesson_points ---
+
+@receiver(post_init, sender=Lesson)
+def lesson_snapshot(sender, instance, **kwargs):
+    # Values as last persisted, so saves can be turned into counter deltas
+    instance._counted_course_id = instance.__dict__.get('course_id')
+    instance._counted_points = instance.__dict__.get('points') or 0
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_counts_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    points = instance.points or 0
+    if created:
+        shift_course_counts(instance.course_id, lessons=1, points=points)
+    elif instance.course_id != instance._counted_course_id:
+        quizzes = Quiz.objects.filter(lesson=instance).count()
+        shift_course_counts(instance._counted_course_id, lessons=-1, quizzes=-quizzes,
+                            points=-instance._counted_points)
+        shift_course_counts(instance.course_id, lessons=1, quizzes=quizzes, points=points)
+    else:
+        shift_course_counts(instance.course_id, points=points - instance._counted_points)
+    instance._counted_course_id = instance.course_id
+    instance._counted_points = points
+
+
+@receiver(pre_delete, sender=Lesson)
+def lesson_counts_deleted(sender, instance, **kwargs):
+    # Runs inside the delete's transaction; the lesson's quizzes decrement themselves
+    shift_course_counts(instance._counted_course_id, lessons=-1, points=-instance._counted_points)
+
+
+def _course_of_lesson(lesson_id):
+    return Lesson.objects.filter(pk=lesson_id).values_list('course_id', flat=True).first()
+
+
+@receiver(post_init, sender=Quiz)
+def quiz_snapshot(sender, instance, **kwargs):
+    instance._counted_lesson_id = instance.__dict__.get('lesson_id')
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_counts_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        shift_course_counts(_course_of_lesson(instance.lesson_id), quizzes=1)
+    elif instance.lesson_id != instance._counted_lesson_id:
+        old_course_id = _course_of_lesson(instance._counted_lesson_id)
+        new_course_id = _course_of_lesson(instance.lesson_id)
+        if old_course_id != new_course_id:
+            shift_course_counts(old_course_id, quizzes=-1)
+            shift_course_counts(new_course_id, quizzes=1)
+    instance._counted_lesson_id = instance.lesson_id
+
+
+@receiver(pre_delete, sender=Quiz)
+def quiz_counts_deleted(sender, instance, **kwargs):
+    shift_course_counts(_course_of_lesson(instance._counted_lesson_id), quizzes=-1)
+
+
+# --- Course thumbnail derivatives ---
+
+def _thumbnail_name(course):
+    value = course.__dict__.get('thumbnail')
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Course)
+def course_thumbnail_snapshot(sender, instance, **kwargs):
+    instance._thumbnail_name = _thumbnail_name(instance)
+
+
+@receiver(post_save, sender=Course)
+def course_thumbnail_saved(sender, instance, raw=False, **kwargs):
+    if raw or _thumbnail_name(instance) == instance._thumbnail_name:
+        return
+    refresh_course_variants(instance)
+    instance._thumbnail_name = _thumbnail_name(instance)
+
+
+@receiver(post_delete, sender=Course)
+def course_thumbnail_deleted(sender, instance, **kwargs):
+    delete_variants(instance.thumbnail.storage, instance.thumbnail_variants)
@@ -0,0 +1,25 @@
+from celery import shared_task
+import logging
+
+from .models import Course, Lesson
+from .pdf import course_pdf, lesson_pdf
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def render_offline_pdf(kind, object_id):
+    """Re-render the cached offline PDF for a course or lesson."""
+    if kind == 'course':
+        course = Course.objects.select_related('subject').filter(pk=object_id).first()
+        document = course_pdf(course) if course else None
+    else:
+        lesson = Lesson.objects.select_related('course__subject').filter(pk=object_id).first()
+        course = lesson.course if lesson else None
+        document = lesson_pdf(lesson) if lesson else None
+
+    if document is None or not course.is_offline_available:
+        return False
+    rendered = document.ensure()
+    if rendered:
+        logger.info(f"Rendered offline PDF {document.path}")
+    return rendered
@@ -1,7 +1,10 @@
 from django import template
+from django.utils.html import format_html
 
 register = template.Library()
 
+CARD_SIZES = '(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw'
+
 @register.filter
 def endswith(value, arg):
     """Check if a string ends with a given suffix"""
@@ -12,3 +15,24 @@ def startswith(value, arg):
     """Check if a string starts with a given prefix"""
     return str(value).startswith(str(arg))
 
+
+@register.simple_tag
+def course_thumbnail(course, css_class='', sizes=CARD_SIZES):
+    """Responsive ``<picture>`` for a course thumbnail: WebP plus resized fallbacks."""
+    thumbnail = course.thumbnail
+    variants = course.thumbnail_variants or {}
+    if not variants.get('fallback'):
+        return format_html(
+            '<img class="{}" src="{}" alt="{}" loading="lazy">', css_class, thumbnail.url, course.title,
+        )
+    url = thumbnail.storage.url
+
+    def srcset(key):
+        return ', '.join(f'{url(name)} {width}w' for width, name in variants.get(key, []))
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy" decoding="async"></picture>',
+        srcset('webp'), sizes, css_class, url(variants['fallback'][-1][1]),
+        srcset('fallback'), sizes, course.title,
+    )
@@ -1,3 +1,801 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import games
+from .grading import answer_key_cache_key, grade_quiz
+from .counters import repair_course_counts
+from .models import Subject, Course, Lesson, Quiz, Question, Choice, Progress, Enrollment
+from .progress import COURSE_LEVEL, complete_lesson, record_quiz_result
+from .search import search_course_ids
+from .templatetags.course_extras import course_thumbnail
+
+
+def make_course(subject, title, lessons=3, quizzes_per_lesson=1):
+    course = Course.objects.create(
+        subject=subject, title=title, description='', difficulty_level='easy',
+    )
+    for order in range(lessons):
+        lesson = Lesson.objects.create(
+            course=course, title=f'{title} L{order}', content='', order=order,
+            estimated_time=10, points=5,
+        )
+        for q in range(quizzes_per_lesson):
+            Quiz.objects.create(lesson=lesson, title=f'{lesson.title} Q{q}', description='')
+    return course
+
+
+class MyProgressViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='pass')
+        self.subject = Subject.objects.create(
+            name='Science', description='', grade_level=8, language='en',
+        )
+        self.client.force_login(self.user)
+
+    def enroll(self, count):
+        for _ in range(count):
+            course = make_course(self.subject, f'Course {Course.objects.count()}')
+            Enrollment.objects.create(user=self.user, course=course)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('courses:my-progress'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_flat_in_number_of_enrollments(self):
+        self.enroll(2)
+        self.count_queries()  # first hit bulk-creates the course-level rows
+        small = self.count_queries()
+
+        self.enroll(20)
+        self.count_queries()
+        large = self.count_queries()
+
+        self.assertEqual(small, large)
+
+    def test_missing_course_rows_are_created_in_bulk(self):
+        self.enroll(5)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('courses:my-progress'))
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            Progress.objects.filter(user=self.user, lesson__isnull=True, quiz__isnull=True).count(), 5
+        )
+
+    def test_counts_reflect_user_completions(self):
+        self.enroll(1)
+        course = Course.objects.get()
+        lesson = course.lesson_set.first()
+        quiz = Quiz.objects.filter(lesson__course=course).first()
+        complete_lesson(self.user, lesson)
+        record_quiz_result(self.user, quiz, score=1)
+
+        response = self.client.get(reverse('courses:my-progress'))
+        entry, = response.context['course_progress']
+        self.assertEqual(entry['total_lessons_count'], 3)
+        self.assertEqual(entry['completed_lessons_count'], 1)
+        self.assertEqual(entry['total_quizzes_count'], 3)
+        self.assertEqual(entry['completed_quizzes_count'], 1)
+        self.assertEqual(response.context['quizzes_passed'], 1)
+
+
+class CourseProgressCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='pass')
+        subject = Subject.objects.create(name='Maths', description='', grade_level=9, language='en')
+        self.course = make_course(subject, 'Algebra', lessons=2)
+        self.lessons = list(self.course.lesson_set.all())
+        self.client.force_login(self.user)
+
+    def course_row(self):
+        return Progress.objects.get(COURSE_LEVEL, user=self.user, course=self.course)
+
+    def test_lesson_completion_updates_counters_once(self):
+        self.client.post(reverse('courses:mark-lesson-complete', args=[self.lessons[0].pk]))
+        self.client.post(reverse('courses:mark-lesson-complete', args=[self.lessons[0].pk]))
+        row = self.course_row()
+        self.assertEqual((row.lessons_completed, row.points, row.percentage), (1, 5, 50))
+        self.assertFalse(row.completed)
+
+        self.client.post(reverse('courses:mark-lesson-complete', args=[self.lessons[1].pk]))
+        row = self.course_row()
+        self.assertEqual((row.lessons_completed, row.points, row.percentage), (2, 10, 100))
+        self.assertTrue(row.completed)
+
+    def test_lesson_count_change_refreshes_percentage(self):
+        for lesson in self.lessons:
+            complete_lesson(self.user, lesson)
+        extra = Lesson.objects.create(course=self.course, title='Extra', content='', order=3,
+                                      estimated_time=10, points=5)
+        row = self.course_row()
+        self.assertEqual((row.lessons_completed, row.percentage, row.completed), (2, 66, False))
+        extra.delete()
+        row = self.course_row()
+        self.assertEqual((row.percentage, row.completed), (100, True))
+
+    def test_quiz_submission_counts_first_completion(self):
+        quiz = Quiz.objects.filter(lesson__course=self.course).first()
+        self.client.post(reverse('courses:quiz-submit', args=[quiz.pk]))
+        self.client.post(reverse('courses:quiz-submit', args=[quiz.pk]))
+        self.assertEqual(self.course_row().quizzes_completed, 1)
+
+    def test_course_detail_does_not_write(self):
+        complete_lesson(self.user, self.lessons[0])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('courses:course-detail', args=[self.course.pk]))
+        writes = [q for q in ctx.captured_queries
+                  if q['sql'].startswith(('INSERT', 'UPDATE')) and 'courses_progress' in q['sql']]
+        self.assertEqual(writes, [])
+
+    def test_rebuild_command_repairs_drift(self):
+        complete_lesson(self.user, self.lessons[0])
+        Progress.objects.filter(pk=self.course_row().pk).update(
+            lessons_completed=7, points=0, percentage=0,
+        )
+        call_command('rebuild_course_progress', stdout=StringIO())
+        row = self.course_row()
+        self.assertEqual((row.lessons_completed, row.points, row.percentage), (1, 5, 50))
+
+
+class QuizGradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        subject = Subject.objects.create(name='Physics', description='', grade_level=10, language='en')
+        course = make_course(subject, 'Motion', lessons=1, quizzes_per_lesson=1)
+        self.quiz = Quiz.objects.get(lesson__course=course)
+        self.correct = {}
+        for i in range(30):
+            question = Question.objects.create(quiz=self.quiz, question_text=f'Q{i}', points=2)
+            Choice.objects.create(question=question, choice_text='wrong')
+            self.correct[str(question.pk)] = Choice.objects.create(
+                question=question, choice_text='right', is_correct=True,
+            ).pk
+
+    def test_grading_cost_is_independent_of_question_count(self):
+        grade_quiz(self.quiz, self.correct)  # warm the answer key
+        with self.assertNumQueries(0):
+            result = grade_quiz(self.quiz, self.correct)
+        self.assertEqual(result['score'], 60)
+        self.assertTrue(result['passed'])
+
+    def test_answer_key_is_invalidated_on_choice_change(self):
+        qid, choice_id = next(iter(self.correct.items()))
+        grade_quiz(self.quiz, self.correct)
+        Choice.objects.filter(pk=choice_id).first().delete()
+        result = grade_quiz(self.quiz, self.correct)
+        self.assertEqual(result['score'], 58)
+
+    def test_moved_question_invalidates_both_answer_keys(self):
+        other = Quiz.objects.create(lesson=self.quiz.lesson, title='Other', description='', passing_score=0)
+        grade_quiz(self.quiz, self.correct)
+        grade_quiz(other, {})
+        question = Question.objects.get(pk=next(iter(self.correct)))
+        question.quiz = other
+        with self.captureOnCommitCallbacks() as callbacks:
+            question.save()
+            self.assertEqual(grade_quiz(self.quiz, self.correct)['score'], 58)
+        # A reader that cached a key between the write and the commit
+        cache.set(answer_key_cache_key(other.pk), {'passing_score': 0, 'questions': {}})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(grade_quiz(other, self.correct)['score'], 2)
+
+    def test_api_and_form_paths_agree(self):
+        user = User.objects.create_user('student', password='pass')
+        self.client.force_login(user)
+        response = self.client.post(
+            f'/courses/api/quizzes/{self.quiz.pk}/submit/',
+            {'answers': self.correct}, content_type='application/json',
+        )
+        self.assertEqual(response.json()['score'], 60)
+
+        form = {f'question_{qid}': cid for qid, cid in self.correct.items()}
+        self.client.post(reverse('courses:quiz-submit', args=[self.quiz.pk]), form)
+        self.assertEqual(Progress.objects.get(user=user, quiz=self.quiz).score, 60)
+
+    def test_api_rejects_malformed_answers(self):
+        self.client.force_login(User.objects.create_user('student', password='pass'))
+        url = f'/courses/api/quizzes/{self.quiz.pk}/submit/'
+        for body in ({'answers': [1, 2]}, {'answers': 'abc'}, [1]):
+            response = self.client.post(url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+
+class QuizBatchSubmitTests(TestCase):
+    url = '/courses/api/quizzes/batch-submit/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='pass')
+        subject = Subject.objects.create(name='Chemistry', description='', grade_level=11, language='en')
+        self.course = make_course(subject, 'Atoms', lessons=2)
+        self.quizzes = list(Quiz.objects.filter(lesson__course=self.course).order_by('id'))
+        for quiz in self.quizzes:
+            question = Question.objects.create(quiz=quiz, question_text='?', points=4)
+            quiz.answers = {str(question.pk): Choice.objects.create(
+                question=question, choice_text='yes', is_correct=True,
+            ).pk}
+        self.client.force_login(self.user)
+
+    def attempts(self):
+        return [
+            {'quiz': quiz.pk, 'answers': quiz.answers, 'idempotency_key': f'k{i}',
+             'client_timestamp': f'2026-01-0{i + 1}T10:00:00Z'}
+            for i, quiz in enumerate(self.quizzes)
+        ]
+
+    def test_batch_grades_and_upserts_progress(self):
+        response = self.client.post(self.url, {'attempts': self.attempts()}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['score'] for r in response.json()['results']], [4, 4])
+        self.assertEqual(Progress.objects.filter(user=self.user, quiz__isnull=False, completed=True).count(), 2)
+        course_row = Progress.objects.get(COURSE_LEVEL, user=self.user, course=self.course)
+        self.assertEqual(course_row.quizzes_completed, 2)
+
+    def test_oversized_batch_is_rejected(self):
+        attempt = self.attempts()[0]
+        attempts = [{**attempt, 'idempotency_key': f'k{i}'} for i in range(201)]
+        response = self.client.post(self.url, {'attempts': attempts}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Progress.objects.filter(user=self.user, quiz__isnull=False).exists())
+
+    def test_replayed_batch_is_idempotent(self):
+        self.client.post(self.url, {'attempts': self.attempts()}, content_type='application/json')
+        response = self.client.post(self.url, {'attempts': self.attempts()}, content_type='application/json')
+        self.assertTrue(all(r['duplicate'] for r in response.json()['results']))
+        course_row = Progress.objects.get(COURSE_LEVEL, user=self.user, course=self.course)
+        self.assertEqual(course_row.quizzes_completed, 2)
+
+    def test_concurrent_replay_is_not_applied_twice(self):
+        from courses import progress
+        from courses.models import QuizAttempt
+        real_key = progress.get_answer_key
+
+        def replay_first(quiz):
+            # Another request stores k0 between our duplicate check and our insert
+            if not QuizAttempt.objects.filter(idempotency_key='k0').exists():
+                stored = QuizAttempt.objects.create(
+                    user=self.user, quiz=self.quizzes[0], idempotency_key='k0', score=0,
+                    client_timestamp=timezone.now() - timedelta(days=1),
+                )
+                progress._apply_quiz_attempts(self.user, [stored])
+            return real_key(quiz)
+
+        with mock.patch('courses.progress.get_answer_key', side_effect=replay_first):
+            body = self.client.post(self.url, {'attempts': self.attempts()}, content_type='application/json').json()
+        self.assertEqual([r['duplicate'] for r in body['results']], [True, False])
+        self.assertEqual(body['results'][0]['score'], 0)
+        self.assertEqual(QuizAttempt.objects.filter(user=self.user).count(), 2)
+        course_row = Progress.objects.get(COURSE_LEVEL, user=self.user, course=self.course)
+        self.assertEqual(course_row.quizzes_completed, 2)
+
+    def test_older_attempt_does_not_overwrite_newer_score(self):
+        newer = self.attempts()[:1]
+        self.client.post(self.url, {'attempts': newer}, content_type='application/json')
+        older = [{**newer[0], 'answers': {}, 'idempotency_key': 'old', 'client_timestamp': '2025-12-01T10:00:00Z'}]
+        self.client.post(self.url, {'attempts': older}, content_type='application/json')
+        self.assertEqual(Progress.objects.get(user=self.user, quiz=self.quizzes[0]).score, 4)
+
+    def test_unknown_quiz_is_reported(self):
+        attempts = self.attempts()
+        attempts[0]['quiz'] = 999999
+        body = self.client.post(self.url, {'attempts': attempts}, content_type='application/json').json()
+        self.assertEqual(len(body['results']), 1)
+        self.assertEqual(body['errors'][0]['idempotency_key'], 'k0')
+
+
+class OfflinePDFTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        override = override_settings(OFFLINE_PDF_CACHE_DIR=self.tmp)
+        override.enable()
+        self.addCleanup(override.disable)
+        subject = Subject.objects.create(name='English', description='', grade_level=6, language='en')
+        self.course = make_course(subject, 'Grammar', lessons=2, quizzes_per_lesson=0)
+        self.shard = os.path.join(self.tmp, 'course', str(self.course.pk))
+
+    def download(self, **headers):
+        return self.client.get(reverse('courses:course-download', args=[self.course.pk]), **headers)
+
+    def test_warm_download_is_served_from_disk_with_validators(self):
+        first = self.download()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(b''.join(first.streaming_content)[:4], b'%PDF')
+        self.assertEqual(len(os.listdir(self.shard)), 1)
+
+        second = self.download(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_content_change_produces_a_new_document(self):
+        etag = self.download()['ETag']
+        Lesson.objects.filter(course=self.course).update(title='Renamed')
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(os.listdir(self.tmp), ['course'])
+        self.assertEqual(len(os.listdir(self.shard)), 1)
+
+    def test_file_removed_after_check_is_rendered_again(self):
+        real_open = open
+
+        def vanish_once(path, *args, **kwargs):
+            if path.endswith('.pdf') and not vanish_once.done:
+                vanish_once.done = True
+                os.remove(path)
+            return real_open(path, *args, **kwargs)
+        vanish_once.done = False
+
+        self.download()
+        with mock.patch('builtins.open', side_effect=vanish_once):
+            response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content)[:4], b'%PDF')
+
+    def test_prerender_command_writes_sharded_files(self):
+        lesson = self.course.lesson_set.first()
+        lesson_shard = os.path.join(self.tmp, 'lesson', str(lesson.pk))
+        os.makedirs(lesson_shard)
+        stale = os.path.join(lesson_shard, f'lesson_{lesson.pk}_old.pdf')
+        open(stale, 'wb').close()
+
+        call_command('prerender_offline_pdfs', '--workers', '1', stdout=StringIO())
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['course', 'lesson'])
+        self.assertEqual(len(os.listdir(self.shard)), 1)
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp, 'lesson'))), 2)
+        self.assertFalse(os.path.exists(stale))
+        self.assertEqual(len(os.listdir(lesson_shard)), 1)
+
+
+class CourseSearchTests(TestCase):
+    def setUp(self):
+        hindi = Subject.objects.create(name='भौतिकी', description='', grade_level=11, language='hi')
+        english = Subject.objects.create(name='Physics', description='', grade_level=11, language='en')
+        self.gati = make_course(hindi, 'गति के नियम', lessons=0)
+        Lesson.objects.create(course=make_course(hindi, 'ऊर्जा', lessons=0), title='गतिज ऊर्जा',
+                              content='', order=1, estimated_time=5)
+        self.motion = make_course(english, 'Laws of Motion', lessons=0)
+        make_course(english, 'Optics', lessons=0)
+
+    def test_devanagari_prefix_matches_whole_words(self):
+        self.assertEqual(len(search_course_ids('गति', language='hi')), 2)
+        self.assertEqual(search_course_ids('नियम', language='hi'), [self.gati.pk])
+
+    def test_language_filter_and_index_updates(self):
+        self.assertEqual(search_course_ids('mot', language='en'), [self.motion.pk])
+        self.motion.title = 'Newtonian Mechanics'
+        self.motion.save()
+        self.assertEqual(search_course_ids('mot', language='en'), [])
+        self.assertEqual(search_course_ids('newton', language='en'), [self.motion.pk])
+
+    def test_limit_counts_courses_not_hits(self):
+        english = self.motion.subject
+        busy = make_course(english, 'Waves', lessons=0)
+        for order in range(5):
+            Lesson.objects.create(course=busy, title=f'Wave motion {order}', content='', order=order, estimated_time=5)
+        ids = search_course_ids('motion', language='en', limit=2)
+        self.assertEqual(sorted(ids), sorted([busy.pk, self.motion.pk]))
+
+    def test_course_list_uses_ranked_search(self):
+        response = self.client.get(reverse('courses:course-list'), {'search': 'motion'})
+        self.assertEqual([c.pk for c in response.context['courses']], [self.motion.pk])
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.subject = Subject.objects.create(name='Maths', description='', grade_level=7, language='en')
+        self.course = make_course(self.subject, 'Fractions', lessons=2)
+
+    def list_courses(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('courses:course-list'), {'grade': 7})
+        # Only the catalog build filters on the class range
+        builds = [q for q in ctx.captured_queries if '"grade_level" >=' in q['sql']]
+        return response.context['courses'], builds
+
+    def test_warm_hit_skips_catalog_query(self):
+        courses, builds = self.list_courses()
+        self.assertEqual(courses[0].lesson_count, 2)
+        self.assertEqual(len(builds), 1)
+        _, builds = self.list_courses()
+        self.assertEqual(builds, [])
+
+    def test_content_change_invalidates(self):
+        self.list_courses()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Lesson.objects.create(course=self.course, title='More', content='', order=9, estimated_time=5)
+            # The version only moves once the lesson is committed
+            self.assertEqual(self.list_courses()[1], [])
+        self.assertTrue(callbacks)
+        courses, builds = self.list_courses()
+        self.assertEqual(courses[0].lesson_count, 3)
+        self.assertEqual(len(builds), 1)
+
+
+class CourseCounterTests(TestCase):
+    def setUp(self):
+        self.subject = Subject.objects.create(name='Science', description='', grade_level=8, language='en')
+        self.course = make_course(self.subject, 'Light', lessons=2)
+        self.other = make_course(self.subject, 'Sound', lessons=1)
+
+    def counts(self, course):
+        course.refresh_from_db()
+        return course.lesson_count, course.quiz_count, course.total_lesson_points
+
+    def test_failed_counter_update_rolls_back_the_write(self):
+        from django.db import DatabaseError
+        lesson = self.course.lesson_set.first()
+        lesson.points = 20
+        with mock.patch('courses.signals.shift_course_counts', side_effect=DatabaseError('locked')):
+            with self.assertRaises(DatabaseError):
+                lesson.save()
+            with self.assertRaises(DatabaseError):
+                Lesson.objects.create(course=self.course, title='Extra', content='', order=5, estimated_time=5)
+        lesson.refresh_from_db()
+        self.assertEqual(lesson.points, 5)
+        self.assertEqual(self.course.lesson_set.count(), 2)
+        self.assertEqual(self.counts(self.course), (2, 2, 10))
+
+    def test_counts_follow_lesson_and_quiz_changes(self):
+        self.assertEqual(self.counts(self.course), (2, 2, 10))
+        lesson = self.course.lesson_set.first()
+        lesson.points = 8
+        lesson.save()
+        self.assertEqual(self.counts(self.course), (2, 2, 13))
+
+        lesson.course = self.other
+        lesson.save()
+        self.assertEqual(self.counts(self.course), (1, 1, 5))
+        self.assertEqual(self.counts(self.other), (2, 2, 13))
+
+        Quiz.objects.filter(lesson=lesson).get().delete()
+        self.assertEqual(self.counts(self.other), (2, 1, 13))
+        lesson.delete()
+        self.assertEqual(self.counts(self.other), (1, 1, 5))
+
+    def test_repair_fixes_drift_from_queryset_updates(self):
+        Lesson.objects.filter(course=self.course).update(points=1)
+        drifted = repair_course_counts(fix=False)
+        self.assertEqual([(c.pk, changes) for c, changes in drifted],
+                         [(self.course.pk, {'total_lesson_points': (10, 2)})])
+        out = StringIO()
+        call_command('repair_course_counts', stdout=out)
+        self.assertEqual(self.counts(self.course), (2, 2, 2))
+        self.assertEqual(repair_course_counts(), [])
+
+
+class NestedApiQueryTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('student', password='pass'))
+
+    def add_subject(self):
+        subject = Subject.objects.create(name='Physics', description='', grade_level=10, language='en')
+        for n in range(2):
+            make_course(subject, f'Course {n}', lessons=2)
+        for quiz in Quiz.objects.filter(lesson__course__subject=subject):
+            question = Question.objects.create(quiz=quiz, question_text='?', points=1)
+            Choice.objects.create(question=question, choice_text='a', is_correct=True)
+            Choice.objects.create(question=question, choice_text='b')
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        paths = (
+            '/courses/api/subjects/', '/courses/api/courses/?expand=lessons.quizzes',
+            '/courses/api/lessons/?expand=quizzes', '/courses/api/courses/',
+        )
+        self.add_subject()
+        small = [self.count_queries(path) for path in paths]
+        for _ in range(3):
+            self.add_subject()
+        large = [self.count_queries(path) for path in paths]
+        self.assertEqual(small, large)
+
+
+class SparseFieldsApiTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('student', password='pass'))
+        subject = Subject.objects.create(name='Physics', description='', grade_level=10, language='en')
+        self.course = make_course(subject, 'Optics', lessons=2)
+
+    def get(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_course_list_is_compact_and_detail_is_full(self):
+        row, = self.get('/courses/api/courses/')['results']
+        self.assertNotIn('lessons', row)
+        self.assertEqual(row['lesson_count'], 2)
+        detail = self.get(f'/courses/api/courses/{self.course.pk}/')
+        self.assertIn('content', detail['lessons'][0])
+        self.assertIn('quiz_set', detail['lessons'][0])
+
+    def test_lesson_list_omits_content(self):
+        rows = self.get('/courses/api/lessons/')['results']
+        self.assertEqual(len(rows), 2)
+        self.assertNotIn('content', rows[0])
+        self.assertNotIn('quizzes', rows[0])
+
+    def test_fields_and_expand(self):
+        row, = self.get('/courses/api/courses/', fields='id,lessons.title,lessons.quizzes.title',
+                        expand='lessons.quizzes')['results']
+        self.assertEqual(set(row), {'id', 'lessons'})
+        self.assertEqual(set(row['lessons'][0]), {'title', 'quizzes'})
+        self.assertEqual(set(row['lessons'][0]['quizzes'][0]), {'title'})
+
+        detail = self.get(f'/courses/api/courses/{self.course.pk}/', fields='title')
+        self.assertEqual(detail, {'title': 'Optics'})
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='pass')
+        self.client.force_login(self.user)
+        self.subject = Subject.objects.create(name='Physics', description='', grade_level=10, language='en')
+        self.course = make_course(self.subject, 'Optics', lessons=2)
+        self.lesson = self.course.lesson_set.first()
+
+    def revalidate(self, path):
+        first = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+        return first['ETag'], self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_course_is_not_modified_without_serializing(self):
+        path = f'/courses/api/courses/{self.course.pk}/'
+        etag, response = self.revalidate(path)
+        self.assertEqual(response.status_code, 304)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertFalse([q for q in ctx.captured_queries if 'courses_lesson' in q['sql']])
+
+    def test_nested_edit_changes_course_and_list_validators(self):
+        for path in (f'/courses/api/courses/{self.course.pk}/', '/courses/api/courses/',
+                     f'/courses/api/lessons/{self.lesson.pk}/',
+                     f'/courses/api/subjects/{self.subject.pk}/offline_content/'):
+            etag, response = self.revalidate(path)
+            self.assertEqual(response.status_code, 304, path)
+            quiz = Quiz.objects.filter(lesson=self.lesson).get()
+            Question.objects.create(quiz=quiz, question_text=f'Why {path}?', points=1)
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_revalidates_after_delete(self):
+        detail = self.client.get(f'/courses/api/courses/{self.course.pk}/')
+        self.assertTrue(detail.has_header('Last-Modified'))
+        path = '/courses/api/courses/'
+        other = make_course(self.subject, 'Lenses', lessons=1)
+        first = self.client.get(path)
+        self.assertFalse(first.has_header('Last-Modified'))
+        other.delete()
+        since = http_date(timezone.now().timestamp())
+        self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Lenses')
+
+    def test_course_page_revalidates_on_progress(self):
+        path = reverse('courses:course-detail', args=[self.course.pk])
+        etag, response = self.revalidate(path)
+        self.assertEqual(response.status_code, 304)
+        complete_lesson(self.user, self.lesson)
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class GamesManifestTests(TestCase):
+    def setUp(self):
+        self.games_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.games_dir)
+        settings_override = override_settings(GAMES_DIR=self.games_dir, GAMES_MANIFEST_CHECK_INTERVAL=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        games._state.update(checked=0.0, signature=None, manifest=None)
+        self.addCleanup(games._state.update, checked=0.0, signature=None, manifest=None)
+        self.write('maths.html', '<html><title> Number\n Quest </title></html>')
+        os.makedirs(os.path.join(self.games_dir, 'atoms'))
+        self.write('atoms/index.html', '<html>no title</html>')
+        self.write('atoms/game.js', 'play()')
+
+    def write(self, name, text):
+        with open(os.path.join(self.games_dir, name), 'w') as f:
+            f.write(text)
+
+    def test_manifest_lists_games_and_is_written_to_disk(self):
+        manifest = games.get_manifest()
+        self.assertEqual([(g['slug'], g['title']) for g in manifest['games']],
+                         [('atoms', 'Atoms'), ('maths', 'Number Quest')])
+        atoms = manifest['games'][0]
+        self.assertEqual(atoms['size'], len('<html>no title</html>') + len('play()'))
+        self.assertEqual(atoms['files'], ['/static/games/atoms/game.js', '/static/games/atoms/index.html'])
+        self.assertTrue(os.path.isfile(games.manifest_path()))
+
+        response = self.client.get(reverse('courses:games-list'))
+        self.assertEqual([g['slug'] for g in response.context['games']], ['atoms', 'maths'])
+
+    def test_changed_file_refreshes_manifest(self):
+        before = games.get_manifest()
+        with mock.patch.object(games, 'build_manifest', wraps=games.build_manifest) as build:
+            games.get_manifest()
+            build.assert_not_called()
+            self.write('maths.html', '<html><title>Number Quest 2</title></html>')
+            after = games.get_manifest()
+            build.assert_called_once()
+        self.assertNotEqual(before['version'], after['version'])
+        self.assertEqual(after['games'][1]['title'], 'Number Quest 2')
+
+    def test_game_slug_uses_manifest_slug(self):
+        self.assertEqual(games.game_slug('Number Quest'), 'maths')
+        self.assertEqual(games.game_slug('Atoms'), 'atoms')
+        self.assertEqual(games.game_slug('Jeu d’été'), 'jeu-dété')
+
+    def test_manifest_endpoint_supports_revalidation(self):
+        response = self.client.get(reverse('courses:games-manifest'))
+        self.assertEqual(len(response.json()['games']), 2)
+        again = self.client.get(reverse('courses:games-manifest'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+
+class CourseThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, COURSE_THUMBNAIL_WIDTHS=(160, 320))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.subject = Subject.objects.create(name='Art', description='', grade_level=6, language='en')
+
+    def image(self, width, mode='RGB'):
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new(mode, (width, width // 2)).save(buffer, 'PNG')
+        return SimpleUploadedFile('cover.png', buffer.getvalue(), content_type='image/png')
+
+    def test_upload_builds_widths_and_webp(self):
+        course = Course.objects.create(subject=self.subject, title='Colours', description='',
+                                       difficulty_level='easy', thumbnail=self.image(400))
+        course.refresh_from_db()
+        self.assertEqual([w for w, _ in course.thumbnail_variants['webp']], [160, 320])
+        self.assertTrue(all(name.endswith('.jpg') for _, name in course.thumbnail_variants['fallback']))
+
+        html = course_thumbnail(course, 'card')
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('_320w.webp 320w', html)
+
+        old = [name for entries in course.thumbnail_variants.values() for _, name in entries]
+        course.thumbnail = self.image(200, 'RGBA')
+        course.save()
+        course.refresh_from_db()
+        self.assertEqual([w for w, _ in course.thumbnail_variants['fallback']], [160])
+        self.assertTrue(course.thumbnail_variants['fallback'][0][1].endswith('.png'))
+        self.assertFalse(any(course.thumbnail.storage.exists(name) for name in old))
+
+    def test_backfill_command(self):
+        course = Course.objects.create(subject=self.subject, title='Shapes', description='',
+                                       difficulty_level='easy', thumbnail=self.image(400))
+        Course.objects.filter(pk=course.pk).update(thumbnail_variants={})
+        self.assertEqual(course_thumbnail(Course.objects.get(pk=course.pk)).count('<img'), 1)
+        call_command('build_course_thumbnails', stdout=StringIO())
+        self.assertEqual(len(Course.objects.get(pk=course.pk).thumbnail_variants['webp']), 2)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        os.makedirs(os.path.join(self.media_root, 'lessons'))
+        self.data = bytes(range(256)) * 40
+        with open(os.path.join(self.media_root, 'lessons', 'talk.mp4'), 'wb') as f:
+            f.write(self.data)
+        self.url = '/media/lessons/talk.mp4'
+
+    def test_full_and_ranged_responses(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_validators_and_if_range(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        resumed = self.client.get(self.url, HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag)
+        self.assertEqual(resumed.status_code, 206)
+        changed = self.client.get(self.url, HTTP_RANGE='bytes=10-', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(changed.status_code, 200)
+
+    def test_traversal_and_accelerated_handoff(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        with override_settings(MEDIA_ACCEL='nginx'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/lessons/talk.mp4')
+        self.assertEqual(response.content, b'')
+
+
+class BulkEnrollmentTests(TestCase):
+    url = '/courses/api/courses/bulk-enroll/'
+
+    def setUp(self):
+        subject = Subject.objects.create(name='Maths', description='', grade_level=7, language='en')
+        self.courses = [make_course(subject, f'Course {n}', lessons=1) for n in range(2)]
+        self.teacher = User.objects.create_user('teacher', password='pass')
+        self.teacher.userprofile.role = 'teacher'
+        self.teacher.userprofile.save()
+        self.students = []
+        for n in range(6):
+            user = User.objects.create_user(f'student{n}', password='pass')
+            user.userprofile.grade_level = 7 if n < 4 else 8
+            user.userprofile.school_name = 'GHS Puri'
+            user.userprofile.save()
+            self.students.append(user)
+        self.client.force_login(self.teacher)
+
+    def post(self, payload):
+        return self.client.post(self.url, payload, content_type='application/json')
+
+    def test_enrolls_by_profile_filter_in_a_few_statements(self):
+        Enrollment.objects.create(user=self.students[0], course=self.courses[0])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post({'courses': [c.pk for c in self.courses], 'grade': 7, 'school': 'ghs puri'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'students': 4, 'courses': 2, 'enrollments_created': 7, 'progress_created': 8,
+        })
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(Progress.objects.filter(COURSE_LEVEL).count(), 8)
+
+        again = self.post({'courses': [self.courses[0].pk], 'users': [self.students[5].pk]}).json()
+        self.assertEqual((again['enrollments_created'], again['progress_created']), (1, 1))
+
+    def test_requires_teacher_and_valid_input(self):
+        self.assertEqual(self.post({'courses': [self.courses[0].pk]}).status_code, 400)
+        self.assertEqual(self.post({'courses': [999], 'grade': 7}).status_code, 400)
+        self.client.force_login(self.students[0])
+        self.assertEqual(self.post({'courses': [self.courses[0].pk], 'grade': 7}).status_code, 403)
+
+    def test_single_enroll_tolerates_lesson_progress(self):
+        course = self.courses[0]
+        user = self.students[0]
+        complete_lesson(user, course.lesson_set.first())
+        Progress.objects.filter(COURSE_LEVEL, user=user).delete()
+        self.client.force_login(user)
+        response = self.client.post(f'/courses/api/courses/{course.pk}/enroll/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Progress.objects.filter(COURSE_LEVEL, user=user, course=course).count(), 1)
@@ -0,0 +1,107 @@
+"""Resized and WebP derivatives of ``Course.thumbnail``.
+
+Derivatives are written next to the original as ``<name>_<width>w.<ext>``,
+in the original's format family (JPEG, or PNG when it has transparency)
+plus WebP. Their names are recorded in ``Course.thumbnail_variants`` so
+templates can build ``srcset`` without touching storage.
+"""
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (160, 320, 640)
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+
+
+def thumbnail_widths():
+    return tuple(getattr(settings, 'COURSE_THUMBNAIL_WIDTHS', DEFAULT_WIDTHS))
+
+
+def derivative_name(name: str, width: int, ext: str) -> str:
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{width}w.{ext}'
+
+
+def _encode(image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == 'PNG':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def _replace(storage, name: str, data: bytes) -> str:
+    # Storage.save() would pick a new name if the file exists
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(data))
+
+
+def generate_variants(fieldfile) -> dict:
+    """Write the derivatives of ``fieldfile`` and return the variants mapping.
+
+    ``{'fallback': [[width, name], ...], 'webp': [[width, name], ...]}``,
+    narrowest first. Widths wider than the original are skipped.
+    """
+    from PIL import Image, ImageOps
+
+    storage = fieldfile.storage
+    with storage.open(fieldfile.name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    fallback_fmt, fallback_ext = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+
+    variants = {'fallback': [], 'webp': []}
+    for width in sorted(thumbnail_widths()):
+        if width > image.width:
+            break
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for key, fmt, ext in (('fallback', fallback_fmt, fallback_ext), ('webp', 'WEBP', 'webp')):
+            name = _replace(storage, derivative_name(fieldfile.name, width, ext), _encode(resized, fmt))
+            variants[key].append([width, name])
+    return variants
+
+
+def delete_variants(storage, variants) -> None:
+    for entries in (variants or {}).values():
+        for _, name in entries:
+            try:
+                storage.delete(name)
+            except OSError:
+                pass
+
+
+def refresh_course_variants(course) -> dict:
+    """Regenerate ``course``'s derivatives and store their names on the row."""
+    from .models import Course
+
+    old = course.thumbnail_variants or {}
+    variants = {}
+    if course.thumbnail:
+        try:
+            variants = generate_variants(course.thumbnail)
+        except Exception as e:
+            # Templates fall back to the original image
+            logger.warning(f"Could not build thumbnails for course {course.pk}: {e}")
+    stale = {
+        key: [entry for entry in entries if entry not in variants.get(key, [])]
+        for key, entries in old.items()
+    }
+    delete_variants(course.thumbnail.storage, stale)
+    Course.objects.filter(pk=course.pk).update(thumbnail_variants=variants)
+    course.thumbnail_variants = variants
+    return variants
@@ -34,6 +34,7 @@ urlpatterns = [
     path('my-progress/', views.MyProgressView.as_view(), name='my-progress'),
     # Games
     path('games/', views.GamesListView.as_view(), name='games-list'),
+    path('games/manifest.json', views.games_manifest, name='games-manifest'),
     # Convenience redirect: /courses/admin -> /admin
     path('admin', lambda request: redirect('/admin/', permanent=False)),
     path('admin/', lambda request: redirect('/admin/', permanent=False)),
@@ -1,13 +1,15 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.http import HttpResponse
-from io import BytesIO
+from django.http import HttpResponse, FileResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.models import User
 from django.urls import reverse_lazy
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
@@ -15,49 +17,149 @@ from django.db import models
 from .models import Subject, Course, Lesson, Quiz, Question, Choice, Progress, Enrollment
 from django.conf import settings
 import os
+from .catalog import CATALOG, get_or_build, hydrate_courses
+from .conditional import conditional, content_state, make_etag
+from .games import get_manifest as get_game_manifest
+from .grading import grade_quiz
+from .pdf import course_pdf, lesson_pdf
+from .search import search as search_content, search_course_ids
+from .progress import (
+    COURSE_LEVEL, bulk_enroll, complete_lesson, course_progress_summary, ensure_course_progress_rows,
+    get_or_create_course_progress, get_or_create_unique_lesson_progress, record_quiz_attempts,
+    record_quiz_result,
+)
 from .serializers import (
     SubjectSerializer, CourseSerializer, LessonSerializer,
-    QuizSerializer, QuestionSerializer, ChoiceSerializer, ProgressSerializer
+    QuizSerializer, QuestionSerializer, ChoiceSerializer, ProgressSerializer,
+    QuizAnswersSerializer, QuizAttemptBatchSerializer, BulkEnrollmentSerializer, CourseListSerializer,
+    LessonListSerializer, prefetch_paths,
 )
 
-# --- Progress helpers ---
-def recompute_course_progress(user, course: Course) -> None:
-    total_lessons = course.lesson_set.count()
-    completed_lessons = Progress.objects.filter(
-        user=user,
-        course=course,
-        lesson__isnull=False,
-        completed=True,
-    ).count()
-    percentage = int((completed_lessons / total_lessons) * 100) if total_lessons > 0 else 0
-
-    course_prog = (
-        Progress.objects.filter(user=user, course=course, lesson__isnull=True, quiz__isnull=True)
-        .order_by('id')
-        .first()
-    )
-    if not course_prog:
-        course_prog = Progress(user=user, course=course, completed=False)
-    course_prog.percentage = percentage
-    course_prog.completed = (percentage == 100)
-    # Sum points from completed lessons
-    course_prog.points = Progress.objects.filter(
-        user=user,
-        course=course,
-        lesson__isnull=False,
-        completed=True,
-    ).aggregate(total=models.Sum('points'))['total'] or 0
-    course_prog.save()
-
-def get_or_create_unique_lesson_progress(user, lesson: Lesson) -> Progress:
-    existing = (
-        Progress.objects.filter(user=user, lesson=lesson)
-        .order_by('id')
-        .first()
+class IsTeacher(permissions.BasePermission):
+    """Users whose profile role is teacher, and staff."""
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not user.is_authenticated:
+            return False
+        profile = getattr(user, 'userprofile', None)
+        return user.is_staff or (profile is not None and profile.role == 'teacher')
+
+class SparseFieldsViewMixin:
+    """Compact serializer on list routes; ``?fields=`` / ``?expand=`` on reads.
+
+    Detail routes keep the full nested tree. Writes always use every field.
+    """
+    compact_serializer_class = None
+
+    def get_serializer_class(self):
+        if getattr(self, 'action', None) == 'list' and self.compact_serializer_class is not None:
+            return self.compact_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        request = getattr(self, 'request', None)
+        if request is not None and request.method == 'GET':
+            kwargs.setdefault('fields', request.query_params.get('fields'))
+            kwargs.setdefault('expand', request.query_params.get('expand'))
+        return super().get_serializer(*args, **kwargs)
+
+class NestedPrefetchMixin:
+    """Prefetch every relation the serializer nests for list/detail reads.
+
+    Keeps the number of queries constant however many rows are listed.
+    """
+    prefetch_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'action', None) in self.prefetch_actions:
+            queryset = queryset.prefetch_related(*prefetch_paths(self.get_serializer()))
+        return queryset
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified on list and retrieve, checked before serializing.
+
+    Validators come from the ``updated_at`` of the rows the response covers,
+    so an unchanged resource costs one aggregate query and a 304. Lists only
+    get an ETag: deleting a row leaves ``max(updated_at)`` where it was, so a
+    Last-Modified there would keep answering If-Modified-Since with a stale 304,
+    while the ETag also covers the row count.
+    """
+
+    def _conditional(self, request, queryset, render, last_modified=True):
+        count, latest = content_state(queryset)
+        etag = make_etag(
+            queryset.model._meta.label, count, latest, request.get_full_path(),
+            request.accepted_renderer.format, request.user.pk,
+        )
+        return conditional(request, etag, latest if last_modified else None, render)
+
+    def list(self, request, *args, **kwargs):
+        render = super().list
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional(
+            request, queryset, lambda: render(request, *args, **kwargs), last_modified=False,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        render = super().retrieve
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        if not queryset.exists():
+            return render(request, *args, **kwargs)
+        return self._conditional(request, queryset, lambda: render(request, *args, **kwargs))
+
+class ConditionalDetailMixin:
+    """Conditional GET for template detail pages.
+
+    ``get_validators(pk)`` returns ``(etag parts, last modified)`` or None to
+    skip. Pages with pending flash messages are always rendered.
+    """
+
+    def get_validators(self, pk):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        render = super().get
+        validators = self.get_validators(kwargs.get(self.pk_url_kwarg))
+        if validators is None or len(messages.get_messages(request)):
+            return render(request, *args, **kwargs)
+        parts, last_modified = validators
+        etag = make_etag(*parts, getattr(request, 'LANGUAGE_CODE', ''), request.user.pk)
+        return conditional(request, etag, last_modified, lambda: render(request, *args, **kwargs))
+
+def serve_offline_pdf(request, document):
+    """Serve a cached offline PDF, rendering it inline only on a cold miss."""
+    try:
+        last_modified = os.path.getmtime(document.path)
+    except FileNotFoundError:
+        pass
+    else:
+        not_modified = get_conditional_response(
+            request, etag=quote_etag(document.etag), last_modified=int(last_modified),
+        )
+        if not_modified is not None:
+            return not_modified
+    # The file can be removed between rendering and opening; render it once more
+    for _ in range(2):
+        document.ensure()
+        try:
+            handle = open(document.path, 'rb')
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        raise Http404('Offline PDF is not available')
+    response = FileResponse(
+        handle, as_attachment=True,
+        filename=document.filename, content_type='application/pdf',
     )
-    if existing:
-        return existing
-    return Progress.objects.create(user=user, lesson=lesson, course=lesson.course)
+    response['ETag'] = quote_etag(document.etag)
+    response['Last-Modified'] = http_date(os.fstat(handle.fileno()).st_mtime)
+    return response
 
 # Template Views
 def debug_language(request):
@@ -78,38 +180,44 @@ class CourseListView(ListView):
     
     def get_queryset(self):
         from django.utils import translation
-        
-        queryset = (
-            Course.objects.select_related('subject')
-            .annotate(
-                lessons_count=models.Count('lesson', distinct=True),
-                quizzes_count=models.Count('lesson__quiz', distinct=True),
-            )
-        )
-        # Restrict to classes 6-12
-        queryset = queryset.filter(subject__grade_level__gte=6, subject__grade_level__lte=12)
-        
+
         # Filter by current language - with fallback to English
         current_language = translation.get_language()
         if not current_language or current_language not in ['en', 'hi', 'or']:
             current_language = 'en'
-        
-        queryset = queryset.filter(subject__language=current_language)
 
         # Optional grade filter via query param e.g. ?grade=8
         grade = self.request.GET.get('grade')
-        if grade and grade.isdigit():
-            grade_int = int(grade)
-            if 6 <= grade_int <= 12:
-                queryset = queryset.filter(subject__grade_level=grade_int)
-        search_query = self.request.GET.get('search')
+        grade_filter = None
+        if grade and grade.isdigit() and 6 <= int(grade) <= 12:
+            grade_filter = int(grade)
+        search_query = (self.request.GET.get('search') or '').strip()
+
+        rows = get_or_build(
+            CATALOG, ('course-list', current_language, grade_filter, search_query),
+            lambda: self.build_catalog_rows(current_language, grade_filter, search_query),
+        )
+        return hydrate_courses(rows)
+
+    def build_catalog_rows(self, language, grade, search_query):
+        queryset = (
+            Course.objects.filter(subject__language=language)
+            # Restrict to classes 6-12
+            .filter(subject__grade_level__gte=6, subject__grade_level__lte=12)
+            .order_by('pk')
+        )
+        if grade:
+            queryset = queryset.filter(subject__grade_level=grade)
         if search_query:
-            queryset = queryset.filter(
-                models.Q(title__icontains=search_query) |
-                models.Q(description__icontains=search_query) |
-                models.Q(subject__name__icontains=search_query)
+            # Ranked full-text search; results keep the index's ordering
+            ranked_ids = search_course_ids(search_query, language=language, grade=grade)
+            queryset = queryset.filter(pk__in=ranked_ids).order_by(
+                models.Case(
+                    *[models.When(pk=pk, then=position) for position, pk in enumerate(ranked_ids)],
+                    default=len(ranked_ids),
+                )
             )
-        return queryset
+        return [[pk] for pk in queryset.values_list('id', flat=True)]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -159,38 +267,22 @@ class MyProgressView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
 
-        # Ensure every enrollment has a unique course-level Progress row
-        for enroll in Enrollment.objects.filter(user=user).select_related('course'):
-            course_prog = (
-                Progress.objects.filter(user=user, course=enroll.course, lesson__isnull=True, quiz__isnull=True)
-                .order_by('id')
-                .first()
-            )
-            if not course_prog:
-                Progress.objects.create(user=user, course=enroll.course, completed=False)
-
-        # Build course-level progress entries
-        course_progress_entries = []
-        course_progress_qs = (
-            Progress.objects.filter(user=user, course__isnull=False, lesson__isnull=True, quiz__isnull=True)
-            .select_related('course', 'course__subject')
-        )
-        for p in course_progress_qs:
-            course = p.course
-            total_lessons = course.lesson_set.count()
-            completed_lessons = Progress.objects.filter(user=user, course=course, lesson__isnull=False, completed=True).count()
-            total_quizzes = Quiz.objects.filter(lesson__course=course).count()
-            completed_quizzes = Progress.objects.filter(user=user, course=course, quiz__isnull=False, completed=True).count()
-            course_progress_entries.append({
-                'course': course,
+        ensure_course_progress_rows(user)
+
+        # Course-level entries read the maintained Progress counters and course totals
+        course_progress_entries = [
+            {
+                'course': p.course,
                 'percentage': p.percentage,
                 'points': p.points,
                 'completed': p.completed,
-                'completed_lessons_count': completed_lessons,
-                'total_lessons_count': total_lessons,
-                'completed_quizzes_count': completed_quizzes,
-                'total_quizzes_count': total_quizzes,
-            })
+                'completed_lessons_count': p.lessons_completed,
+                'total_lessons_count': p.course.lesson_count,
+                'completed_quizzes_count': p.quizzes_completed,
+                'total_quizzes_count': p.course.quiz_count,
+            }
+            for p in course_progress_summary(user)
+        ]
 
         context['course_progress'] = course_progress_entries
         # Stats expected by template
@@ -202,7 +294,7 @@ class MyProgressView(LoginRequiredMixin, ListView):
         return context
 
 # API Views
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(SparseFieldsViewMixin, NestedPrefetchMixin, viewsets.ModelViewSet):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -211,27 +303,46 @@ class SubjectViewSet(viewsets.ModelViewSet):
     def offline_content(self, request, pk=None):
         subject = self.get_object()
         courses = subject.course_set.filter(is_offline_available=True)
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data)
+        count, latest = content_state(courses)
+        etag = make_etag('offline_content', subject.pk, count, latest, request.accepted_renderer.format)
+
+        def render():
+            queryset = courses.prefetch_related(*prefetch_paths(CourseSerializer))
+            return Response(CourseSerializer(queryset, many=True).data)
+        return conditional(request, etag, latest, render)
 
-class CourseDetailView(DetailView):
+class CourseDetailView(ConditionalDetailMixin, DetailView):
     model = Course
     template_name = 'courses/course_detail.html'
     context_object_name = 'course'
 
+    def get_validators(self, pk):
+        updated_at = Course.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        parts = ['course', pk, updated_at]
+        user = self.request.user
+        if user.is_authenticated:
+            parts.append(sorted(Progress.objects.filter(user=user, course_id=pk).aggregate(
+                rows=models.Count('pk'),
+                done=models.Count('pk', filter=models.Q(completed=True)),
+                points=models.Sum('points'),
+                percentage=models.Max('percentage'),
+            ).items()))
+            parts.append(Enrollment.objects.filter(user=user, course_id=pk).exists())
+        return parts, updated_at
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['lessons'] = self.object.lesson_set.all().order_by('order')
         context['quizzes'] = Quiz.objects.filter(lesson__course=self.object)
         if self.request.user.is_authenticated:
-            # Ensure course-level progress is up-to-date for this view
-            recompute_course_progress(self.request.user, self.object)
+            # Counters are maintained on the write path; this view only reads them
             context['progress'] = Progress.objects.filter(
+                COURSE_LEVEL,
                 user=self.request.user,
                 course=self.object,
-                lesson__isnull=True,
-                quiz__isnull=True,
-            ).first()
+            ).order_by('id').first()
             context['completed_lesson_ids'] = list(
                 Progress.objects.filter(
                     user=self.request.user,
@@ -271,13 +382,14 @@ class CourseCreateView(CreateView):
         messages.success(self.request, 'Course created successfully!')
         return super().form_valid(form)
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetMixin, SparseFieldsViewMixin, NestedPrefetchMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    compact_serializer_class = CourseListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        queryset = Course.objects.select_related('subject').filter(
+        queryset = super().get_queryset().select_related('subject').filter(
             subject__grade_level__gte=6,
             subject__grade_level__lte=12,
         )
@@ -288,6 +400,21 @@ class CourseViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(subject__grade_level=grade_int)
         return queryset
 
+    @action(detail=False)
+    def search(self, request):
+        # Type-ahead: ?q=phot&language=en&grade=8
+        grade = request.query_params.get('grade')
+        hits = search_content(
+            request.query_params.get('q', ''),
+            language=request.query_params.get('language'),
+            grade=int(grade) if grade and grade.isdigit() else None,
+            limit=20,
+        )
+        return Response([
+            {'kind': kind, 'id': object_id, 'course': course_id, 'title': title, 'rank': rank}
+            for kind, object_id, course_id, title, rank in hits
+        ])
+
     @action(detail=True)
     def download_content(self, request, pk=None):
         course = self.get_object()
@@ -297,9 +424,7 @@ class CourseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         try:
-            from reportlab.lib.pagesizes import A4
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.units import cm
+            return serve_offline_pdf(request, course_pdf(course))
         except ImportError as e:
             return Response(
                 {
@@ -310,64 +435,6 @@ class CourseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-
-        y = height - 2 * cm
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(2 * cm, y, f"{course.title}")
-        y -= 0.8 * cm
-        p.setFont("Helvetica", 11)
-        p.drawString(2 * cm, y, f"Class: {course.subject.grade_level} | Subject: {course.subject.name}")
-        y -= 0.6 * cm
-        p.drawString(2 * cm, y, f"Difficulty: {course.difficulty_level} | Points: {course.points_available}")
-        y -= 1.0 * cm
-
-        # Description block
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(2 * cm, y, "Description")
-        y -= 0.6 * cm
-        p.setFont("Helvetica", 11)
-        desc = course.description or ""
-        # simple wrap
-        max_chars = 95
-        for i in range(0, len(desc), max_chars):
-            line = desc[i:i + max_chars]
-            if y < 3 * cm:
-                p.showPage(); y = height - 2 * cm; p.setFont("Helvetica", 11)
-            p.drawString(2 * cm, y, line)
-            y -= 0.5 * cm
-
-        # Lessons
-        y -= 0.5 * cm
-        p.setFont("Helvetica-Bold", 12)
-        if y < 3 * cm:
-            p.showPage(); y = height - 2 * cm
-        p.drawString(2 * cm, y, "Lessons")
-        y -= 0.6 * cm
-        p.setFont("Helvetica", 11)
-        lessons = course.lesson_set.all().order_by('order')
-        if not lessons:
-            p.drawString(2 * cm, y, "No lessons available.")
-            y -= 0.5 * cm
-        else:
-            for lesson in lessons:
-                line = f"{lesson.order or 0}. {lesson.title} (Points: {lesson.points}, Est: {lesson.estimated_time} min)"
-                if y < 3 * cm:
-                    p.showPage(); y = height - 2 * cm; p.setFont("Helvetica", 11)
-                p.drawString(2 * cm, y, line)
-                y -= 0.5 * cm
-        
-        p.showPage()
-        p.save()
-
-        buffer.seek(0)
-        response = HttpResponse(buffer.read(), content_type='application/pdf')
-        filename = f"{course.title.replace(' ', '_')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-
     @action(detail=True, methods=['POST'])
     def enroll(self, request, pk=None):
         course = self.get_object()
@@ -375,14 +442,54 @@ class CourseViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         enrollment, created = Enrollment.objects.get_or_create(user=request.user, course=course)
         # Ensure progress object exists for course level visibility
-        Progress.objects.get_or_create(user=request.user, course=course, defaults={'completed': False})
+        get_or_create_course_progress(request.user, course)
         return Response({'enrolled': True, 'created': created})
 
-class LessonDetailView(LoginRequiredMixin, DetailView):
+    @action(detail=False, methods=['POST'], url_path='bulk-enroll', permission_classes=[IsTeacher])
+    def class_enroll(self, request):
+        # Expect { courses: [ids], users: [ids] } and/or { grade, school, village } profile filters
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        course_ids = set(Course.objects.filter(pk__in=data['courses']).values_list('pk', flat=True))
+        unknown = sorted(set(data['courses']) - course_ids)
+        if unknown:
+            return Response({'courses': [f'Unknown course ids: {unknown}']}, status=status.HTTP_400_BAD_REQUEST)
+
+        students = User.objects.filter(is_active=True)
+        if 'users' in data:
+            students = students.filter(pk__in=data['users'])
+        else:
+            students = students.filter(userprofile__role='student')
+        if 'grade' in data:
+            students = students.filter(userprofile__grade_level=data['grade'])
+        if 'school' in data:
+            students = students.filter(userprofile__school_name__iexact=data['school'])
+        if 'village' in data:
+            students = students.filter(userprofile__village__iexact=data['village'])
+        user_ids = list(students.values_list('pk', flat=True))
+
+        result = bulk_enroll(user_ids, course_ids)
+        return Response({'students': len(user_ids), 'courses': len(course_ids), **result})
+
+class LessonDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
     model = Lesson
     template_name = 'courses/lesson_detail.html'
     context_object_name = 'lesson'
 
+    def get_validators(self, pk):
+        row = Lesson.objects.filter(pk=pk).values_list('updated_at', 'course__updated_at').first()
+        if row is None:
+            return None
+        progress = Progress.objects.filter(user=self.request.user, lesson_id=pk).values_list(
+            'completed', 'score', 'points',
+        ).first()
+        # Without a row the page has to render once to create it
+        if progress is None:
+            return None
+        return ['lesson', pk, *row, progress], max(row)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
@@ -410,29 +517,23 @@ class MarkLessonCompleteView(LoginRequiredMixin, DetailView):
 
     def post(self, request, *args, **kwargs):
         lesson = self.get_object()
-        # Be tolerant of accidental duplicates by selecting first if multiple exist
-        progress = get_or_create_unique_lesson_progress(request.user, lesson)
-        progress.completed = True
-        # Award lesson points when completed
-        progress.points = lesson.points
-        progress.save()
-        # Recompute the parent course progress
-        recompute_course_progress(request.user, lesson.course)
+        # Award lesson points and bump the course counters on first completion
+        complete_lesson(request.user, lesson)
         
         messages.success(request, 'Lesson marked as complete!')
         return redirect('courses:course-detail', pk=lesson.course.pk)
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(ConditionalGetMixin, SparseFieldsViewMixin, NestedPrefetchMixin, viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
+    compact_serializer_class = LessonListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     @action(detail=True)
     def download(self, request, pk=None):
+        lesson = self.get_object()
         try:
-            from reportlab.lib.pagesizes import A4
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.units import cm
+            return serve_offline_pdf(request, lesson_pdf(lesson))
         except ImportError as e:
             return Response({
                 'error': 'reportlab not installed',
@@ -440,40 +541,6 @@ class LessonViewSet(viewsets.ModelViewSet):
                 'fix': 'pip install reportlab'
             }, status=500)
 
-        lesson = self.get_object()
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-
-        y = height - 2 * cm
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(2 * cm, y, lesson.title)
-        y -= 0.8 * cm
-        p.setFont("Helvetica", 11)
-        p.drawString(2 * cm, y, f"Course: {lesson.course.title}")
-        y -= 0.6 * cm
-        p.drawString(2 * cm, y, f"Class: {lesson.course.subject.grade_level} | Subject: {lesson.course.subject.name}")
-        y -= 1.0 * cm
-
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(2 * cm, y, "Content")
-        y -= 0.6 * cm
-        p.setFont("Helvetica", 11)
-        text = lesson.content or ""
-        text = str(text)
-        max_chars = 95
-        for i in range(0, len(text), max_chars):
-            line = text[i:i + max_chars]
-            if y < 3 * cm:
-                p.showPage(); y = height - 2 * cm; p.setFont("Helvetica", 11)
-            p.drawString(2 * cm, y, line)
-            y -= 0.5 * cm
-
-        p.showPage(); p.save(); buffer.seek(0)
-        resp = HttpResponse(buffer.read(), content_type='application/pdf')
-        resp['Content-Disposition'] = f'attachment; filename="{lesson.title.replace(" ", "_")}.pdf"'
-        return resp
-
 class QuizDetailView(LoginRequiredMixin, DetailView):
     model = Quiz
     template_name = 'courses/quiz_detail.html'
@@ -495,40 +562,20 @@ class QuizSubmitView(LoginRequiredMixin, DetailView):
 
     def post(self, request, *args, **kwargs):
         quiz = self.get_object()
-        answers = request.POST
-        score = 0
-        total_points = 0
-        
-        for question in quiz.question_set.all():
-            total_points += question.points
-            answer_key = f'question_{question.id}'
-            if answer_key in answers:
-                selected_choice = question.choice_set.filter(
-                    id=answers[answer_key]
-                ).first()
-                if selected_choice and selected_choice.is_correct:
-                    score += question.points
-        
-        percentage = (score / total_points) * 100 if total_points > 0 else 0
-        passed = percentage >= quiz.passing_score
-
-        Progress.objects.update_or_create(
-            user=request.user,
-            quiz=quiz,
-            course=quiz.course,
-            defaults={
-                'score': score,
-                'completed': True
-            }
-        )
+        answers = {
+            key[len('question_'):]: value
+            for key, value in request.POST.items()
+            if key.startswith('question_')
+        }
+        result = grade_quiz(quiz, answers)
+        score, percentage = result['score'], result['percentage']
 
-        # Recompute the parent course progress (in case quizzes count towards completion later)
-        recompute_course_progress(request.user, quiz.course)
+        record_quiz_result(request.user, quiz, score)
 
         messages.success(request, f'Quiz submitted! Score: {percentage:.1f}%')
-        return redirect('courses:course-detail', pk=quiz.course.pk)
+        return redirect('courses:course-detail', pk=quiz.lesson.course_id)
 
-class QuizViewSet(viewsets.ModelViewSet):
+class QuizViewSet(SparseFieldsViewMixin, NestedPrefetchMixin, viewsets.ModelViewSet):
     queryset = Quiz.objects.all()
     serializer_class = QuizSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -536,28 +583,20 @@ class QuizViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['POST'])
     def submit(self, request, pk=None):
         quiz = self.get_object()
-        answers = request.data.get('answers', {})
-        score = 0
-        total_points = 0
-        
-        for question in quiz.question_set.all():
-            total_points += question.points
-            if str(question.id) in answers:
-                selected_choice = question.choice_set.filter(
-                    id=answers[str(question.id)]
-                ).first()
-                if selected_choice and selected_choice.is_correct:
-                    score += question.points
-        
-        percentage = (score / total_points) * 100 if total_points > 0 else 0
-        passed = percentage >= quiz.passing_score
-        
-        return Response({
-            'score': score,
-            'total_points': total_points,
-            'percentage': percentage,
-            'passed': passed
-        })
+        serializer = QuizAnswersSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        answers = {str(k): v for k, v in serializer.validated_data['answers'].items()}
+        return Response(grade_quiz(quiz, answers))
+
+    @action(detail=False, methods=['POST'], url_path='batch-submit',
+            permission_classes=[permissions.IsAuthenticated])
+    def batch_submit(self, request):
+        # Expect { attempts: [{ quiz, answers, client_timestamp, idempotency_key }, ...] }
+        serializer = QuizAttemptBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(record_quiz_attempts(request.user, serializer.validated_data['attempts']))
 
 class ProgressViewSet(viewsets.ModelViewSet):
     serializer_class = ProgressSerializer
@@ -579,45 +618,14 @@ class GamesListView(ListView):
     context_object_name = 'games'
 
     def get_queryset(self):
-        base_static = getattr(settings, 'BASE_DIR', None)
-        if not base_static:
-            return []
-        games_dir = os.path.join(base_static, 'static', 'games')
-        games = []
-        if os.path.isdir(games_dir):
-            import re
-            def extract_title(file_path: str) -> str:
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read(4096)
-                        m = re.search(r"<title>(.*?)</title>", content, re.IGNORECASE | re.DOTALL)
-                        if m:
-                            return re.sub(r"\s+", " ", m.group(1)).strip()
-                except Exception:
-                    pass
-                # Fallback to filename if no title
-                base = os.path.basename(file_path)
-                name, _ = os.path.splitext(base)
-                return name.replace('-', ' ').replace('_', ' ').title()
-
-            for entry in os.listdir(games_dir):
-                game_path = os.path.join(games_dir, entry)
-                # Case 1: Directory with index.html
-                index_path = os.path.join(game_path, 'index.html')
-                if os.path.isdir(game_path) and os.path.isfile(index_path):
-                    display_name = extract_title(index_path)
-                    games.append({
-                        'slug': entry,
-                        'name': display_name,
-                        'url': f"{settings.STATIC_URL}games/{entry}/index.html",
-                    })
-                # Case 2: Standalone HTML file inside static/games
-                elif os.path.isfile(game_path) and entry.lower().endswith('.html'):
-                    name = os.path.splitext(entry)[0]
-                    display_name = extract_title(game_path)
-                    games.append({
-                        'slug': name,
-                        'name': display_name,
-                        'url': f"{settings.STATIC_URL}games/{entry}",
-                    })
-        return games
+        # Served from the in-memory manifest; see courses.games
+        return get_game_manifest()['games']
+
+
+def games_manifest(request):
+    """The games manifest for service-worker precaching."""
+    manifest = get_game_manifest()
+
+    def render():
+        return JsonResponse({'version': manifest['version'], 'games': manifest['games']})
+    return conditional(request, manifest['version'], None, render)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Badge, Achievement, UserBadge, PointsHistory, LearningStreak
+from .models import (
+    Badge, Achievement, UserBadge, PointsHistory, PointsBalance, LearningStreak, GameSession, GameStats,
+)
 
 @admin.register(Badge)
 class BadgeAdmin(admin.ModelAdmin):
@@ -27,6 +29,27 @@ class PointsHistoryAdmin(admin.ModelAdmin):
     list_filter = ('point_type', 'created_at')
     date_hierarchy = 'created_at'
 
+@admin.register(PointsBalance)
+class PointsBalanceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_points', 'school_name', 'village', 'grade_level', 'updated_at')
+    search_fields = ('user__username', 'school_name', 'village')
+    list_filter = ('grade_level',)
+    readonly_fields = ('user', 'total_points', 'school_name', 'village', 'grade_level', 'updated_at')
+
+@admin.register(GameSession)
+class GameSessionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'game_name', 'score', 'duration_ms', 'created_at')
+    search_fields = ('user__username', 'game_name', 'game_slug')
+    list_filter = ('game_slug', 'created_at')
+    date_hierarchy = 'created_at'
+
+@admin.register(GameStats)
+class GameStatsAdmin(admin.ModelAdmin):
+    list_display = ('game_name', 'plays', 'players', 'best_score', 'last_played')
+    search_fields = ('game_name', 'game_slug')
+    readonly_fields = ('game_slug', 'game_name', 'plays', 'players', 'total_score', 'total_duration_ms',
+                       'best_score', 'last_played')
+
 @admin.register(LearningStreak)
 class LearningStreakAdmin(admin.ModelAdmin):
     list_display = ('user', 'current_streak', 'longest_streak', 'last_activity_date')
@@ -0,0 +1,87 @@
+"""Awarding badges when a user's points total crosses ``Badge.points_required``.
+
+The thresholds are cached as one sorted list of ``[points_required,
+badge_id]`` pairs. When a balance goes from ``old`` to ``new``, the badges
+whose threshold lies in ``(old, new]`` are the slice between two bisections
+of that list, so a points write costs two binary searches plus one
+``bulk_create`` of the new UserBadge rows (and nothing when no threshold was
+crossed). ``award_all`` does the same for the whole user base, in chunks.
+"""
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Badge, PointsBalance, UserBadge
+
+THRESHOLDS_CACHE_KEY = 'badge_thresholds'
+
+
+def build_thresholds() -> list:
+    return [list(row) for row in Badge.objects.order_by('points_required', 'pk').values_list('points_required', 'pk')]
+
+
+def get_thresholds() -> list:
+    thresholds = cache.get(THRESHOLDS_CACHE_KEY)
+    if thresholds is None:
+        thresholds = build_thresholds()
+        cache.set(THRESHOLDS_CACHE_KEY, thresholds, timeout=getattr(settings, 'CACHE_TTL', 60 * 15))
+    return thresholds
+
+
+def invalidate_thresholds() -> None:
+    cache.delete(THRESHOLDS_CACHE_KEY)
+
+
+def _points(thresholds) -> list:
+    return [points for points, _ in thresholds]
+
+
+def crossed(thresholds, old_total, new_total) -> list:
+    """Ids of badges with ``old_total < points_required <= new_total``."""
+    points = _points(thresholds)
+    return [badge_id for _, badge_id in thresholds[bisect_right(points, old_total):bisect_right(points, new_total)]]
+
+
+def award_for_change(user_id, old_total, new_total) -> list:
+    """Award the badges a balance change from ``old_total`` to ``new_total`` crossed; returns their ids."""
+    if new_total <= old_total:
+        return []
+    thresholds = get_thresholds()
+    if not thresholds or thresholds[0][0] > new_total:
+        return []
+    badge_ids = crossed(thresholds, old_total, new_total)
+    if badge_ids:
+        # ignore_conflicts: the user may hold a badge already, e.g. from before it was re-priced
+        UserBadge.objects.bulk_create(
+            [UserBadge(user_id=user_id, badge_id=badge_id) for badge_id in badge_ids], ignore_conflicts=True,
+        )
+    return badge_ids
+
+
+def award_all(chunk_size=1000) -> int:
+    """Give every user each badge their current total qualifies for; returns badges awarded.
+
+    Needed after badges are added or their thresholds lowered, which the
+    per-change path only notices for users who earn points afterwards.
+    """
+    thresholds = build_thresholds()
+    if not thresholds:
+        return 0
+    points = _points(thresholds)
+    before = UserBadge.objects.count()
+    last_pk = 0
+    while True:
+        chunk = list(
+            PointsBalance.objects.filter(pk__gt=last_pk, total_points__gte=points[0])
+            .order_by('pk').values_list('pk', 'user_id', 'total_points')[:chunk_size]
+        )
+        if not chunk:
+            return UserBadge.objects.count() - before
+        last_pk = chunk[-1][0]
+        rows = [
+            UserBadge(user_id=user_id, badge_id=badge_id)
+            for _, user_id, total in chunk
+            for _, badge_id in thresholds[:bisect_right(points, total)]
+        ]
+        UserBadge.objects.bulk_create(rows, ignore_conflicts=True, batch_size=chunk_size)
@@ -0,0 +1,531 @@
+"""Materialized points leaderboards.
+
+``PointsBalance`` holds every user's running total and ``DailyPoints`` what
+they earned per day. Both are updated in the same transaction as each
+``PointsHistory`` write (see ``gamification.signals``), so no lookup here
+touches the history table:
+
+* all-time boards read the indexed ``PointsBalance.total_points`` column;
+* rolling windows (``WINDOWS``) sum at most one bucket per user per day in
+  the window;
+* boards scoped to a school, village or grade (``SCOPES``) filter on the
+  profile fields copied onto ``PointsBalance``, each with its own
+  ``(field, total_points)`` index.
+
+With ``LEADERBOARD_BACKEND = 'redis'`` all-time totals are mirrored after
+commit into a global sorted set and one per scope value, and served from
+them (``ZREVRANGE`` / ``ZCOUNT``, O(log n)). The sets live on their own
+connection (``LEADERBOARD_REDIS_URL``), away from the evictable cache. A
+board whose key does not exist has not been built: lookups read the table
+and the board is seeded from ``PointsBalance``, and mirrors only increment
+boards that exist, so an increment never starts a board holding one user.
+A mirror that fails drops the boards it touched so they are reseeded. If
+Redis is unreachable, lookups fall back to the table.
+``rebuild_leaderboard`` recomputes everything from the history and the
+profiles.
+
+Gains also award the badges whose threshold the new total crossed
+(``gamification.badges``).
+"""
+import contextlib
+import logging
+import threading
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .badges import award_for_change, get_thresholds
+from .models import DailyPoints, PointsBalance, PointsHistory
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_KEY = 'leaderboard:all'
+# Held while a board is seeded; seeds are written under a temporary key and renamed into place
+SEED_LOCK_PREFIX = 'leaderboard-seeding:'
+SEED_TMP_PREFIX = 'leaderboard-tmp:'
+SEED_LOCK_TIMEOUT = 300
+
+# ZINCRBY ARGV[2] by ARGV[1] on each of KEYS that exists
+_INCR_IF_BUILT = '''
+for _, key in ipairs(KEYS) do
+  if redis.call('EXISTS', key) == 1 then redis.call('ZINCRBY', key, ARGV[1], ARGV[2]) end
+end
+'''
+# ZADD ARGV[2] with score ARGV[1] to each of KEYS that exists
+_SET_IF_BUILT = '''
+for _, key in ipairs(KEYS) do
+  if redis.call('EXISTS', key) == 1 then redis.call('ZADD', key, ARGV[1], ARGV[2]) end
+end
+'''
+
+# Rolling windows as days back from today (today included); 'term' starts at
+# LEADERBOARD_TERM_START and 'all-time' reads the running totals.
+WINDOWS = {
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30,
+    'term': None,
+}
+ALL_TIME = 'all-time'
+
+# Balance columns that must equal sums over PointsHistory
+TOTAL_FIELDS = ['total_points', *(f'{point_type}_points' for point_type, _ in PointsHistory.POINT_TYPES)]
+
+# Scope name -> profile field copied onto PointsBalance
+SCOPES = {
+    'school': 'school_name',
+    'village': 'village',
+    'grade': 'grade_level',
+}
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def paused_tracking():
+    """Skip balance/bucket updates for history writes that keep sums unchanged."""
+    _local.paused = True
+    try:
+        yield
+    finally:
+        _local.paused = False
+
+
+def tracking_paused() -> bool:
+    return getattr(_local, 'paused', False)
+
+
+_client = None
+
+
+def _redis():
+    global _client
+    if getattr(settings, 'LEADERBOARD_BACKEND', 'db') != 'redis':
+        return None
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(getattr(settings, 'LEADERBOARD_REDIS_URL', 'redis://127.0.0.1:6379/2'))
+    return _client
+
+
+def _shift(model, lookup, deltas: dict, create=True, defaults=None) -> None:
+    """Add ``deltas`` ({field: amount}) to the row matching ``lookup``, creating it if needed."""
+    increments = {field: F(field) + amount for field, amount in deltas.items()}
+    if model.objects.filter(**lookup).update(**increments) or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas, **(defaults() if defaults else {}))
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**lookup).update(**increments)
+
+
+def profile_scopes(user_id) -> dict:
+    """The user's scope fields as stored on their profile."""
+    from accounts.models import UserProfile
+    row = UserProfile.objects.filter(user_id=user_id).values(*SCOPES.values()).first()
+    return row or {}
+
+
+def scope_key(field, value) -> str:
+    return f'{LEADERBOARD_KEY}:{field}:{value}'
+
+
+def _scope_keys(scopes) -> list:
+    return [scope_key(field, value) for field, value in scopes.items() if value not in ('', None)]
+
+
+def shift_balance(user_id, points, point_type=None, create=True) -> None:
+    """Add ``points`` (may be negative) to the user's balance row and its ``point_type`` column."""
+    if not points:
+        return
+    deltas = {'total_points': points}
+    field = PointsBalance.type_field(point_type)
+    if field:
+        deltas[field] = points
+    _shift(PointsBalance, {'user_id': user_id}, deltas, create, defaults=lambda: profile_scopes(user_id))
+
+
+def bucket_day(moment) -> date:
+    return timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+
+
+def record_points(user_id, points, day, point_type=None, create=True) -> None:
+    """Apply a points change to the tables now and to Redis once the transaction commits.
+
+    ``create=False`` only adjusts existing rows; deletes use it so a cascade
+    removing a user cannot re-create rows for them.
+    """
+    if not points or tracking_paused():
+        return
+    shift_balance(user_id, points, point_type, create)
+    _shift(DailyPoints, {'user_id': user_id, 'day': day}, {'points': points}, create)
+    if points > 0 and get_thresholds():
+        total = PointsBalance.objects.filter(user_id=user_id).values_list('total_points', flat=True).first()
+        if total is not None:
+            award_for_change(user_id, total - points, total)
+    if getattr(settings, 'LEADERBOARD_BACKEND', 'db') != 'redis':
+        return
+
+    scopes = PointsBalance.objects.filter(user_id=user_id).values(*SCOPES.values()).first() or {}
+
+    keys = [LEADERBOARD_KEY, *_scope_keys(scopes)]
+
+    def mirror():
+        try:
+            _redis().eval(_INCR_IF_BUILT, len(keys), *keys, points, user_id)
+        except Exception as e:
+            logger.warning(f"Leaderboard update for user {user_id} not mirrored to Redis: {e}")
+            _drop_boards(keys)
+
+    transaction.on_commit(mirror)
+
+
+def record_entries(entries) -> None:
+    """``record_points`` for PointsHistory rows written with ``bulk_create`` (which sends no signals).
+
+    Entries are grouped per user, type and day, so a batch costs one update
+    per group rather than per row.
+    """
+    deltas = {}
+    for entry in entries:
+        key = (entry.user_id, entry.point_type, bucket_day(entry.created_at))
+        deltas[key] = deltas.get(key, 0) + (entry.points or 0)
+    for (user_id, point_type, day), points in deltas.items():
+        record_points(user_id, points, day, point_type)
+
+
+def _drop_boards(keys) -> None:
+    """Delete boards that missed an update, so the next lookup reseeds them from the table."""
+    try:
+        _redis().delete(*keys)
+    except Exception as e:
+        logger.error(f"Leaderboard boards {keys} are stale until rebuild_leaderboard runs: {e}")
+
+
+def move_scopes(user_id, old: dict, new: dict) -> None:
+    """Follow a profile's school/village/grade change on the balance row and in Redis."""
+    if not PointsBalance.objects.filter(user_id=user_id).update(**new):
+        return
+    if getattr(settings, 'LEADERBOARD_BACKEND', 'db') != 'redis':
+        return
+    total = PointsBalance.objects.filter(user_id=user_id).values_list('total_points', flat=True).first()
+
+    old_keys, new_keys = _scope_keys(old), _scope_keys(new)
+
+    def mirror():
+        try:
+            pipe = _redis().pipeline(transaction=True)
+            for key in old_keys:
+                pipe.zrem(key, user_id)
+            if new_keys:
+                pipe.eval(_SET_IF_BUILT, len(new_keys), *new_keys, total, user_id)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Leaderboard scopes for user {user_id} not mirrored to Redis: {e}")
+            _drop_boards([*old_keys, *new_keys])
+
+    transaction.on_commit(mirror)
+
+
+def get_balance(user_id) -> PointsBalance:
+    """The user's balance row, or an unsaved all-zero one if they have no points yet."""
+    return PointsBalance.objects.filter(user_id=user_id).first() or PointsBalance(user_id=user_id)
+
+
+def _rows(pairs):
+    """``[(user_id, points)]`` -> template-friendly dicts, in the same order."""
+    names = dict(User.objects.filter(pk__in=[u for u, _ in pairs]).values_list('pk', 'username'))
+    return [
+        {'user__id': user_id, 'user__username': names.get(user_id, ''), 'total_points': points}
+        for user_id, points in pairs
+    ]
+
+
+def viewer_scope(scope: str, user_id):
+    """``{field: value}`` selecting the user's own school, village or grade, or None if unset."""
+    field = SCOPES[scope]
+    value = profile_scopes(user_id).get(field)
+    return None if value in ('', None) else {field: value}
+
+
+def _key(where) -> str:
+    return scope_key(*next(iter(where.items()))) if where else LEADERBOARD_KEY
+
+
+def seed_board(client, where=None, batch_size=1000) -> bool:
+    """Load a board's sorted set from ``PointsBalance``; False if another process holds the seed lock.
+
+    Scoped boards (``where``) are seeded from their own index. A change
+    committed while the snapshot is read can be missed; the next
+    ``rebuild_leaderboard`` corrects it.
+    """
+    key = _key(where)
+    lock = SEED_LOCK_PREFIX + key
+    if not client.set(lock, 1, nx=True, ex=SEED_LOCK_TIMEOUT):
+        return False
+    try:
+        tmp = SEED_TMP_PREFIX + key
+        client.delete(tmp)
+        rows = PointsBalance.objects.filter(**(where or {})).values_list('user_id', 'total_points')
+        batch = {}
+        for user_id, points in rows.iterator(chunk_size=batch_size):
+            batch[user_id] = points
+            if len(batch) >= batch_size:
+                client.zadd(tmp, batch)
+                batch = {}
+        if batch:
+            client.zadd(tmp, batch)
+        # An empty board has no key and keeps being read from the table
+        if client.exists(tmp):
+            client.rename(tmp, key)
+    finally:
+        client.delete(lock)
+    return True
+
+
+def _board(where):
+    """``(client, key)`` for a built Redis board, or None to read the table."""
+    client = _redis()
+    if client is None:
+        return None
+    key = _key(where)
+    try:
+        if client.exists(key):
+            return client, key
+        seed_board(client, where)
+    except Exception as e:
+        logger.warning(f"Leaderboard board {key} unavailable in Redis, using the table: {e}")
+    return None
+
+
+def top(n=10, where=None):
+    """The ``n`` highest all-time totals, best first, optionally within a scope (``viewer_scope``)."""
+    board = _board(where)
+    if board is not None:
+        client, key = board
+        try:
+            pairs = client.zrevrange(key, 0, n - 1, withscores=True)
+            return _rows([(int(member), int(score)) for member, score in pairs])
+        except Exception as e:
+            logger.warning(f"Leaderboard read from Redis failed, using the table: {e}")
+    pairs = (
+        PointsBalance.objects.filter(**(where or {}))
+        .order_by('-total_points', 'user_id').values_list('user_id', 'total_points')[:n]
+    )
+    return _rows(list(pairs))
+
+
+def rank(user_id, where=None):
+    """All-time ``(rank, points)`` for the user, 1-based with ties sharing a rank, or None."""
+    board = _board(where)
+    if board is not None:
+        client, key = board
+        try:
+            score = client.zscore(key, user_id)
+            if score is None:
+                return None
+            return client.zcount(key, f'({score}', '+inf') + 1, int(score)
+        except Exception as e:
+            logger.warning(f"Leaderboard read from Redis failed, using the table: {e}")
+    balances = PointsBalance.objects.filter(**(where or {}))
+    points = balances.filter(user_id=user_id).values_list('total_points', flat=True).first()
+    if points is None:
+        return None
+    return balances.filter(total_points__gt=points).count() + 1, points
+
+
+# --- Rolling windows ---
+
+def window_start(window: str, today=None) -> date:
+    today = today or timezone.localdate()
+    if window == 'term':
+        month, day = getattr(settings, 'LEADERBOARD_TERM_START', (4, 1))
+        start = today.replace(month=month, day=day)
+        return start if start <= today else start.replace(year=today.year - 1)
+    return today - timedelta(days=WINDOWS[window] - 1)
+
+
+def _buckets(window, today=None, where=None):
+    where = {f'user__points_balance__{field}': value for field, value in (where or {}).items()}
+    return DailyPoints.objects.filter(day__gte=window_start(window, today), **where)
+
+
+def _window_totals(window, today=None, where=None):
+    return _buckets(window, today, where).values('user_id').annotate(total=Sum('points')).order_by()
+
+
+def window_top(window: str, n=10, today=None, where=None):
+    """The ``n`` best totals over a rolling window, best first."""
+    if window == ALL_TIME:
+        return top(n, where)
+    totals = _window_totals(window, today, where).filter(total__gt=0).order_by('-total', 'user_id')
+    return _rows(list(totals.values_list('user_id', 'total')[:n]))
+
+
+def window_rank(window: str, user_id, today=None, where=None):
+    """``(rank, points)`` over a rolling window, or None without points in it."""
+    if window == ALL_TIME:
+        return rank(user_id, where)
+    points = _buckets(window, today, where).filter(user_id=user_id).aggregate(total=Sum('points'))['total']
+    if not points:
+        return None
+    return _window_totals(window, today, where).filter(total__gt=points).count() + 1, points
+
+
+# --- Repair and compaction ---
+
+def _history_totals() -> dict:
+    """``{user_id: {'total_points': n, '<type>_points': n, ...}}`` summed from PointsHistory."""
+    totals = {}
+    rows = PointsHistory.objects.values('user_id', 'point_type').annotate(total=Sum('points')).order_by()
+    for row in rows:
+        entry = totals.setdefault(row['user_id'], dict.fromkeys(TOTAL_FIELDS, 0))
+        entry['total_points'] += row['total']
+        field = PointsBalance.type_field(row['point_type'])
+        if field:
+            entry[field] += row['total']
+    return totals
+
+
+def rebuild_leaderboard(batch_size=1000) -> dict:
+    """Recompute balances, their scope fields and daily buckets, and reload Redis.
+
+    Returns counts of balance rows created, updated and deleted.
+    """
+    from accounts.models import UserProfile
+
+    fields = list(SCOPES.values())
+    with transaction.atomic():
+        history = _history_totals()
+        actual = {user_id: totals['total_points'] for user_id, totals in history.items()}
+        profiles = {
+            row.pop('user_id'): row
+            for row in UserProfile.objects.filter(user_id__in=list(actual)).values('user_id', *fields)
+        }
+        stored = {b.user_id: b for b in PointsBalance.objects.select_for_update()}
+        unscoped = {'school_name': '', 'village': '', 'grade_level': None}
+        changed = []
+        created = []
+        for user_id, totals in history.items():
+            expected = {**totals, **unscoped, **profiles.get(user_id, {})}
+            balance = stored.get(user_id)
+            if balance is None:
+                created.append(PointsBalance(user_id=user_id, **expected))
+            elif any(getattr(balance, f) != v for f, v in expected.items()):
+                for f, v in expected.items():
+                    setattr(balance, f, v)
+                changed.append(balance)
+        stale = [user_id for user_id in stored if user_id not in actual]
+        PointsBalance.objects.bulk_update(changed, [*TOTAL_FIELDS, *fields], batch_size=batch_size)
+        PointsBalance.objects.bulk_create(created, batch_size=batch_size)
+        PointsBalance.objects.filter(user_id__in=stale).delete()
+
+        # Buckets are cheap to regenerate wholesale
+        DailyPoints.objects.all().delete()
+        buckets = (
+            PointsHistory.objects.annotate(day=TruncDate('created_at'))
+            .values('user_id', 'day').annotate(total=Sum('points')).order_by()
+        )
+        DailyPoints.objects.bulk_create(
+            [DailyPoints(user_id=row['user_id'], day=row['day'], points=row['total']) for row in buckets],
+            batch_size=batch_size,
+        )
+
+    client = _redis()
+    if client is not None:
+        boards = {LEADERBOARD_KEY: dict(actual)}
+        for user_id, total in actual.items():
+            for key in _scope_keys(profiles.get(user_id, {})):
+                boards.setdefault(key, {})[user_id] = total
+        pipe = client.pipeline(transaction=True)
+        pipe.delete(LEADERBOARD_KEY, *client.scan_iter(match=f'{LEADERBOARD_KEY}:*'))
+        for key, scores in boards.items():
+            items = list(scores.items())
+            for i in range(0, len(items), batch_size):
+                pipe.zadd(key, dict(items[i:i + batch_size]))
+        pipe.execute()
+    return {'created': len(created), 'updated': len(changed), 'deleted': len(stale)}
+
+
+def find_drift() -> list:
+    """Balance columns that disagree with PointsHistory.
+
+    Returns ``(user_id, field, stored, expected)`` tuples; a missing balance
+    row is reported with ``stored`` None, a balance without history against 0.
+    """
+    history = _history_totals()
+    drift = []
+    for balance in PointsBalance.objects.values('user_id', *TOTAL_FIELDS).iterator():
+        user_id = balance.pop('user_id')
+        expected = history.pop(user_id, dict.fromkeys(TOTAL_FIELDS, 0))
+        drift.extend(
+            (user_id, field, balance[field], expected[field])
+            for field in TOTAL_FIELDS if balance[field] != expected[field]
+        )
+    drift.extend((user_id, 'total_points', None, totals['total_points']) for user_id, totals in history.items())
+    return drift
+
+
+def reconcile_balances(fix=False) -> list:
+    """Check balances against the history, log any drift and optionally rebuild."""
+    drift = find_drift()
+    if drift:
+        users = len({user_id for user_id, *_ in drift})
+        logger.warning(f"Points balance drift for {users} users, e.g. {drift[:5]}")
+        if fix:
+            rebuild_leaderboard()
+    return drift
+
+
+def compact_history(before: date, batch_size=1000) -> int:
+    """Merge history rows older than ``before`` into one row per user, type and day.
+
+    Sums per user and day are unchanged, so balances and buckets stay valid.
+    Rows with an ``event_id`` are kept: the id is what dedupes resent telemetry
+    and streak milestones. Returns the number of rows removed.
+    """
+    old = PointsHistory.objects.annotate(day=TruncDate('created_at')).filter(
+        day__lt=before, event_id__isnull=True,
+    )
+    groups = (
+        old.values('user_id', 'point_type', 'day')
+        .annotate(total=Sum('points'), rows=models.Count('id'), first=models.Min('created_at'))
+        .filter(rows__gt=1).order_by('user_id', 'point_type', 'day')
+    )
+    removed = 0
+    with transaction.atomic(), paused_tracking():
+        while True:
+            # Read a chunk fully before writing; a compacted group no longer has rows > 1,
+            # so the next query starts after it. Iterating a cursor while writing the same
+            # table is unsafe on SQLite.
+            chunk = list(groups[:batch_size])
+            if not chunk:
+                break
+            removed += _compact_groups(old, chunk)
+    return removed
+
+
+def _compact_groups(old, groups) -> int:
+    """Replace each group's rows with one summed row; returns the rows removed."""
+    removed = 0
+    for group in groups:
+        ids = list(
+            old.filter(user_id=group['user_id'], point_type=group['point_type'], day=group['day'])
+            .values_list('pk', flat=True)
+        )
+        PointsHistory.objects.filter(pk__in=ids).delete()
+        entry = PointsHistory.objects.create(
+            user_id=group['user_id'], point_type=group['point_type'], points=group['total'],
+            description=f"Compacted {group['rows']} entries from {group['day']}",
+        )
+        # auto_now_add ignores the value passed to create()
+        PointsHistory.objects.filter(pk=entry.pk).update(created_at=group['first'])
+        removed += len(ids) - 1
+    return removed
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from gamification.badges import award_all
+
+
+class Command(BaseCommand):
+    help = 'Award every badge each user has enough points for (run after adding or re-pricing badges).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users processed per batch (default 1000).')
+
+    def handle(self, *args, **options):
+        awarded = award_all(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Awarded {awarded} badges.'))
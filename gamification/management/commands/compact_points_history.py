@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from gamification.leaderboard import compact_history
+
+
+class Command(BaseCommand):
+    help = 'Merge old PointsHistory rows into one row per user, point type and day.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=90,
+                            help='Only compact rows older than this many days (default 90).')
+
+    def handle(self, *args, **options):
+        before = timezone.localdate() - timedelta(days=options['older_than'])
+        removed = compact_history(before)
+        self.stdout.write(self.style.SUCCESS(f"Compacted points history before {before}: {removed} rows removed."))
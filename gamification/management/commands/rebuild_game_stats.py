@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from gamification.sessions import rebuild_game_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-game and per-player game statistics from GameSession.'
+
+    def handle(self, *args, **options):
+        result = rebuild_game_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Game stats rebuilt: {result['games']} games, {result['players']} player records."
+        ))
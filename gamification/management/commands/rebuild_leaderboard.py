@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from gamification.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user points balance from PointsHistory and reload the leaderboard store.'
+
+    def handle(self, *args, **options):
+        result = rebuild_leaderboard()
+        self.stdout.write(self.style.SUCCESS(
+            f"Leaderboard rebuilt: {result['created']} created, {result['updated']} corrected, "
+            f"{result['deleted']} removed."
+        ))
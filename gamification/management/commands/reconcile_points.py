@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from gamification.leaderboard import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = 'Check points balances against PointsHistory and report (or, with --fix, repair) any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild balances when drift is found.')
+
+    def handle(self, *args, **options):
+        drift = reconcile_balances(fix=options['fix'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Points balances match the history.'))
+            return
+        for user_id, field, stored, expected in drift[:20]:
+            self.stdout.write(f"user {user_id}: {field} is {stored}, history says {expected}")
+        if len(drift) > 20:
+            self.stdout.write(f"... and {len(drift) - 20} more")
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt balances; {len(drift)} mismatches repaired.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} mismatches found; rerun with --fix to repair.'))
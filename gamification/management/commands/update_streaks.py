@@ -0,0 +1,19 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from gamification.streaks import update_streaks
+
+
+class Command(BaseCommand):
+    help = "Advance learning streaks from a day's lesson, quiz and game activity (default: yesterday)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Day to process, YYYY-MM-DD.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users processed per batch (default 1000).')
+
+    def handle(self, *args, **options):
+        result = update_streaks(options['date'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Streaks updated: {result['active']} active, {result['extended']} extended, "
+            f"{result['started']} started, {result['reset']} reset, {result['awarded']} awards."
+        ))
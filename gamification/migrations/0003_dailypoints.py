@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_buckets(apps, schema_editor):
+    PointsHistory = apps.get_model('gamification', 'PointsHistory')
+    DailyPoints = apps.get_model('gamification', 'DailyPoints')
+    rows = (
+        PointsHistory.objects.annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day').annotate(total=Sum('points')).order_by()
+    )
+    DailyPoints.objects.bulk_create(
+        [DailyPoints(user_id=row['user_id'], day=row['day'], points=row['total'] or 0) for row in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0002_pointsbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pointshistory',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='DailyPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'user'], name='gamificatio_day_d1cdab_idx')],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_profile_scopes(apps, schema_editor):
+    PointsBalance = apps.get_model('gamification', 'PointsBalance')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    profiles = {
+        p['user_id']: p
+        for p in UserProfile.objects.values('user_id', 'school_name', 'village', 'grade_level')
+    }
+    balances = list(PointsBalance.objects.all())
+    for balance in balances:
+        profile = profiles.get(balance.user_id, {})
+        balance.school_name = profile.get('school_name') or ''
+        balance.village = profile.get('village') or ''
+        balance.grade_level = profile.get('grade_level')
+    PointsBalance.objects.bulk_update(balances, ['school_name', 'village', 'grade_level'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_userprofile_email_verified_and_more'),
+        ('gamification', '0003_dailypoints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointsbalance',
+            name='grade_level',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pointsbalance',
+            name='school_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='pointsbalance',
+            name='village',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='pointsbalance',
+            index=models.Index(fields=['school_name', '-total_points'], name='balance_school_rank'),
+        ),
+        migrations.AddIndex(
+            model_name='pointsbalance',
+            index=models.Index(fields=['village', '-total_points'], name='balance_village_rank'),
+        ),
+        migrations.AddIndex(
+            model_name='pointsbalance',
+            index=models.Index(fields=['grade_level', '-total_points'], name='balance_grade_rank'),
+        ),
+        migrations.RunPython(copy_profile_scopes, migrations.RunPython.noop),
+    ]
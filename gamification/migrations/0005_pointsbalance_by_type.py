@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:09
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+POINT_TYPES = ('lesson', 'quiz', 'achievement', 'daily', 'streak')
+
+
+def backfill_by_type(apps, schema_editor):
+    PointsHistory = apps.get_model('gamification', 'PointsHistory')
+    PointsBalance = apps.get_model('gamification', 'PointsBalance')
+    sums = {}
+    rows = (
+        PointsHistory.objects.filter(point_type__in=POINT_TYPES)
+        .values('user_id', 'point_type').annotate(total=Sum('points')).order_by()
+    )
+    for row in rows:
+        sums.setdefault(row['user_id'], {})[f"{row['point_type']}_points"] = row['total'] or 0
+    balances = list(PointsBalance.objects.filter(user_id__in=list(sums)))
+    for balance in balances:
+        for field, total in sums[balance.user_id].items():
+            setattr(balance, field, total)
+    PointsBalance.objects.bulk_update(balances, [f'{t}_points' for t in POINT_TYPES], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0004_pointsbalance_scopes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointsbalance',
+            name='achievement_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pointsbalance',
+            name='daily_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pointsbalance',
+            name='lesson_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pointsbalance',
+            name='quiz_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pointsbalance',
+            name='streak_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_by_type, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0005_pointsbalance_by_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointshistory',
+            name='event_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='pointshistory',
+            constraint=models.UniqueConstraint(fields=('user', 'event_id'), name='unique_points_event'),
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:14
+
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+from django.utils.text import slugify
+
+FINISH_RE = re.compile(r'^GameFinish:(?P<name>.*)\|score=(?P<score>-?\d+)\|duration=(?P<duration>-?\d+)ms$')
+
+
+def backfill_sessions(apps, schema_editor):
+    """Turn ``GameFinish:`` points descriptions into GameSession rows and aggregate them."""
+    PointsHistory = apps.get_model('gamification', 'PointsHistory')
+    GameSession = apps.get_model('gamification', 'GameSession')
+    GameStats = apps.get_model('gamification', 'GameStats')
+    UserGameStats = apps.get_model('gamification', 'UserGameStats')
+
+    batch = []
+    entries = PointsHistory.objects.filter(description__startswith='GameFinish:').order_by('pk')
+    for entry in entries.iterator(chunk_size=2000):
+        m = FINISH_RE.match(entry.description)
+        if not m:
+            continue
+        name = m.group('name')[:100]
+        batch.append(GameSession(
+            user_id=entry.user_id, game_slug=slugify(name)[:100] or 'game', game_name=name,
+            score=max(0, int(m.group('score'))), duration_ms=max(0, int(m.group('duration'))),
+            points_entry_id=entry.pk, created_at=entry.created_at,
+        ))
+        if len(batch) >= 2000:
+            GameSession.objects.bulk_create(batch)
+            batch = []
+    GameSession.objects.bulk_create(batch)
+
+    per_player = (
+        GameSession.objects.values('user_id', 'game_slug')
+        .annotate(plays=Count('id'), best=Max('score'), duration=Sum('duration_ms'), last=Max('created_at'))
+        .order_by()
+    )
+    UserGameStats.objects.bulk_create([
+        UserGameStats(user_id=row['user_id'], game_slug=row['game_slug'], plays=row['plays'],
+                      best_score=row['best'], total_duration_ms=row['duration'], last_played=row['last'])
+        for row in per_player
+    ], batch_size=1000)
+    names = dict(GameSession.objects.order_by('game_slug', 'created_at').values_list('game_slug', 'game_name'))
+    per_game = (
+        GameSession.objects.values('game_slug')
+        .annotate(plays=Count('id'), players=Count('user_id', distinct=True), score_sum=Sum('score'),
+                  duration=Sum('duration_ms'), best=Max('score'), last=Max('created_at'))
+        .order_by()
+    )
+    GameStats.objects.bulk_create([
+        GameStats(game_slug=row['game_slug'], game_name=names[row['game_slug']], plays=row['plays'],
+                  players=row['players'], total_score=row['score_sum'], total_duration_ms=row['duration'],
+                  best_score=row['best'], last_played=row['last'])
+        for row in per_game
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0006_pointshistory_event_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_slug', models.SlugField(max_length=100, unique=True)),
+                ('game_name', models.CharField(max_length=100)),
+                ('plays', models.IntegerField(default=0)),
+                ('players', models.IntegerField(default=0)),
+                ('total_score', models.BigIntegerField(default=0)),
+                ('total_duration_ms', models.BigIntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('last_played', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GameSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_slug', models.SlugField(max_length=100)),
+                ('game_name', models.CharField(max_length=100)),
+                ('score', models.IntegerField(default=0)),
+                ('duration_ms', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('points_entry', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='game_session', to='gamification.pointshistory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['game_slug', '-score'], name='session_game_score'), models.Index(fields=['user', 'game_slug', '-created_at'], name='session_user_game')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserGameStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_slug', models.SlugField(max_length=100)),
+                ('plays', models.IntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('total_duration_ms', models.BigIntegerField(default=0)),
+                ('last_played', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['game_slug', '-best_score'], name='user_game_best')],
+                'unique_together': {('user', 'game_slug')},
+            },
+        ),
+        migrations.RunPython(backfill_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0007_gamesession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gamesession',
+            name='game_slug',
+            field=models.SlugField(allow_unicode=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='gamestats',
+            name='game_slug',
+            field=models.SlugField(allow_unicode=True, max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='usergamestats',
+            name='game_slug',
+            field=models.SlugField(allow_unicode=True, max_length=100),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 from courses.models import Course, Lesson
 
@@ -43,11 +44,134 @@ class PointsHistory(models.Model):
     points = models.IntegerField()
     point_type = models.CharField(max_length=20, choices=POINT_TYPES)
     description = models.CharField(max_length=255)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Client-generated id of the game event this entry records, for deduplicating retries
+    event_id = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'event_id'], name='unique_points_event'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.points} points - {self.point_type}"
 
+    def save(self, *args, **kwargs):
+        # post_save updates the balance and daily bucket (gamification.signals); commit all or nothing.
+        # delete() needs no wrapper: post_delete already runs inside the delete's transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class PointsBalance(models.Model):
+    """Running points totals per user, kept in step with PointsHistory by gamification.signals.
+
+    ``<point_type>_points`` break ``total_points`` down by
+    ``PointsHistory.point_type``. ``school_name``, ``village`` and
+    ``grade_level`` are copied from the user's profile so scoped leaderboards
+    are answered from this table alone.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='points_balance')
+    total_points = models.IntegerField(default=0, db_index=True)
+    lesson_points = models.IntegerField(default=0)
+    quiz_points = models.IntegerField(default=0)
+    achievement_points = models.IntegerField(default=0)
+    daily_points = models.IntegerField(default=0)
+    streak_points = models.IntegerField(default=0)
+    school_name = models.CharField(max_length=200, blank=True)
+    village = models.CharField(max_length=200, blank=True)
+    grade_level = models.IntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['school_name', '-total_points'], name='balance_school_rank'),
+            models.Index(fields=['village', '-total_points'], name='balance_village_rank'),
+            models.Index(fields=['grade_level', '-total_points'], name='balance_grade_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.total_points} points"
+
+    @staticmethod
+    def type_field(point_type):
+        """Column holding points of ``point_type``, or None for types without one."""
+        return f'{point_type}_points' if point_type in dict(PointsHistory.POINT_TYPES) else None
+
+    def points_by_type(self):
+        return {point_type: getattr(self, f'{point_type}_points') for point_type, _ in PointsHistory.POINT_TYPES}
+
+class DailyPoints(models.Model):
+    """Points a user earned on one day; rolling-window leaderboards sum these."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    day = models.DateField()
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [('user', 'day')]
+        indexes = [models.Index(fields=['day', 'user'])]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.day} - {self.points} points"
+
+class GameSession(models.Model):
+    """One finished game, as reported by ``track_finish`` / ``track_batch``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='game_sessions')
+    game_slug = models.SlugField(max_length=100, allow_unicode=True)
+    game_name = models.CharField(max_length=100)
+    score = models.IntegerField(default=0)
+    duration_ms = models.IntegerField(default=0)
+    points_entry = models.OneToOneField(
+        PointsHistory, null=True, blank=True, on_delete=models.SET_NULL, related_name='game_session',
+    )
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['game_slug', '-score'], name='session_game_score'),
+            models.Index(fields=['user', 'game_slug', '-created_at'], name='session_user_game'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.game_name} - {self.score}"
+
+class GameStats(models.Model):
+    """Running aggregates for one game, kept in step with GameSession by gamification.sessions."""
+    game_slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+    game_name = models.CharField(max_length=100)
+    plays = models.IntegerField(default=0)
+    players = models.IntegerField(default=0)
+    total_score = models.BigIntegerField(default=0)
+    total_duration_ms = models.BigIntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    last_played = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.game_name} - {self.plays} plays"
+
+    @property
+    def average_score(self):
+        return round(self.total_score / self.plays, 1) if self.plays else 0
+
+    @property
+    def average_duration_ms(self):
+        return self.total_duration_ms // self.plays if self.plays else 0
+
+class UserGameStats(models.Model):
+    """A user's plays and best score in one game; high-score tables read this."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='game_stats')
+    game_slug = models.SlugField(max_length=100, allow_unicode=True)
+    plays = models.IntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    total_duration_ms = models.BigIntegerField(default=0)
+    last_played = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = [('user', 'game_slug')]
+        indexes = [models.Index(fields=['game_slug', '-best_score'], name='user_game_best')]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.game_slug} - best {self.best_score}"
+
 class LearningStreak(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     current_streak = models.IntegerField(default=0)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Badge, Achievement, UserBadge, PointsHistory, LearningStreak
+from .models import Badge, Achievement, UserBadge, PointsHistory, LearningStreak, GameStats, UserGameStats
 
 class BadgeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -25,6 +25,33 @@ class PointsHistorySerializer(serializers.ModelSerializer):
         model = PointsHistory
         fields = ('id', 'user', 'points', 'point_type', 'description', 'created_at')
 
+class GameEventSerializer(serializers.Serializer):
+    """One queued game play or finish posted to ``points-history/track_batch``."""
+    KINDS = ('play', 'finish')
+
+    id = serializers.CharField(max_length=64)
+    kind = serializers.ChoiceField(choices=KINDS)
+    name = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    points = serializers.IntegerField(required=False, default=5, min_value=0, max_value=1000)
+    score = serializers.IntegerField(required=False, default=0, min_value=0)
+    duration_ms = serializers.IntegerField(required=False, default=0, min_value=0)
+
+class GameStatsSerializer(serializers.ModelSerializer):
+    average_score = serializers.FloatField(read_only=True)
+    average_duration_ms = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = GameStats
+        fields = ('game_slug', 'game_name', 'plays', 'players', 'best_score',
+                  'average_score', 'average_duration_ms', 'last_played')
+
+class HighScoreSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = UserGameStats
+        fields = ('user', 'username', 'best_score', 'plays', 'last_played')
+
 class LearningStreakSerializer(serializers.ModelSerializer):
     class Meta:
         model = LearningStreak
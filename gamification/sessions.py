@@ -0,0 +1,140 @@
+"""Game sessions and their precomputed per-game and per-player aggregates.
+
+Every finished game is stored as a ``GameSession`` (slug, score, duration).
+``record_sessions`` inserts sessions in bulk and updates ``GameStats``
+(plays, players, totals, best score per game) and ``UserGameStats`` (plays
+and best score per player and game) in the same transaction. Stats and
+high-score tables are then read from those rows, and
+``(game_slug, -best_score)`` is indexed. ``rebuild_game_stats`` recomputes
+both from the sessions.
+"""
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from courses.games import game_slug
+
+from .models import GameSession, GameStats, UserGameStats
+
+
+def session_for(entry, name, score, duration_ms) -> GameSession:
+    """Unsaved session for a ``track_finish`` PointsHistory entry."""
+    return GameSession(
+        user_id=entry.user_id,
+        game_slug=game_slug(name),
+        game_name=name[:100],
+        score=max(0, score),
+        duration_ms=max(0, duration_ms),
+        points_entry=entry if entry.pk else None,
+        created_at=entry.created_at,
+    )
+
+
+def _upsert(model, lookup, updates, defaults) -> bool:
+    """Apply ``updates`` to the matching row, or create it from ``defaults``; True if created."""
+    if model.objects.filter(**lookup).update(**updates):
+        return False
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **defaults)
+        return True
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**updates)
+        return False
+
+
+def record_sessions(sessions) -> list:
+    """Insert ``sessions`` and fold them into the per-game and per-player aggregates."""
+    if not sessions:
+        return []
+    with transaction.atomic():
+        GameSession.objects.bulk_create(sessions)
+
+        players = {}
+        for session in sessions:
+            players.setdefault((session.user_id, session.game_slug), []).append(session)
+        new_players = {}
+        for (user_id, slug), group in players.items():
+            plays = len(group)
+            best = max(s.score for s in group)
+            duration = sum(s.duration_ms for s in group)
+            last = max(s.created_at for s in group)
+            created = _upsert(
+                UserGameStats, {'user_id': user_id, 'game_slug': slug},
+                {'plays': F('plays') + plays, 'best_score': Greatest(F('best_score'), best),
+                 'total_duration_ms': F('total_duration_ms') + duration,
+                 'last_played': Greatest(F('last_played'), last)},
+                {'plays': plays, 'best_score': best, 'total_duration_ms': duration, 'last_played': last},
+            )
+            new_players[slug] = new_players.get(slug, 0) + int(created)
+
+        games = {}
+        for session in sessions:
+            games.setdefault(session.game_slug, []).append(session)
+        for slug, group in games.items():
+            plays = len(group)
+            score = sum(s.score for s in group)
+            duration = sum(s.duration_ms for s in group)
+            best = max(s.score for s in group)
+            last = max(s.created_at for s in group)
+            _upsert(
+                GameStats, {'game_slug': slug},
+                {'plays': F('plays') + plays, 'players': F('players') + new_players[slug],
+                 'total_score': F('total_score') + score,
+                 'total_duration_ms': F('total_duration_ms') + duration,
+                 'best_score': Greatest(F('best_score'), best),
+                 'last_played': Greatest(F('last_played'), last),
+                 'game_name': group[-1].game_name},
+                {'game_name': group[-1].game_name, 'plays': plays, 'players': new_players[slug],
+                 'total_score': score, 'total_duration_ms': duration, 'best_score': best, 'last_played': last},
+            )
+    return sessions
+
+
+def high_scores(slug, n=10):
+    """The ``n`` best players of a game by personal best, best first."""
+    return list(
+        UserGameStats.objects.filter(game_slug=slug).select_related('user')
+        .order_by('-best_score', 'last_played')[:n]
+    )
+
+
+def player_rank(slug, user_id):
+    """``(rank, best score)`` of the user in a game, or None if they never played it."""
+    best = UserGameStats.objects.filter(game_slug=slug, user_id=user_id).values_list('best_score', flat=True).first()
+    if best is None:
+        return None
+    return UserGameStats.objects.filter(game_slug=slug, best_score__gt=best).count() + 1, best
+
+
+def rebuild_game_stats() -> dict:
+    """Recompute GameStats and UserGameStats from GameSession."""
+    with transaction.atomic():
+        UserGameStats.objects.all().delete()
+        GameStats.objects.all().delete()
+        per_player = (
+            GameSession.objects.values('user_id', 'game_slug')
+            .annotate(plays=models.Count('id'), best=models.Max('score'),
+                      duration=models.Sum('duration_ms'), last=models.Max('created_at'))
+            .order_by()
+        )
+        UserGameStats.objects.bulk_create([
+            UserGameStats(user_id=row['user_id'], game_slug=row['game_slug'], plays=row['plays'],
+                          best_score=row['best'], total_duration_ms=row['duration'], last_played=row['last'])
+            for row in per_player
+        ], batch_size=1000)
+        names = dict(GameSession.objects.order_by('game_slug', 'created_at').values_list('game_slug', 'game_name'))
+        per_game = (
+            GameSession.objects.values('game_slug')
+            .annotate(plays=models.Count('id'), players=models.Count('user_id', distinct=True),
+                      score_sum=models.Sum('score'), duration=models.Sum('duration_ms'),
+                      best=models.Max('score'), last=models.Max('created_at'))
+            .order_by()
+        )
+        GameStats.objects.bulk_create([
+            GameStats(game_slug=row['game_slug'], game_name=names[row['game_slug']], plays=row['plays'],
+                      players=row['players'], total_score=row['score_sum'], total_duration_ms=row['duration'],
+                      best_score=row['best'], last_played=row['last'])
+            for row in per_game
+        ], batch_size=1000)
+    return {'games': GameStats.objects.count(), 'players': UserGameStats.objects.count()}
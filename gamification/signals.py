@@ -0,0 +1,61 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+
+from .badges import invalidate_thresholds
+from .leaderboard import SCOPES, bucket_day, move_scopes, record_points
+from .models import Badge, PointsHistory
+
+
+@receiver(post_init, sender=PointsHistory)
+def points_snapshot(sender, instance, **kwargs):
+    # Values as last persisted, so edits can be turned into deltas
+    instance._counted_user_id = instance.__dict__.get('user_id')
+    instance._counted_points = instance.__dict__.get('points') or 0
+    instance._counted_point_type = instance.__dict__.get('point_type')
+
+
+@receiver(post_save, sender=PointsHistory)
+def points_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    points = instance.points or 0
+    # Edits stay in the bucket of the day the points were first recorded
+    day = bucket_day(instance.created_at)
+    if created:
+        record_points(instance.user_id, points, day, instance.point_type)
+    elif (instance.user_id, instance.point_type) != (instance._counted_user_id, instance._counted_point_type):
+        record_points(instance._counted_user_id, -instance._counted_points, day,
+                      instance._counted_point_type, create=False)
+        record_points(instance.user_id, points, day, instance.point_type)
+    else:
+        record_points(instance.user_id, points - instance._counted_points, day, instance.point_type)
+    instance._counted_user_id = instance.user_id
+    instance._counted_points = points
+    instance._counted_point_type = instance.point_type
+
+
+@receiver(post_delete, sender=PointsHistory)
+def points_deleted(sender, instance, **kwargs):
+    record_points(instance._counted_user_id, -instance._counted_points, bucket_day(instance.created_at),
+                  instance._counted_point_type, create=False)
+
+
+@receiver(post_init, sender=UserProfile)
+def profile_snapshot(sender, instance, **kwargs):
+    instance._counted_scopes = {field: instance.__dict__.get(field) for field in SCOPES.values()}
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, created, raw=False, **kwargs):
+    scopes = {field: getattr(instance, field) for field in SCOPES.values()}
+    if not raw and not created and scopes != instance._counted_scopes:
+        move_scopes(instance.user_id, instance._counted_scopes, scopes)
+    instance._counted_scopes = scopes
+
+
+@receiver(post_save, sender=Badge)
+@receiver(post_delete, sender=Badge)
+def badge_changed(sender, **kwargs):
+    invalidate_thresholds()
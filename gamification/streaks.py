@@ -0,0 +1,163 @@
+"""Learning streaks computed from recorded activity by a nightly job.
+
+A user is active on a day if they completed a lesson or submitted a quiz
+(``Progress.completed_at`` on a lesson or quiz row), took a quiz offline
+(``QuizAttempt.client_timestamp``) or finished a game (``GameSession``).
+``update_streaks(day)`` runs once per day, in day order, after the day is
+over:
+
+* users active on ``day`` extend a streak that ran through the day before or
+  start a new one, in chunks of ``user_id``s with ``bulk_update`` /
+  ``bulk_create``; users whose offline attempts synced that day but were taken
+  earlier have their streak recounted from their activity days instead;
+* every other running streak is reset with one UPDATE;
+* streaks passing a length in ``STREAK_MILESTONES`` earn ``streak`` points,
+  inserted in bulk with one event id per user, day and milestone so reruns
+  award once.
+
+Rerunning a day is harmless: rows already stamped with ``day`` are left as
+they are.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import GameSession, LearningStreak, PointsHistory
+from .telemetry import write_entries
+
+# Streak length (days) -> points awarded on reaching it
+DEFAULT_MILESTONES = {3: 5, 7: 20, 14: 40, 30: 100}
+
+
+def milestones() -> dict:
+    return getattr(settings, 'STREAK_MILESTONES', DEFAULT_MILESTONES)
+
+
+def _day_range(day):
+    start = datetime.combine(day, time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+    return start, start + timedelta(days=1)
+
+
+def _activity(start, end, user_ids=None) -> list:
+    """``(user_id, moment)`` querysets, one per kind of learning activity in ``[start, end)``."""
+    from courses.models import Progress, QuizAttempt
+
+    sources = [
+        # Completed lessons and web quiz submissions
+        Progress.objects.filter(
+            Q(lesson__isnull=False) | Q(quiz__isnull=False), completed=True,
+            completed_at__gte=start, completed_at__lt=end,
+        ).values_list('user_id', 'completed_at'),
+        # Offline attempts count on the day they were taken, not synced
+        QuizAttempt.objects.filter(
+            client_timestamp__gte=start, client_timestamp__lt=end,
+        ).values_list('user_id', 'client_timestamp'),
+        GameSession.objects.filter(
+            created_at__gte=start, created_at__lt=end,
+        ).values_list('user_id', 'created_at'),
+    ]
+    if user_ids is not None:
+        sources = [qs.filter(user_id__in=user_ids) for qs in sources]
+    return [qs.order_by() for qs in sources]
+
+
+def active_user_ids(day):
+    """Queryset-union of the ids of users with learning activity on ``day``."""
+    first, *rest = [qs.values_list('user_id', flat=True) for qs in _activity(*_day_range(day))]
+    return first.union(*rest)
+
+
+def late_user_ids(day) -> set:
+    """Users whose offline quiz attempts synced on ``day`` were taken on earlier days."""
+    from courses.models import QuizAttempt
+
+    start, end = _day_range(day)
+    return set(
+        QuizAttempt.objects.filter(created_at__gte=start, created_at__lt=end, client_timestamp__lt=start)
+        .values_list('user_id', flat=True).distinct()
+    )
+
+
+def activity_days(user_ids, day) -> dict:
+    """``{user_id: {dates}}`` of learning activity in the ``STREAK_LOOKBACK_DAYS`` up to ``day``."""
+    start = _day_range(day - timedelta(days=getattr(settings, 'STREAK_LOOKBACK_DAYS', 366)))[0]
+    days = {}
+    for qs in _activity(start, _day_range(day)[1], user_ids):
+        for user_id, moment in qs.iterator():
+            days.setdefault(user_id, set()).add(timezone.localdate(moment) if settings.USE_TZ else moment.date())
+    return days
+
+
+def _runs(days, day):
+    """``(length of the run ending on day, longest run)`` over a set of dates."""
+    current = longest = run = 0
+    for d in sorted(days):
+        run = run + 1 if d - timedelta(days=1) in days else 1
+        longest = max(longest, run)
+        if d == day:
+            current = run
+    return current, longest
+
+
+def update_streaks(day=None, chunk_size=1000) -> dict:
+    """Advance streaks for ``day`` (default: yesterday) and award milestone points."""
+    day = day or timezone.localdate() - timedelta(days=1)
+    yesterday = day - timedelta(days=1)
+    rewards = milestones()
+    user_ids = sorted(active_user_ids(day))
+    late = late_user_ids(day)
+    extended = started = awarded = 0
+
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        with transaction.atomic():
+            streaks = {}
+            # Lowest pk wins if a user somehow has several rows
+            for streak in LearningStreak.objects.filter(user_id__in=chunk).order_by('-pk'):
+                streaks[streak.user_id] = streak
+            # Late offline syncs may fill in earlier days, so those users are recounted from their activity
+            history = activity_days([u for u in chunk if u in late], day)
+            changed, created, entries = [], [], []
+            for user_id in chunk:
+                streak = streaks.get(user_id)
+                if streak is None:
+                    streak = LearningStreak(user_id=user_id, current_streak=0, longest_streak=0,
+                                            last_activity_date=day)
+                    created.append(streak)
+                    before = 0
+                elif streak.last_activity_date >= day:
+                    continue
+                else:
+                    before = streak.current_streak if streak.last_activity_date == yesterday else 0
+                    streak.last_activity_date = day
+                    changed.append(streak)
+                if user_id in history:
+                    streak.current_streak, longest = _runs(history[user_id], day)
+                else:
+                    streak.current_streak, longest = before + 1, before + 1
+                streak.longest_streak = max(streak.longest_streak, longest)
+                if before and streak.current_streak > before:
+                    extended += 1
+                for length, points in sorted(rewards.items()):
+                    if before < length <= streak.current_streak and points:
+                        entries.append(PointsHistory(
+                            user_id=user_id, points=points, point_type='streak',
+                            description=f"{length}-day learning streak",
+                            event_id=f'streak:{day.isoformat()}:{length}',
+                        ))
+            LearningStreak.objects.bulk_update(
+                changed, ['current_streak', 'longest_streak', 'last_activity_date'], batch_size=chunk_size,
+            )
+            LearningStreak.objects.bulk_create(created, batch_size=chunk_size)
+            started += len(created)
+            if entries:
+                awarded += len(write_entries(entries))
+
+    # Anyone whose last activity is before ``day`` has broken their streak
+    reset = LearningStreak.objects.filter(last_activity_date__lt=day, current_streak__gt=0).update(current_streak=0)
+    return {'active': len(user_ids), 'extended': extended, 'started': started, 'reset': reset, 'awarded': awarded}
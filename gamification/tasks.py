@@ -0,0 +1,29 @@
+from celery import shared_task
+import logging
+
+from .badges import award_all
+from .leaderboard import reconcile_balances
+from .streaks import update_streaks
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def reconcile_points_balances(fix=True):
+    """Compare points balances with PointsHistory and rebuild them if they drifted."""
+    drift = reconcile_balances(fix=fix)
+    if drift:
+        logger.info(f"Points balances {'rebuilt' if fix else 'left as is'} after {len(drift)} mismatches")
+    return len(drift)
+
+@shared_task
+def award_all_badges(chunk_size=1000):
+    """Backfill UserBadge rows for every user's current points total."""
+    return award_all(chunk_size=chunk_size)
+
+@shared_task
+def update_learning_streaks(day=None):
+    """Nightly: advance streaks for yesterday's learning activity (``day`` as YYYY-MM-DD to redo one)."""
+    from datetime import date
+    result = update_streaks(date.fromisoformat(day) if day else None)
+    logger.info(f"Learning streaks updated: {result}")
+    return result
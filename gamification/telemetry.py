@@ -0,0 +1,213 @@
+"""Batched ingestion of game telemetry (plays and finishes).
+
+Clients queue game events with their own ids and post them in batches to
+``points-history/track_batch``. Accepted events go into a process-wide
+write-behind buffer. The buffer writes them with one ``bulk_create`` once
+``GAME_TELEMETRY_BUFFER_SIZE`` events are waiting or the oldest has waited
+``GAME_TELEMETRY_FLUSH_INTERVAL`` seconds.
+
+Delivery is at-least-once. The endpoint only reports an event as
+``stored`` once its row exists; buffered events come back as ``pending``
+and clients keep and resend them. ``(user, event_id)`` is unique on
+PointsHistory, and already-stored or already-buffered ids are dropped, so
+retries never award points twice.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+
+from .leaderboard import record_entries
+from .models import PointsHistory
+from .sessions import record_sessions, session_for
+
+logger = logging.getLogger(__name__)
+
+MAX_EVENTS_PER_REQUEST = 200
+
+
+def play_entry(user_id, name, points, event_id=None) -> PointsHistory:
+    return PointsHistory(
+        user_id=user_id,
+        points=points,
+        point_type='achievement',
+        description=f"Played: {name}",
+        event_id=event_id,
+    )
+
+
+def finish_entry(user_id, name, score, duration_ms, event_id=None) -> PointsHistory:
+    entry = PointsHistory(
+        user_id=user_id,
+        points=score,
+        point_type='achievement',
+        description=f"GameFinish:{name}|score={score}|duration={duration_ms}ms",
+        event_id=event_id,
+    )
+    # Written as a GameSession alongside the entry
+    entry._game = (name, score, duration_ms)
+    return entry
+
+
+def save_entries(entries) -> None:
+    """Bulk-insert entries, then the balances and game sessions that go with them."""
+    PointsHistory.objects.bulk_create(entries)
+    record_entries(entries)
+    record_sessions([session_for(e, *e._game) for e in entries if hasattr(e, '_game')])
+
+
+def stored_event_ids(user_id, event_ids) -> set:
+    return set(
+        PointsHistory.objects.filter(user_id=user_id, event_id__in=list(event_ids))
+        .values_list('event_id', flat=True)
+    )
+
+
+def _unstored(entries) -> list:
+    existing = set(
+        PointsHistory.objects.filter(
+            user_id__in={e.user_id for e in entries},
+            event_id__in={e.event_id for e in entries},
+        ).values_list('user_id', 'event_id')
+    )
+    new = [e for e in entries if (e.user_id, e.event_id) not in existing]
+    for entry in new:
+        # A rolled-back bulk_create may have left primary keys behind
+        entry.pk = None
+        entry._state.adding = True
+    return new
+
+
+def write_entries(entries) -> list:
+    """Insert the entries not yet stored, update balances, and return the inserted ones.
+
+    A batch that still violates a constraint on the second try (e.g. events
+    of a user deleted while they were buffered) is written one entry at a
+    time, each in its own savepoint; entries that fail alone are logged and
+    dropped so they cannot hold back the rest.
+    """
+    for attempt in range(2):
+        new = _unstored(entries)
+        try:
+            with transaction.atomic():
+                save_entries(new)
+            return new
+        except IntegrityError:
+            # Another process stored some of these ids since the check above
+            if attempt:
+                logger.warning(f"Writing {len(new)} game events one by one after repeated integrity errors")
+
+    written = []
+    for entry in _unstored(entries):
+        try:
+            with transaction.atomic():
+                save_entries([entry])
+        except IntegrityError as e:
+            logger.error(f"Dropping game event {entry.event_id} of user {entry.user_id}: {e}")
+            continue
+        written.append(entry)
+    return written
+
+
+class WriteBehindBuffer:
+    """Thread-safe buffer of unsaved PointsHistory entries keyed by ``(user_id, event_id)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._entries = {}
+        self._oldest = None
+        self._timer = None
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'GAME_TELEMETRY_BUFFER_SIZE', 500)
+
+    @property
+    def max_age(self):
+        return getattr(settings, 'GAME_TELEMETRY_FLUSH_INTERVAL', 2.0)
+
+    def pending_ids(self, user_id) -> set:
+        with self._lock:
+            return {event_id for uid, event_id in self._entries if uid == user_id}
+
+    def add(self, entries) -> None:
+        with self._lock:
+            self._put(entries)
+            due = self._due()
+        if due:
+            self.flush()
+
+    def _put(self, entries):
+        # Caller holds self._lock
+        for entry in entries:
+            self._entries.setdefault((entry.user_id, entry.event_id), entry)
+        if self._entries and self._oldest is None:
+            self._oldest = time.monotonic()
+        if self._entries and self._timer is None:
+            self._timer = threading.Timer(self.max_age, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _due(self) -> bool:
+        return len(self._entries) >= self.max_size or (
+            self._oldest is not None and time.monotonic() - self._oldest >= self.max_age
+        )
+
+    def flush(self) -> int:
+        """Write out everything buffered; entries go back in the buffer if the write fails."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._entries, self._oldest = list(self._entries.values()), {}, None
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batch:
+                return 0
+            try:
+                return len(write_entries(batch))
+            except Exception as e:
+                # Keep them for the next flush; clients still see them as pending
+                logger.error(f"Could not write {len(batch)} buffered game events: {e}")
+                with self._lock:
+                    self._put(batch)
+                return 0
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread opened its own connection
+            connections.close_all()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer() -> WriteBehindBuffer:
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer()
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def ingest(user_id, entries) -> dict:
+    """Buffer new events for one user and report ``stored`` and ``pending`` ids."""
+    buffer = get_buffer()
+    ids = [entry.event_id for entry in entries]
+    already = stored_event_ids(user_id, ids) | buffer.pending_ids(user_id)
+    buffer.add([entry for entry in entries if entry.event_id not in already])
+    pending = buffer.pending_ids(user_id)
+    stored = stored_event_ids(user_id, [i for i in ids if i not in pending])
+    return {
+        'stored': [i for i in ids if i in stored],
+        'pending': [i for i in ids if i in pending],
+    }
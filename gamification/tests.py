@@ -1,3 +1,592 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import badges, leaderboard, sessions, streaks, telemetry
+from .models import (
+    Badge, DailyPoints, GameSession, GameStats, LearningStreak, PointsBalance, PointsHistory, UserBadge,
+)
+
+
+def award(user, points, point_type='achievement'):
+    return PointsHistory.objects.create(user=user, points=points, point_type=point_type, description='test')
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'user{n}', password='pass') for n in range(4)]
+
+    def test_balances_follow_history_writes(self):
+        a, b = self.users[:2]
+        entry = award(a, 10)
+        award(a, 5)
+        award(b, 12)
+        self.assertEqual(a.points_balance.total_points, 15)
+
+        entry.points = 2
+        entry.save()
+        entry.refresh_from_db()
+        entry.user = b
+        entry.save()
+        self.assertEqual(PointsBalance.objects.get(user=a).total_points, 5)
+        self.assertEqual(PointsBalance.objects.get(user=b).total_points, 14)
+        entry.delete()
+        self.assertEqual(PointsBalance.objects.get(user=b).total_points, 12)
+
+    def test_failed_balance_write_rolls_back_history(self):
+        from django.db import DatabaseError
+        self.client.force_login(self.users[0])
+        with mock.patch.object(leaderboard, 'shift_balance', side_effect=DatabaseError('locked')):
+            with self.assertRaises(DatabaseError):
+                self.client.post('/gamification/api/points-history/track_game/', {'name': 'Maths', 'points': 5},
+                                 content_type='application/json')
+        self.assertFalse(PointsHistory.objects.exists())
+        self.assertEqual(leaderboard.find_drift(), [])
+
+    def test_top_and_rank(self):
+        for user, points in zip(self.users, (30, 50, 30, 10)):
+            award(user, points)
+        self.assertEqual([row['user__username'] for row in leaderboard.top(3)], ['user1', 'user0', 'user2'])
+        self.assertEqual(leaderboard.rank(self.users[2].pk), (2, 30))
+        self.assertEqual(leaderboard.rank(self.users[3].pk), (4, 10))
+        self.assertIsNone(leaderboard.rank(User.objects.create_user('new').pk))
+
+    def test_page_does_not_scan_history(self):
+        award(self.users[0], 5)
+        self.client.force_login(self.users[0])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('gamification:leaderboard'))
+        self.assertEqual(response.context['my_rank'], (1, 5))
+        scans = [q for q in ctx.captured_queries if 'gamification_pointshistory' in q['sql']]
+        self.assertEqual(scans, [])
+
+    def test_rebuild_repairs_drift(self):
+        award(self.users[0], 7)
+        PointsBalance.objects.filter(user=self.users[0]).update(total_points=99)
+        PointsBalance.objects.create(user=self.users[1], total_points=3)
+        PointsHistory.objects.bulk_create([
+            PointsHistory(user=self.users[2], points=4, point_type='daily', description='bulk'),
+        ])
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        self.assertEqual(
+            dict(PointsBalance.objects.values_list('user__username', 'total_points')),
+            {'user0': 7, 'user2': 4},
+        )
+
+
+@override_settings(LEADERBOARD_BACKEND='redis')
+class RedisLeaderboardTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'user{n}', password='pass') for n in range(3)]
+        self.redis = mock.MagicMock()
+        patcher = mock.patch.object(leaderboard, '_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_board_reads_table_and_seeds(self):
+        for user, points in zip(self.users, (5, 9, 1)):
+            with self.captureOnCommitCallbacks(execute=True):
+                award(user, points)
+        self.redis.exists.side_effect = lambda key: key.startswith(leaderboard.SEED_TMP_PREFIX)
+        self.redis.set.return_value = True
+
+        self.assertEqual([r['user__username'] for r in leaderboard.top(2)], ['user1', 'user0'])
+        self.assertEqual(leaderboard.rank(self.users[2].pk), (3, 1))
+        self.redis.zrevrange.assert_not_called()
+        tmp = leaderboard.SEED_TMP_PREFIX + leaderboard.LEADERBOARD_KEY
+        self.redis.zadd.assert_any_call(tmp, {self.users[0].pk: 5, self.users[1].pk: 9, self.users[2].pk: 1})
+        self.redis.rename.assert_called_with(tmp, leaderboard.LEADERBOARD_KEY)
+
+    def test_mirror_only_increments_built_boards(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            award(self.users[0], 4)
+        script, numkeys, key, points, user_id = self.redis.eval.call_args.args
+        self.assertEqual((numkeys, key, points, user_id), (1, leaderboard.LEADERBOARD_KEY, 4, self.users[0].pk))
+        self.redis.zincrby.assert_not_called()
+
+    def test_failed_mirror_drops_board(self):
+        self.redis.eval.side_effect = ConnectionError('down')
+        with self.assertLogs('gamification.leaderboard', level='WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                award(self.users[0], 4)
+        self.redis.delete.assert_called_with(leaderboard.LEADERBOARD_KEY)
+
+
+    def test_missing_scoped_board_is_seeded_from_its_scope(self):
+        profile = self.users[0].userprofile
+        profile.school_name = 'Hill School'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+            award(self.users[0], 6)
+            award(self.users[1], 8)
+        self.redis.exists.side_effect = lambda key: key.startswith(leaderboard.SEED_TMP_PREFIX)
+        self.redis.set.return_value = True
+
+        school = {'school_name': 'Hill School'}
+        self.assertEqual(leaderboard.rank(self.users[0].pk, school), (1, 6))
+        key = leaderboard.scope_key('school_name', 'Hill School')
+        self.redis.zadd.assert_any_call(leaderboard.SEED_TMP_PREFIX + key, {self.users[0].pk: 6})
+        self.redis.rename.assert_called_with(leaderboard.SEED_TMP_PREFIX + key, key)
+
+    def test_scope_move_only_adds_to_built_boards(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            award(self.users[0], 6)
+        profile = self.users[0].userprofile
+        profile.village = 'Rampur'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        pipe = self.redis.pipeline.return_value
+        village = leaderboard.scope_key('village', 'Rampur')
+        self.assertEqual(pipe.eval.call_args.args[1:], (1, village, 6, self.users[0].pk))
+        pipe.zadd.assert_not_called()
+
+
+class WindowLeaderboardTests(TestCase):
+    def setUp(self):
+        self.a = User.objects.create_user('alice', password='pass')
+        self.b = User.objects.create_user('bob', password='pass')
+
+    def test_buckets_follow_history_writes(self):
+        today = timezone.localdate()
+        entry = award(self.a, 10)
+        award(self.a, 5)
+        self.assertEqual(DailyPoints.objects.get(user=self.a, day=today).points, 15)
+        entry.points = 4
+        entry.save()
+        entry.delete()
+        self.assertEqual(DailyPoints.objects.get(user=self.a, day=today).points, 5)
+
+    def test_windows_sum_buckets(self):
+        today = timezone.localdate()
+        award(self.a, 5)
+        award(self.b, 8)
+        DailyPoints.objects.create(user=self.a, day=today - timedelta(days=10), points=20)
+        DailyPoints.objects.create(user=self.b, day=today - timedelta(days=40), points=100)
+
+        weekly = leaderboard.window_top('weekly')
+        self.assertEqual([(r['user__username'], r['total_points']) for r in weekly], [('bob', 8), ('alice', 5)])
+        monthly = leaderboard.window_top('monthly')
+        self.assertEqual([(r['user__username'], r['total_points']) for r in monthly], [('alice', 25), ('bob', 8)])
+        self.assertEqual(leaderboard.window_rank('monthly', self.b.pk), (2, 8))
+        with CaptureQueriesContext(connection) as ctx:
+            leaderboard.window_top('weekly')
+        self.assertFalse(any('gamification_pointshistory' in q['sql'] for q in ctx.captured_queries))
+
+    def test_term_start(self):
+        from datetime import date
+        with self.settings(LEADERBOARD_TERM_START=(9, 1)):
+            self.assertEqual(leaderboard.window_start('term', date(2026, 10, 18)), date(2026, 9, 1))
+            self.assertEqual(leaderboard.window_start('term', date(2026, 3, 2)), date(2025, 9, 1))
+
+    def test_window_api(self):
+        award(self.a, 5)
+        self.client.force_login(self.b)
+        response = self.client.get('/gamification/api/leaderboard/weekly/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['top'], [{'user_id': self.a.pk, 'username': 'alice', 'points': 5}])
+        self.assertIsNone(response.json()['me'])
+        self.assertEqual(self.client.get('/gamification/api/leaderboard/all-time/').json()['top'][0]['points'], 5)
+        self.assertEqual(self.client.get('/gamification/api/leaderboard/yearly/').status_code, 404)
+
+    def test_compaction_keeps_totals(self):
+        old = [award(self.a, points) for points in (3, 4, 5)]
+        recent = award(self.a, 1)
+        long_ago = timezone.now() - timedelta(days=120)
+        PointsHistory.objects.filter(pk__in=[e.pk for e in old]).update(created_at=long_ago)
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        call_command('compact_points_history', '--older-than', '90', stdout=StringIO())
+
+        self.assertEqual(PointsHistory.objects.filter(user=self.a).count(), 2)
+        self.assertTrue(PointsHistory.objects.filter(pk=recent.pk).exists())
+        self.assertEqual(PointsBalance.objects.get(user=self.a).total_points, 13)
+        self.assertEqual(
+            dict(DailyPoints.objects.filter(user=self.a).values_list('day', 'points')),
+            {timezone.localdate(long_ago): 12, timezone.localdate(): 1},
+        )
+
+    def test_compaction_in_small_chunks(self):
+        long_ago = timezone.now() - timedelta(days=120)
+        entries = [award(user, points) for user in (self.a, self.b) for points in (1, 2, 3)]
+        PointsHistory.objects.filter(pk__in=[e.pk for e in entries]).update(created_at=long_ago)
+        removed = leaderboard.compact_history(timezone.localdate() - timedelta(days=90), batch_size=1)
+        self.assertEqual(removed, 4)
+        self.assertEqual(
+            sorted(PointsHistory.objects.values_list('user__username', 'points')), [('alice', 6), ('bob', 6)],
+        )
+
+
+class ScopedLeaderboardTests(TestCase):
+    def setUp(self):
+        self.users = {}
+        for name, school, grade in (('ana', 'Hill School', 5), ('ben', 'Hill School', 6),
+                                    ('cal', 'River School', 5), ('dev', 'Hill School', 5)):
+            user = User.objects.create_user(name, password='pass')
+            user.userprofile.school_name = school
+            user.userprofile.grade_level = grade
+            user.userprofile.village = 'Rampur'
+            user.userprofile.save()
+            self.users[name] = user
+        for name, points in (('ana', 20), ('ben', 40), ('cal', 90), ('dev', 20)):
+            award(self.users[name], points)
+
+    def test_balances_copy_profile_scopes(self):
+        balance = PointsBalance.objects.get(user=self.users['ben'])
+        self.assertEqual((balance.school_name, balance.village, balance.grade_level), ('Hill School', 'Rampur', 6))
+
+    def test_scoped_top_and_rank(self):
+        school = {'school_name': 'Hill School'}
+        self.assertEqual([r['user__username'] for r in leaderboard.top(10, school)], ['ben', 'ana', 'dev'])
+        self.assertEqual(leaderboard.rank(self.users['dev'].pk, school), (2, 20))
+        grade = leaderboard.viewer_scope('grade', self.users['ana'].pk)
+        self.assertEqual([r['user__username'] for r in leaderboard.window_top('weekly', 10, where=grade)],
+                         ['cal', 'ana', 'dev'])
+        self.assertEqual(leaderboard.window_rank('weekly', self.users['ana'].pk, where=grade), (2, 20))
+
+    def test_profile_change_moves_user(self):
+        profile = self.users['cal'].userprofile
+        profile.school_name = 'Hill School'
+        profile.save()
+        self.assertEqual(leaderboard.rank(self.users['cal'].pk, {'school_name': 'Hill School'}), (1, 90))
+        self.assertEqual(leaderboard.top(10, {'school_name': 'River School'}), [])
+
+    def test_scoped_queries_use_balance_table_only(self):
+        self.client.force_login(self.users['ana'])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/gamification/api/leaderboard/all-time/?scope=school')
+        body = response.json()
+        self.assertEqual((body['value'], body['me']), ('Hill School', {'rank': 2, 'points': 20}))
+        self.assertFalse(any('gamification_pointshistory' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(self.client.get('/gamification/api/leaderboard/weekly/?scope=city').status_code, 400)
+
+    def test_page_shows_scoped_boards(self):
+        self.client.force_login(self.users['ana'])
+        boards = self.client.get(reverse('gamification:leaderboard')).context['scoped_boards']
+        self.assertEqual([(b['label'], b['my_rank']) for b in boards],
+                         [('My School', (2, 20)), ('My Village', (3, 20)), ('My Grade', (2, 20))])
+
+    def test_rebuild_restores_scopes(self):
+        PointsBalance.objects.update(school_name='', grade_level=None)
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        self.assertEqual(leaderboard.rank(self.users['ben'].pk, {'school_name': 'Hill School'}), (1, 40))
+
+
+class PointsBalanceByTypeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('typed', password='pass')
+        self.client.force_login(self.user)
+
+    def test_type_columns_follow_history(self):
+        entry = award(self.user, 10, 'lesson')
+        award(self.user, 4, 'quiz')
+        entry.point_type = 'streak'
+        entry.save()
+        balance = PointsBalance.objects.get(user=self.user)
+        self.assertEqual(balance.points_by_type(),
+                         {'lesson': 0, 'quiz': 4, 'achievement': 0, 'daily': 0, 'streak': 10})
+        self.assertEqual(balance.total_points, 14)
+
+    def test_endpoints_read_one_row(self):
+        award(self.user, 10, 'lesson')
+        award(self.user, 3, 'daily')
+        with CaptureQueriesContext(connection) as ctx:
+            total = self.client.get('/gamification/api/points-history/total_points/').json()
+            by_type = self.client.get('/gamification/api/points-history/points_by_type/').json()
+        self.assertEqual(total, {'total_points': 13})
+        self.assertEqual(by_type, [{'point_type': 'lesson', 'total': 10}, {'point_type': 'daily', 'total': 3}])
+        self.assertFalse(any('gamification_pointshistory' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(self.client.get(reverse('gamification:achievements')).context['total_points'], 13)
+
+    def test_reconcile_detects_and_repairs_drift(self):
+        award(self.user, 10, 'lesson')
+        PointsBalance.objects.filter(user=self.user).update(lesson_points=7)
+        out = StringIO()
+        with self.assertLogs('gamification.leaderboard', 'WARNING'):
+            call_command('reconcile_points', stdout=out)
+        self.assertIn('lesson_points is 7, history says 10', out.getvalue())
+        self.assertEqual(PointsBalance.objects.get(user=self.user).lesson_points, 7)
+
+        from .tasks import reconcile_points_balances
+        with self.assertLogs('gamification.leaderboard', 'WARNING'):
+            self.assertEqual(reconcile_points_balances(), 1)
+        self.assertEqual(leaderboard.find_drift(), [])
+
+
+@override_settings(GAME_TELEMETRY_BUFFER_SIZE=3, GAME_TELEMETRY_FLUSH_INTERVAL=3600)
+class GameTelemetryBatchTests(TestCase):
+    url = '/gamification/api/points-history/track_batch/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('gamer', password='pass')
+        self.client.force_login(self.user)
+        self.addCleanup(telemetry.get_buffer().flush)
+
+    def post(self, events):
+        return self.client.post(self.url, {'events': events}, content_type='application/json')
+
+    def test_events_are_buffered_then_bulk_written(self):
+        first = self.post([{'id': 'a', 'kind': 'play', 'name': 'Maths', 'points': 5}]).json()
+        self.assertEqual((first['stored'], first['pending']), ([], ['a']))
+        self.assertFalse(PointsHistory.objects.exists())
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.post([
+                {'id': 'b', 'kind': 'finish', 'name': 'Maths', 'score': 40, 'duration_ms': 1200},
+                {'id': 'c', 'kind': 'play', 'name': 'Physics'},
+            ]).json()
+        self.assertEqual((second['stored'], second['pending']), (['b', 'c'], []))
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "gamification_pointshistory"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(PointsHistory.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(PointsBalance.objects.get(user=self.user).total_points, 50)
+        self.assertTrue(PointsHistory.objects.filter(description='GameFinish:Maths|score=40|duration=1200ms').exists())
+
+    def test_resent_events_are_counted_once(self):
+        events = [{'id': f'e{n}', 'kind': 'play', 'points': 2} for n in range(3)]
+        self.post(events)
+        again = self.post(events + [{'id': 'e0', 'kind': 'play', 'points': 2}]).json()
+        self.assertEqual(again['stored'], ['e0', 'e1', 'e2', 'e0'])
+        telemetry.get_buffer().flush()
+        self.assertEqual(PointsBalance.objects.get(user=self.user).total_points, 6)
+
+    def test_resent_events_are_counted_once_after_compaction(self):
+        events = [{'id': f'e{n}', 'kind': 'play', 'points': 2} for n in range(3)]
+        self.post(events)
+        PointsHistory.objects.update(created_at=timezone.now() - timedelta(days=120))
+        leaderboard.compact_history(timezone.localdate() - timedelta(days=90))
+        self.assertEqual(PointsHistory.objects.filter(event_id__isnull=False).count(), 3)
+
+        self.assertEqual(self.post(events).json()['stored'], ['e0', 'e1', 'e2'])
+        telemetry.get_buffer().flush()
+        self.assertEqual(PointsBalance.objects.get(user=self.user).total_points, 6)
+
+    def test_invalid_events_are_rejected_individually(self):
+        response = self.post([{'id': 'ok', 'kind': 'play'}, {'id': 'bad', 'kind': 'cheat'}]).json()
+        self.assertEqual(response['pending'], ['ok'])
+        self.assertEqual([r['id'] for r in response['rejected']], ['bad'])
+        self.assertEqual(self.client.post(self.url, {'events': 'x'}, content_type='application/json').status_code, 400)
+
+    def test_poison_event_is_dropped_without_blocking_the_buffer(self):
+        from django.db import IntegrityError
+        save_entries = telemetry.save_entries
+
+        def failing(entries):
+            if any(e.event_id == 'poison' for e in entries):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            save_entries(entries)
+
+        buffer = telemetry.get_buffer()
+        with mock.patch.object(telemetry, 'save_entries', side_effect=failing):
+            with self.assertLogs('gamification.telemetry', level='ERROR'):
+                # The third event fills the buffer and flushes it
+                buffer.add([telemetry.play_entry(self.user.pk, 'Maths', 2, event_id=i) for i in ('a', 'poison', 'b')])
+        self.assertEqual(buffer.pending_ids(self.user.pk), set())
+        self.assertEqual(sorted(PointsHistory.objects.values_list('event_id', flat=True)), ['a', 'b'])
+
+
+class GameSessionTests(TestCase):
+    def setUp(self):
+        self.a = User.objects.create_user('ana', password='pass')
+        self.b = User.objects.create_user('ben', password='pass')
+
+    def finish(self, user, name, score, duration_ms=1000):
+        self.client.force_login(user)
+        return self.client.post('/gamification/api/points-history/track_finish/',
+                                {'name': name, 'score': score, 'duration_ms': duration_ms},
+                                content_type='application/json')
+
+    def test_finish_records_session_and_stats(self):
+        self.finish(self.a, 'Fraction Fun', 40, 2000)
+        self.finish(self.a, 'Fraction Fun', 70, 4000)
+        self.finish(self.b, 'Fraction Fun', 50, 3000)
+        session = GameSession.objects.filter(user=self.a).latest('created_at')
+        self.assertEqual((session.game_slug, session.score, session.duration_ms), ('fraction-fun', 70, 4000))
+        self.assertEqual(session.points_entry.points, 70)
+
+        stats = GameStats.objects.get(game_slug='fraction-fun')
+        self.assertEqual((stats.plays, stats.players, stats.best_score), (3, 2, 70))
+        self.assertEqual((stats.average_score, stats.average_duration_ms), (53.3, 3000))
+        self.assertEqual(PointsBalance.objects.get(user=self.a).total_points, 110)
+
+    def test_non_latin_names_get_distinct_slugs(self):
+        self.finish(self.a, 'गणित खेल', 10)
+        self.finish(self.a, 'विज्ञान खेल', 20)
+        slugs = set(GameSession.objects.values_list('game_slug', flat=True))
+        self.assertEqual(len(slugs), 2)
+        self.assertNotIn('game', slugs)
+
+    def test_stats_endpoints_read_aggregates(self):
+        self.finish(self.a, 'Fraction Fun', 40)
+        self.finish(self.b, 'Fraction Fun', 90)
+        self.finish(self.b, 'Fraction Fun', 10)
+        self.client.force_login(self.a)
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get('/gamification/api/game-stats/fraction-fun/high-scores/').json()
+        self.assertFalse(any('gamification_gamesession' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual([(r['username'], r['best_score'], r['plays']) for r in body['high_scores']],
+                         [('ben', 90, 2), ('ana', 40, 1)])
+        self.assertEqual(body['me'], {'rank': 2, 'best_score': 40})
+        listing = self.client.get('/gamification/api/game-stats/').json()
+        results = listing['results'] if isinstance(listing, dict) else listing
+        self.assertEqual(results[0]['plays'], 3)
+
+    def test_batched_finishes_create_sessions(self):
+        self.client.force_login(self.a)
+        with self.settings(GAME_TELEMETRY_BUFFER_SIZE=1):
+            self.client.post('/gamification/api/points-history/track_batch/', {'events': [
+                {'id': 'f1', 'kind': 'finish', 'name': 'Quiz Race', 'score': 12, 'duration_ms': 500},
+                {'id': 'p1', 'kind': 'play', 'name': 'Quiz Race'},
+            ]}, content_type='application/json')
+        self.assertEqual(GameSession.objects.get().points_entry.event_id, 'f1')
+        self.assertEqual(GameStats.objects.get(game_slug='quiz-race').plays, 1)
+
+    def test_rebuild_matches_incremental(self):
+        for user, score in ((self.a, 5), (self.b, 8), (self.a, 9)):
+            self.finish(user, 'Word Hunt', score)
+        before = list(GameStats.objects.values('plays', 'players', 'total_score', 'best_score'))
+        call_command('rebuild_game_stats', stdout=StringIO())
+        self.assertEqual(list(GameStats.objects.values('plays', 'players', 'total_score', 'best_score')), before)
+        self.assertEqual(sessions.player_rank('word-hunt', self.a.pk), (1, 9))
+
+
+class BadgeAwardTests(TestCase):
+    def setUp(self):
+        badges.invalidate_thresholds()
+        self.addCleanup(badges.invalidate_thresholds)
+        self.user = User.objects.create_user('earner', password='pass')
+        self.bronze, self.silver, self.gold = [
+            Badge.objects.create(name=name, description='', image_url='https://example.com/b.png', points_required=p)
+            for name, p in (('Bronze', 10), ('Silver', 50), ('Gold', 100))
+        ]
+
+    def earned(self, user=None):
+        return set(UserBadge.objects.filter(user=user or self.user).values_list('badge__name', flat=True))
+
+    def test_crossed_uses_half_open_interval(self):
+        thresholds = badges.get_thresholds()
+        self.assertEqual(badges.crossed(thresholds, 9, 50), [self.bronze.pk, self.silver.pk])
+        self.assertEqual(badges.crossed(thresholds, 10, 49), [])
+
+    def test_badges_awarded_as_thresholds_are_crossed(self):
+        award(self.user, 8)
+        self.assertEqual(self.earned(), set())
+        award(self.user, 60)
+        self.assertEqual(self.earned(), {'Bronze', 'Silver'})
+        entry = award(self.user, 40)
+        self.assertEqual(self.earned(), {'Bronze', 'Silver', 'Gold'})
+        entry.delete()
+        award(self.user, 40)
+        self.assertEqual(UserBadge.objects.filter(user=self.user).count(), 3)
+
+    def test_no_badge_queries_below_lowest_threshold(self):
+        badges.get_thresholds()
+        with CaptureQueriesContext(connection) as ctx:
+            award(self.user, 5)
+        self.assertFalse(any('gamification_userbadge' in q['sql'] or 'gamification_badge' in q['sql']
+                             for q in ctx.captured_queries))
+
+    def test_new_badge_cache_invalidated_and_backfilled(self):
+        award(self.user, 30)
+        other = User.objects.create_user('other', password='pass')
+        award(other, 5)
+        Badge.objects.create(name='Starter', description='', image_url='https://example.com/s.png', points_required=5)
+        self.assertEqual([p for p, _ in badges.get_thresholds()], [5, 10, 50, 100])
+        out = StringIO()
+        call_command('award_badges', '--chunk-size', '1', stdout=out)
+        self.assertIn('Awarded 2 badges', out.getvalue())
+        self.assertEqual(self.earned(), {'Bronze', 'Starter'})
+        self.assertEqual(self.earned(other), {'Starter'})
+
+
+@override_settings(STREAK_MILESTONES={2: 5, 3: 10})
+class StreakJobTests(TestCase):
+    def setUp(self):
+        from courses.models import Course, Lesson, Subject
+        subject = Subject.objects.create(name='Maths', description='', grade_level=5, language='english')
+        course = Course.objects.create(subject=subject, title='Fractions', description='', difficulty_level='easy')
+        self.lesson = Lesson.objects.create(course=course, title='Halves', content='', order=1, estimated_time=5)
+        self.a = User.objects.create_user('ana', password='pass')
+        self.b = User.objects.create_user('ben', password='pass')
+        self.day = timezone.localdate() - timedelta(days=1)
+
+    def moment(self, day, hour=12):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+
+    def play(self, user, day):
+        GameSession.objects.create(user=user, game_slug='g', game_name='G', created_at=self.moment(day))
+
+    def complete_lesson(self, user, day):
+        from courses.models import Progress
+        from courses.progress import complete_lesson
+        moment = self.moment(day, 9)
+        # Opened days earlier; completing it leaves last_accessed alone
+        opened = Progress.objects.create(user=user, lesson=self.lesson, course=self.lesson.course)
+        Progress.objects.filter(pk=opened.pk).update(last_accessed=moment - timedelta(days=5))
+        with mock.patch('courses.progress.timezone.now', return_value=moment):
+            complete_lesson(user, self.lesson)
+
+    def test_streaks_follow_activity(self):
+        first, second, third = self.day - timedelta(days=2), self.day - timedelta(days=1), self.day
+        self.play(self.a, first)
+        self.complete_lesson(self.b, first)
+        streaks.update_streaks(first)
+        self.play(self.a, second)
+        streaks.update_streaks(second)
+        self.play(self.a, third)
+        self.play(self.b, third)
+        result = streaks.update_streaks(third)
+
+        a = LearningStreak.objects.get(user=self.a)
+        b = LearningStreak.objects.get(user=self.b)
+        self.assertEqual((a.current_streak, a.longest_streak, a.last_activity_date), (3, 3, third))
+        self.assertEqual((b.current_streak, b.longest_streak), (1, 1))
+        self.assertEqual(result['extended'], 1)
+        self.assertEqual(PointsBalance.objects.get(user=self.a).streak_points, 15)
+
+    def test_inactive_streaks_reset_and_reruns_are_idempotent(self):
+        self.play(self.a, self.day - timedelta(days=1))
+        streaks.update_streaks(self.day - timedelta(days=1))
+        self.play(self.b, self.day)
+        call_command('update_streaks', '--date', self.day.isoformat(), stdout=StringIO())
+        call_command('update_streaks', stdout=StringIO())
+        self.assertEqual(LearningStreak.objects.get(user=self.a).current_streak, 0)
+        self.assertEqual(LearningStreak.objects.get(user=self.b).current_streak, 1)
+
+        self.play(self.b, self.day + timedelta(days=1))
+        streaks.update_streaks(self.day + timedelta(days=1))
+        streaks.update_streaks(self.day + timedelta(days=1))
+        self.assertEqual(LearningStreak.objects.get(user=self.b).current_streak, 2)
+        self.assertEqual(PointsHistory.objects.filter(user=self.b, point_type='streak').count(), 1)
+
+    def test_quiz_submissions_count(self):
+        from courses.models import Quiz, QuizAttempt
+        from courses.progress import record_quiz_result
+        quiz = Quiz.objects.create(lesson=self.lesson, title='Halves quiz', description='')
+        with mock.patch('courses.progress.timezone.now', return_value=self.moment(self.day)):
+            record_quiz_result(self.a, quiz, 3)
+        # Taken offline over three days, synced on the last one
+        for n in range(3):
+            attempt = QuizAttempt.objects.create(
+                user=self.b, quiz=quiz, idempotency_key=f'k{n}',
+                client_timestamp=self.moment(self.day - timedelta(days=n)),
+            )
+            QuizAttempt.objects.filter(pk=attempt.pk).update(created_at=self.moment(self.day))
+
+        streaks.update_streaks(self.day)
+        self.assertEqual(LearningStreak.objects.get(user=self.a).current_streak, 1)
+        b = LearningStreak.objects.get(user=self.b)
+        self.assertEqual((b.current_streak, b.longest_streak), (3, 3))
+        self.assertEqual(PointsBalance.objects.get(user=self.b).streak_points, 15)
+
+    def test_check_in_reports_without_writing(self):
+        self.client.force_login(self.a)
+        body = self.client.post('/gamification/api/learning-streaks/check_in/').json()
+        self.assertEqual(body['current_streak'], 0)
+        self.assertFalse(LearningStreak.objects.exists())
@@ -7,6 +7,8 @@ router.register(r'badges', views.BadgeViewSet)
 router.register(r'achievements', views.AchievementViewSet)
 router.register(r'user-badges', views.UserBadgeViewSet, basename='user-badges')
 router.register(r'points-history', views.PointsHistoryViewSet, basename='points-history')
+router.register(r'game-stats', views.GameStatsViewSet, basename='game-stats')
+router.register(r'leaderboard', views.LeaderboardViewSet, basename='leaderboard')
 router.register(r'learning-streaks', views.LearningStreakViewSet, basename='learning-streaks')
 
 app_name = 'gamification'
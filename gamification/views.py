@@ -1,16 +1,17 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
-from django.db.models import Sum
-from django.utils import timezone
-from datetime import timedelta
+from django.db import transaction
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Badge, Achievement, UserBadge, PointsHistory, LearningStreak
+from .models import Badge, Achievement, UserBadge, PointsHistory, LearningStreak, GameStats
+from . import leaderboard, sessions, telemetry
 from django.contrib.auth.models import User
 from .serializers import (
     BadgeSerializer, AchievementSerializer, UserBadgeSerializer,
-    PointsHistorySerializer, LearningStreakSerializer
+    PointsHistorySerializer, LearningStreakSerializer, GameEventSerializer,
+    GameStatsSerializer, HighScoreSerializer
 )
 
 class BadgeViewSet(viewsets.ModelViewSet):
@@ -39,14 +40,17 @@ class PointsHistoryViewSet(viewsets.ModelViewSet):
 
     @action(detail=False)
     def total_points(self, request):
-        total = self.get_queryset().aggregate(Sum('points'))['points__sum'] or 0
+        # Single-row read of the materialized balance; see gamification.leaderboard
+        total = leaderboard.get_balance(request.user.pk).total_points
         return Response({'total_points': total})
 
     @action(detail=False)
     def points_by_type(self, request):
-        points_by_type = self.get_queryset().values('point_type').annotate(
-            total=Sum('points')
-        )
+        balance = leaderboard.get_balance(request.user.pk)
+        points_by_type = [
+            {'point_type': point_type, 'total': total}
+            for point_type, total in balance.points_by_type().items() if total
+        ]
         return Response(points_by_type)
 
     @action(detail=False, methods=['POST'])
@@ -57,12 +61,7 @@ class PointsHistoryViewSet(viewsets.ModelViewSet):
             points = int(request.data.get('points', 1))
         except Exception:
             points = 1
-        PointsHistory.objects.create(
-            user=request.user,
-            points=points,
-            point_type='achievement',
-            description=f"Played: {name}"
-        )
+        telemetry.play_entry(request.user.pk, name, points).save()
         return Response({'ok': True, 'awarded': points})
 
     @action(detail=False, methods=['POST'])
@@ -78,36 +77,140 @@ class PointsHistoryViewSet(viewsets.ModelViewSet):
         except Exception:
             duration_ms = 0
 
-        desc = f"GameFinish:{name}|score={score}|duration={duration_ms}ms"
-        PointsHistory.objects.create(
-            user=request.user,
-            points=score,
-            point_type='achievement',
-            description=desc,
-        )
+        with transaction.atomic():
+            telemetry.save_entries([telemetry.finish_entry(request.user.pk, name, score, duration_ms)])
         return Response({'ok': True, 'recorded': True, 'score': score})
 
+    @action(detail=False, methods=['POST'])
+    def track_batch(self, request):
+        # Expect { events: [{ id: 'uuid', kind: 'play'|'finish', name, points | score, duration_ms }, ...] }
+        events = request.data.get('events')
+        if not isinstance(events, list):
+            return Response({'error': 'events must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > telemetry.MAX_EVENTS_PER_REQUEST:
+            return Response(
+                {'error': f'At most {telemetry.MAX_EVENTS_PER_REQUEST} events per request'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        entries, rejected = [], []
+        for event in events:
+            serializer = GameEventSerializer(data=event)
+            if not serializer.is_valid():
+                rejected.append({'id': event.get('id') if isinstance(event, dict) else None,
+                                 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            name = data.get('name', '').strip()
+            if data['kind'] == 'play':
+                entries.append(telemetry.play_entry(request.user.pk, name or 'Game Play', data['points'], data['id']))
+            else:
+                entries.append(telemetry.finish_entry(
+                    request.user.pk, name or 'Game', data['score'], data['duration_ms'], data['id'],
+                ))
+        result = telemetry.ingest(request.user.pk, entries)
+        # Clients drop stored and rejected events and resend pending ones later
+        return Response({**result, 'rejected': rejected})
+
+class GameStatsViewSet(viewsets.ReadOnlyModelViewSet):
+    """Per-game plays, players, best and average score, read from precomputed GameStats rows."""
+    queryset = GameStats.objects.order_by('-plays', 'game_slug')
+    serializer_class = GameStatsSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    lookup_field = 'game_slug'
+
+    @action(detail=True, url_path='high-scores')
+    def high_scores(self, request, game_slug=None):
+        game = self.get_object()
+        me = sessions.player_rank(game.game_slug, request.user.pk) if request.user.is_authenticated else None
+        return Response({
+            'game': GameStatsSerializer(game).data,
+            'high_scores': HighScoreSerializer(sessions.high_scores(game.game_slug, 10), many=True).data,
+            'me': {'rank': me[0], 'best_score': me[1]} if me else None,
+        })
+
+class LeaderboardViewSet(viewsets.ViewSet):
+    """Top 10 and the caller's rank for each window in ``leaderboard.WINDOWS`` plus all-time.
+
+    ``?scope=school|village|grade`` limits the board to users sharing the
+    caller's school, village or grade.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'window'
+    lookup_value_regex = '[a-z-]+'
+
+    def list(self, request):
+        return Response({
+            'windows': [*leaderboard.WINDOWS, leaderboard.ALL_TIME],
+            'scopes': list(leaderboard.SCOPES),
+        })
+
+    def retrieve(self, request, window=None):
+        if window != leaderboard.ALL_TIME and window not in leaderboard.WINDOWS:
+            raise NotFound(f"Unknown leaderboard window '{window}'.")
+        scope = request.query_params.get('scope')
+        where = None
+        if scope:
+            if scope not in leaderboard.SCOPES:
+                raise ValidationError({'scope': f"Unknown scope '{scope}'."})
+            where = leaderboard.viewer_scope(scope, request.user.pk)
+            if where is None:
+                # The caller's profile has no value for this scope
+                return Response({'window': window, 'scope': scope, 'value': None, 'top': [], 'me': None})
+        me = leaderboard.window_rank(window, request.user.pk, where=where)
+        return Response({
+            'window': window,
+            'start': None if window == leaderboard.ALL_TIME else leaderboard.window_start(window),
+            'scope': scope,
+            'value': next(iter(where.values())) if where else None,
+            'top': [
+                {'user_id': row['user__id'], 'username': row['user__username'], 'points': row['total_points']}
+                for row in leaderboard.window_top(window, 10, where=where)
+            ],
+            'me': {'rank': me[0], 'points': me[1]} if me else None,
+        })
+
 class LearningStreakViewSet(viewsets.ModelViewSet):
     serializer_class = LearningStreakSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return LearningStreak.objects.filter(user=self.request.user)
+
+    @action(detail=False, methods=['GET', 'POST'])
+    def check_in(self, request):
+        # Streaks are maintained by the nightly gamification.tasks.update_learning_streaks job
+        # from lesson, quiz and game activity; this only reports the current values.
+        streak = self.get_queryset().order_by('pk').first()
+        return Response({
+            'current_streak': streak.current_streak if streak else 0,
+            'longest_streak': streak.longest_streak if streak else 0,
+            'last_activity_date': streak.last_activity_date if streak else None,
+        })
         
 class LeaderboardView(LoginRequiredMixin, TemplateView):
     template_name = 'gamification/leaderboard.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Add leaderboard data to context
-        context['top_users'] = PointsHistory.objects.values('user__id', 'user__username').annotate(
-            total_points=Sum('points')
-        ).order_by('-total_points')[:10]
-        # 7-day leaderboard
-        week_ago = timezone.now() - timedelta(days=7)
-        context['weekly_users'] = PointsHistory.objects.filter(
-            created_at__gte=week_ago
-        ).values('user__id', 'user__username').annotate(total_points=Sum('points')).order_by('-total_points')[:10]
+        # Add leaderboard data to context (materialized totals; see gamification.leaderboard)
+        context['top_users'] = leaderboard.top(10)
+        context['my_rank'] = leaderboard.rank(self.request.user.pk)
+        # Rolling windows, summed from the daily buckets
+        context['weekly_users'] = leaderboard.window_top('weekly', 10)
+        context['monthly_users'] = leaderboard.window_top('monthly', 10)
+        context['term_users'] = leaderboard.window_top('term', 10)
+        # All-time boards for the viewer's own school, village and grade
+        context['scoped_boards'] = []
+        profile = leaderboard.profile_scopes(self.request.user.pk)
+        for field, label in (('school_name', 'My School'), ('village', 'My Village'), ('grade_level', 'My Grade')):
+            if profile.get(field) not in ('', None):
+                where = {field: profile[field]}
+                context['scoped_boards'].append({
+                    'label': label,
+                    'value': profile[field],
+                    'users': leaderboard.top(10, where),
+                    'my_rank': leaderboard.rank(self.request.user.pk, where),
+                })
         return context
         
 class UserAchievementsView(LoginRequiredMixin, TemplateView):
@@ -117,37 +220,5 @@ class UserAchievementsView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         # Add user's achievements data to context
         context['user_badges'] = UserBadge.objects.filter(user=self.request.user)
-        context['total_points'] = PointsHistory.objects.filter(user=self.request.user).aggregate(
-            total=Sum('points')
-        )['total'] or 0
+        context['total_points'] = leaderboard.get_balance(self.request.user.pk).total_points
         return context
-    permission_classes = [permissions.IsAuthenticated]
-
-    def get_queryset(self):
-        return LearningStreak.objects.filter(user=self.request.user)
-
-    @action(detail=False, methods=['POST'])
-    def check_in(self, request):
-        streak, created = LearningStreak.objects.get_or_create(
-            user=request.user,
-            defaults={'last_activity_date': timezone.now().date()}
-        )
-        
-        if not created:
-            today = timezone.now().date()
-            yesterday = today - timezone.timedelta(days=1)
-            
-            if streak.last_activity_date == yesterday:
-                streak.current_streak += 1
-                if streak.current_streak > streak.longest_streak:
-                    streak.longest_streak = streak.current_streak
-            elif streak.last_activity_date < yesterday:
-                streak.current_streak = 1
-            
-            streak.last_activity_date = today
-            streak.save()
-        
-        return Response({
-            'current_streak': streak.current_streak,
-            'longest_streak': streak.longest_streak
-        })
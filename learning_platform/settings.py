@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -155,6 +157,14 @@ MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Let the front-end server stream media: None, 'nginx' (X-Accel-Redirect) or 'sendfile'
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Offline PDF cache (rendered course/lesson downloads)
+OFFLINE_PDF_CACHE_DIR = BASE_DIR / 'offline_pdfs'
+# Re-render PDFs in Celery when content changes (needs a running broker)
+OFFLINE_PDF_PRERENDER = False
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -206,6 +216,19 @@ CACHES = {
 # Cache time to live is 15 minutes
 CACHE_TTL = 60 * 15
 
+# Leaderboard lookups: 'db' (indexed totals table) or 'redis' (sorted set, needs django_redis)
+LEADERBOARD_BACKEND = 'db'
+# Redis DB holding the leaderboard sorted sets; kept apart from the cache DB so that
+# cache.clear() and cache eviction cannot drop them (run it with maxmemory-policy noeviction)
+LEADERBOARD_REDIS_URL = 'redis://127.0.0.1:6379/2'
+# (month, day) the school term starts; the 'term' leaderboard counts from here
+LEADERBOARD_TERM_START = (4, 1)
+
+# Game telemetry write-behind buffer (gamification.telemetry): flush after this many
+# events or once the oldest has waited this many seconds
+GAME_TELEMETRY_BUFFER_SIZE = 500
+GAME_TELEMETRY_FLUSH_INTERVAL = 2.0
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
@@ -213,6 +236,13 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Streaks are derived from the previous day's activity (gamification.streaks)
+    'update-learning-streaks': {
+        'task': 'gamification.tasks.update_learning_streaks',
+        'schedule': crontab(hour=0, minute=30),
+    },
+}
 
 # Email Settings - Using File Backend for Development
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
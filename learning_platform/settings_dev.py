@@ -24,9 +24,14 @@ CACHES = {
 # Celery settings (local development)
 CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
 CELERY_RESULT_BACKEND = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
+OFFLINE_PDF_PRERENDER = True
 
 # Allow all hosts in development
 ALLOWED_HOSTS = ['*']
 
 # CORS settings for development
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development!
+
+# Serve leaderboards from a Redis sorted set
+LEADERBOARD_BACKEND = 'redis'
+LEADERBOARD_REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/2'
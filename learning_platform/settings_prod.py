@@ -47,6 +47,7 @@ CACHES = {
 # Celery settings
 CELERY_BROKER_URL = f'redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/0'
 CELERY_RESULT_BACKEND = f'redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/0'
+OFFLINE_PDF_PRERENDER = True
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
 # Allowed hosts
@@ -59,3 +60,7 @@ CORS_ALLOW_CREDENTIALS = True
 # Static and media files
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles')
+
+# Serve leaderboards from a Redis sorted set
+LEADERBOARD_BACKEND = 'redis'
+LEADERBOARD_REDIS_URL = f'redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/2'
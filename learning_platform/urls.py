@@ -15,9 +15,8 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
 from django.views.generic import TemplateView
 from django.shortcuts import redirect
@@ -26,6 +25,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from accounts.views import RegisterView, logout_view
+from courses.media import serve_media
 from .views import HomeView
 
 schema_view = get_schema_view(
@@ -73,7 +73,10 @@ urlpatterns = [
     # API documentation
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+    # Uploaded media with Range support; can hand off to nginx/X-Sendfile (see courses.media)
+    re_path(rf"^{settings.MEDIA_URL.strip('/')}/(?P<path>.+)$", serve_media, name='media'),
+]
 
 admin.site.index_title = "Rural Learning Platform Admin"
 admin.site.site_header = "Rural Learning Platform Administration"
@@ -1,6 +1,7 @@
 from django.shortcuts import render
 from django.views.generic import TemplateView
 from django.contrib.auth.models import User
+from courses.catalog import FEATURED, get_or_build, hydrate_courses
 from courses.models import Course, Subject
 from gamification.models import Badge, Achievement, UserBadge, PointsHistory, LearningStreak
 from django.db.models import Count, Sum
@@ -18,14 +19,20 @@ class HomeView(TemplateView):
         if not current_language or current_language not in ['en', 'hi', 'or']:
             current_language = 'en'
         
-        # Featured courses (popular learning paths)
-        featured_courses = Course.objects.select_related('subject').filter(
-            subject__language=current_language,
-            subject__grade_level__gte=6,
-            subject__grade_level__lte=12
-        ).annotate(
-            enrollment_count=Count('enrollment')
-        ).order_by('-enrollment_count')[:6]
+        # Featured courses (popular learning paths), cached per language
+        rows = get_or_build(
+            FEATURED, ('home', current_language),
+            lambda: [
+                list(row) for row in Course.objects.filter(
+                    subject__language=current_language,
+                    subject__grade_level__gte=6,
+                    subject__grade_level__lte=12
+                ).annotate(
+                    enrollment_count=Count('enrollment')
+                ).order_by('-enrollment_count').values_list('id', 'enrollment_count')[:6]
+            ],
+        )
+        featured_courses = hydrate_courses(rows, 'enrollment_count')
         
         context['featured_courses'] = featured_courses
         
@@ -92,20 +92,110 @@ if (languageSelect) {
     });
 }
 
-// Track game plays for leaderboard (requires logged-in session)
-window.trackGame = function(name, points) {
+// Game telemetry (requires logged-in session). Events are queued in localStorage
+// and posted in batches; the server reports which ones it has stored, and the
+// rest stay queued and are resent, so nothing is lost if a request fails.
+const GAME_EVENTS_KEY = 'gameEvents';
+const GAME_EVENTS_BATCH = 50;
+let gameEventsTimer = null;
+let gameEventsFlushing = false;
+// A flush requested while one is in flight runs again once it finishes
+let gameEventsFlushPending = false;
+// Queue kept here instead when localStorage is full or disabled
+let gameEventsMemory = null;
+
+function newEventId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+}
+
+function loadGameEvents() {
+    if (gameEventsMemory !== null) {
+        return gameEventsMemory.slice();
+    }
+    try {
+        return JSON.parse(localStorage.getItem(GAME_EVENTS_KEY) || '[]');
+    } catch (e) {
+        return [];
+    }
+}
+
+function saveGameEvents(events) {
+    try {
+        localStorage.setItem(GAME_EVENTS_KEY, JSON.stringify(events));
+        gameEventsMemory = null;
+    } catch (e) {
+        // storage full or disabled; events stay in memory for this page only
+        gameEventsMemory = events.slice();
+    }
+}
+
+window.queueGameEvent = function(event) {
+    const events = loadGameEvents();
+    events.push(Object.assign({ id: newEventId() }, event));
+    saveGameEvents(events);
+    if (!gameEventsTimer) {
+        gameEventsTimer = setTimeout(flushGameEvents, 5000);
+    }
+};
+
+async function flushGameEvents(keepalive) {
+    gameEventsTimer = null;
+    if (gameEventsFlushing) {
+        gameEventsFlushPending = true;
+        return;
+    }
+    const batch = loadGameEvents().slice(0, GAME_EVENTS_BATCH);
+    if (!batch.length || !navigator.onLine) {
+        return;
+    }
+    gameEventsFlushing = true;
     try {
-        fetch('/gamification/api/points-history/track_game/', {
+        const response = await fetch('/gamification/api/points-history/track_batch/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': getCookie('csrftoken'),
             },
             credentials: 'same-origin',
-            keepalive: true,
-            body: JSON.stringify({ name: name, points: points || 5 })
+            keepalive: !!keepalive,
+            body: JSON.stringify({ events: batch })
         });
+        if (response.ok) {
+            const result = await response.json();
+            const done = new Set(result.stored.concat(result.rejected.map(r => r.id)));
+            const remaining = loadGameEvents().filter(e => !done.has(e.id));
+            saveGameEvents(remaining);
+            if (remaining.length) {
+                // Pending events are confirmed on a later flush
+                gameEventsTimer = setTimeout(flushGameEvents, result.pending.length ? 10000 : 0);
+            }
+        }
     } catch (e) {
-        // ignore
+        // offline or server unreachable: keep the queue for the next flush
+    } finally {
+        gameEventsFlushing = false;
+        const rerun = gameEventsFlushPending && !gameEventsTimer;
+        gameEventsFlushPending = false;
+        if (rerun) {
+            flushGameEvents(keepalive);
+        }
     }
-}
\ No newline at end of file
+}
+
+window.addEventListener('online', () => flushGameEvents());
+document.addEventListener('visibilitychange', function() {
+    if (document.visibilityState === 'hidden') {
+        flushGameEvents(true);
+    }
+});
+if (loadGameEvents().length) {
+    gameEventsTimer = setTimeout(flushGameEvents, 2000);
+}
+
+// Track game plays for leaderboard
+window.trackGame = function(name, points) {
+    window.queueGameEvent({ kind: 'play', name: name, points: points || 5 });
+};
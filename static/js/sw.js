@@ -1,4 +1,5 @@
-const CACHE_NAME = 'rural-learning-games-v2';
+const CACHE_NAME = 'rural-learning-games-v3';
+const GAMES_MANIFEST = '/courses/games/manifest.json';
 const PRECACHE = [
   '/',
   '/courses/',
@@ -7,9 +8,19 @@ const PRECACHE = [
   '/static/js/main.js',
 ];
 
+// Every file of every game listed in the manifest, so games work offline
+function gameFiles() {
+  return fetch(GAMES_MANIFEST)
+    .then((res) => res.json())
+    .then((manifest) => manifest.games.flatMap((game) => game.files))
+    .catch(() => []);
+}
+
 // Install Service Worker
 self.addEventListener('install', (event) => {
-  event.waitUntil(caches.open(CACHE_NAME).then((cache) => cache.addAll(PRECACHE)));
+  event.waitUntil(caches.open(CACHE_NAME).then((cache) =>
+    cache.addAll(PRECACHE).then(() => gameFiles()).then((files) => cache.addAll(files))
+  ));
   self.skipWaiting();
 });
 
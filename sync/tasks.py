@@ -1,52 +1,185 @@
+from itertools import groupby
+from operator import attrgetter
+
 from celery import shared_task
 from django.core.cache import cache
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db.models.signals import post_save, pre_save
 from .models import ContentVersion, SyncQueue, OfflineChange
 from django.db import transaction
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Offline changes applied per transaction, per content type
+CHUNK_SIZE = 500
+
+
+def _sends_save_signals(model_class) -> bool:
+    # Such models keep caches and counters in step from signal receivers, which bulk writes skip
+    return pre_save.has_listeners(model_class) or post_save.has_listeners(model_class)
+
+
+def _update_fields(model_class, keys) -> list:
+    """Concrete non-pk fields named by ``keys`` plus ``auto_now`` fields, as ``save()`` would write."""
+    fields = []
+    for field in model_class._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        if field.name in keys or field.attname in keys or getattr(field, 'auto_now', False):
+            fields.append(field)
+    return fields
+
+
+def _apply_one(model_class, change):
+    """Apply a single change; returns the instance to version, if any."""
+    if change.change_type == 'create':
+        return model_class.objects.create(**change.data)
+    if change.change_type == 'update':
+        instance = model_class.objects.get(pk=change.object_id)
+        for key, value in change.data.items():
+            setattr(instance, key, value)
+        instance.save()
+        return instance
+    if change.change_type == 'delete':
+        model_class.objects.filter(pk=change.object_id).delete()
+    return None
+
+
+def _apply_run(model_class, change_type, changes) -> list:
+    """Apply consecutive changes of one type with one read and one write; returns instances to version."""
+    if change_type == 'delete':
+        model_class.objects.filter(pk__in={c.object_id for c in changes}).delete()
+        return []
+    if change_type == 'create':
+        instances = [model_class(**change.data) for change in changes]
+        if _sends_save_signals(model_class):
+            for instance in instances:
+                instance.save()
+        else:
+            model_class.objects.bulk_create(instances)
+        return instances
+
+    targets = model_class.objects.in_bulk({c.object_id for c in changes})
+    updated, keys = {}, set()
+    for change in changes:
+        instance = targets.get(change.object_id)
+        if instance is None:
+            raise model_class.DoesNotExist(
+                f"{model_class._meta.object_name} {change.object_id} does not exist"
+            )
+        for key, value in change.data.items():
+            setattr(instance, key, value)
+        keys.update(change.data)
+        updated[instance.pk] = instance
+    if _sends_save_signals(model_class):
+        for instance in updated.values():
+            instance.save()
+    else:
+        fields = _update_fields(model_class, keys)
+        for instance in updated.values():
+            for field in fields:
+                field.pre_save(instance, False)
+        model_class.objects.bulk_update(updated.values(), [f.name for f in fields])
+    return list(updated.values())
+
+
+def _apply_bulk(model_class, changes) -> list:
+    """Apply a chunk of changes in order, one bulk write per run of same-type changes.
+
+    Runs keep the queue's order, so a delete followed by a re-create (or a
+    create followed by an update) of one object ends as it would one by one.
+    Returns instances to version. Raises on the first bad change, leaving the
+    caller to roll back the chunk.
+    """
+    instances = []
+    for change_type, run in groupby(changes, key=attrgetter('change_type')):
+        instances.extend(_apply_run(model_class, change_type, list(run)))
+    return instances
+
+
+def _apply_chunk(model_class, changes):
+    """Apply a chunk of changes; returns ``(applied changes, instances to version)``.
+
+    The chunk is first written in bulk inside a savepoint. If that fails, it
+    is replayed one change at a time, each in its own savepoint, so one bad
+    change does not hold back the rest.
+    """
+    try:
+        with transaction.atomic():
+            return changes, _apply_bulk(model_class, changes)
+    except Exception as e:
+        logger.warning(f"Retrying {len(changes)} {model_class._meta.label} changes one by one: {e}")
+
+    applied, instances = [], []
+    for change in changes:
+        try:
+            with transaction.atomic():
+                instance = _apply_one(model_class, change)
+        except Exception as e:
+            logger.error(f"Error processing change {change.id}: {str(e)}")
+            continue
+        applied.append(change)
+        if instance is not None:
+            instances.append(instance)
+    return applied, instances
+
+
 @shared_task
-def process_offline_changes(user_id):
-    """Process offline changes for a user."""
+def process_offline_changes(user_id, chunk_size=CHUNK_SIZE):
+    """Process offline changes for a user, grouped by content type and applied in chunks.
+
+    Returns the number of changes synced; failed changes stay unsynced.
+    """
     changes = OfflineChange.objects.filter(
         user_id=user_id,
         synced=False,
         conflict_resolved=False
     ).select_related('content_type')
-    
+
+    by_type = {}
     for change in changes:
-        try:
+        by_type.setdefault(change.content_type, []).append(change)
+
+    synced = 0
+    for content_type, group in by_type.items():
+        model_class = content_type.model_class()
+        if model_class is None:
+            logger.error(f"Skipping {len(group)} changes to unknown model {content_type}")
+            continue
+        for i in range(0, len(group), chunk_size):
+            chunk = group[i:i + chunk_size]
             with transaction.atomic():
-                model_class = change.content_type.model_class()
-                
-                if change.change_type == 'create':
-                    instance = model_class.objects.create(**change.data)
-                    create_content_version(instance)
-                
-                elif change.change_type == 'update':
-                    instance = model_class.objects.get(id=change.object_id)
-                    for key, value in change.data.items():
-                        setattr(instance, key, value)
-                    instance.save()
-                    create_content_version(instance)
-                
-                elif change.change_type == 'delete':
-                    model_class.objects.filter(id=change.object_id).delete()
-                
-                change.synced = True
-                change.save()
-                
-                # Invalidate cache
-                cache_key = f"{change.content_type.model}_{change.object_id}"
-                cache.delete(cache_key)
-        
-        except Exception as e:
-            logger.error(f"Error processing change {change.id}: {str(e)}")
-            change.error_message = str(e)
-            change.save()
+                applied, instances = _apply_chunk(model_class, chunk)
+                create_content_versions(instances)
+                OfflineChange.objects.filter(pk__in=[c.pk for c in applied]).update(synced=True)
+
+            # Invalidate cache
+            cache.delete_many([f"{content_type.model}_{c.object_id}" for c in applied])
+            synced += len(applied)
+    return synced
+
+
+def create_content_versions(instances):
+    """Record a new ContentVersion for each of ``instances`` (all of one model) in one insert."""
+    if not instances:
+        return
+    content_type = ContentType.objects.get_for_model(instances[0])
+    current = dict(
+        ContentVersion.objects.filter(content_type=content_type, object_id__in={i.pk for i in instances})
+        .values('object_id').annotate(versions=models.Count('id')).values_list('object_id', 'versions')
+    )
+    versions = []
+    for instance in instances:
+        current[instance.pk] = current.get(instance.pk, 0) + 1
+        versions.append(ContentVersion(
+            content_type=content_type,
+            object_id=instance.pk,
+            version=current[instance.pk],
+            data=instance.to_dict() if hasattr(instance, 'to_dict') else {}
+        ))
+    ContentVersion.objects.bulk_create(versions)
 
 @shared_task
 def create_content_version(instance):
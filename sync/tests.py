@@ -1,3 +1,79 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from courses.models import Course, Progress, Subject
+from .models import ContentVersion, OfflineChange
+from .tasks import process_offline_changes
+
+
+class ProcessOfflineChangesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('amara', password='pass')
+        subject = Subject.objects.create(name='Science', description='', grade_level=6, language='english')
+        self.course = Course.objects.create(subject=subject, title='Plants', description='', difficulty_level='easy')
+        self.progress = [Progress.objects.create(user=self.user, course=self.course) for _ in range(20)]
+
+    def queue(self, obj_or_model, change_type, data, object_id=None):
+        return OfflineChange.objects.create(
+            user=self.user,
+            content_type=ContentType.objects.get_for_model(obj_or_model),
+            object_id=obj_or_model.pk if object_id is None else object_id,
+            change_type=change_type,
+            data=data,
+        )
+
+    def test_changes_are_applied_in_bulk(self):
+        for i, progress in enumerate(self.progress):
+            self.queue(progress, 'update', {'score': i, 'completed': True})
+        self.queue(Progress, 'create', {'user_id': self.user.pk, 'course_id': self.course.pk, 'score': 99}, object_id=0)
+        self.queue(self.progress[0], 'delete', {})
+        self.queue(self.course, 'update', {'title': 'Plants and seeds'})
+
+        with CaptureQueriesContext(connection) as queries:
+            synced = process_offline_changes(self.user.pk)
+
+        self.assertEqual(synced, 23)
+        self.assertLess(len(queries), 40)
+        self.assertFalse(OfflineChange.objects.filter(synced=False).exists())
+        self.assertFalse(Progress.objects.filter(pk=self.progress[0].pk).exists())
+        self.assertEqual(Progress.objects.get(pk=self.progress[5].pk).score, 5)
+        self.assertTrue(Progress.objects.filter(score=99).exists())
+        self.assertEqual(Course.objects.get(pk=self.course.pk).title, 'Plants and seeds')
+        self.assertEqual(ContentVersion.objects.filter(version=1).count(), 22)
+
+    def test_failed_change_does_not_block_the_rest(self):
+        good = self.queue(self.progress[1], 'update', {'score': 7})
+        missing = self.queue(Progress, 'update', {'score': 1}, object_id=999999)
+        bad = self.queue(self.progress[2], 'update', {'score': 'not a number'})
+
+        with self.assertLogs('sync.tasks', level='WARNING'):
+            self.assertEqual(process_offline_changes(self.user.pk), 1)
+
+        self.assertEqual(Progress.objects.get(pk=self.progress[1].pk).score, 7)
+        self.assertTrue(OfflineChange.objects.get(pk=good.pk).synced)
+        self.assertFalse(OfflineChange.objects.get(pk=missing.pk).synced)
+        self.assertFalse(OfflineChange.objects.get(pk=bad.pk).synced)
+
+    def test_repeated_updates_create_successive_versions(self):
+        self.queue(self.progress[3], 'update', {'score': 1})
+        process_offline_changes(self.user.pk)
+        self.queue(self.progress[3], 'update', {'score': 2})
+        process_offline_changes(self.user.pk)
+        versions = ContentVersion.objects.filter(object_id=self.progress[3].pk).values_list('version', flat=True)
+        self.assertEqual(sorted(versions), [1, 2])
+
+    def test_interleaved_changes_to_one_object_apply_in_order(self):
+        pk = self.course.pk
+        self.queue(self.course, 'update', {'title': 'Plants (draft)'})
+        self.queue(self.course, 'delete', {})
+        self.queue(Course, 'create', {
+            'id': pk, 'subject_id': self.course.subject_id, 'title': 'Plants again',
+            'description': '', 'difficulty_level': 'easy',
+        }, object_id=pk)
+
+        with self.assertNoLogs('sync.tasks', level='WARNING'):
+            self.assertEqual(process_offline_changes(self.user.pk), 3)
+        self.assertEqual(Course.objects.get(pk=pk).title, 'Plants again')